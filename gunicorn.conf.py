@@ -0,0 +1,46 @@
+# Configuração do gunicorn (lida automaticamente a partir da raiz do projeto).
+#
+# PREDICTION_PREWARM_MODELS=1 carrega todos os PredictionModel antes da primeira requisição.
+#   - Com GUNICORN_PRELOAD_APP=1 (padrão quando o pre-warm está ligado) os modelos são carregados uma única vez no master,
+#     antes do fork, e os workers compartilham essas páginas por copy-on-write.
+#   - Com GUNICORN_PRELOAD_APP=0 cada worker carrega sua própria cópia ao iniciar.
+#
+# O Procfile sobe a aplicação ASGI com workers do uvicorn: as views assíncronas (predictions/async_views.py)
+# mandam a inferência para um executor com PREDICTION_INFERENCE_WORKERS threads e o worker continua
+# atendendo outras requisições enquanto isso.
+import gc
+import os
+
+
+def _env_flag(nome, padrao='0'):
+    return os.environ.get(nome, padrao).lower() in ('1', 'true', 'yes', 'on')
+
+
+PREWARM_MODELS = _env_flag('PREDICTION_PREWARM_MODELS')
+
+preload_app = _env_flag('GUNICORN_PRELOAD_APP', '1' if PREWARM_MODELS else '0')
+
+
+def _prewarm():
+    from predictions.registry import prewarm_models
+    prewarm_models()
+
+
+def when_ready(server):
+    # Com preload_app a aplicação Django já foi importada no master neste ponto
+    if not (PREWARM_MODELS and preload_app):
+        return
+
+    from django.db import connections
+
+    _prewarm()
+    # Conexões abertas no master não podem ser herdadas pelos workers
+    connections.close_all()
+    # Tira os objetos já carregados do alcance do GC para que a coleta nos workers
+    # não escreva nos cabeçalhos desses objetos e quebre o compartilhamento copy-on-write
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    if PREWARM_MODELS and not preload_app:
+        _prewarm()
@@ -43,7 +43,8 @@ try:
         print("\nPróximos passos:")
         print("1. Copie esta lista EXATA.")
         print("2. Cole esta lista no campo 'exog_columns' do seu modelo no Django Admin.")
-        print(f"3. Modifique 'predictions/utils.py' (função prepare_future_exog) para gerar colunas com ESSES nomes.")
+        print("3. Colunas que não são features de calendário (ver predictions/features.py, prepare_future_exog)")
+        print("   precisam de uma regra no campo 'exog_rules', ex.: {\"almoco\": {\"hora\": [11, 12, 13]}}.")
     else:
         print("ERRO: Não foi possível encontrar a lista 'exog_names' automaticamente.")
         print("Por favor, verifique o tipo de objeto acima e investigue seus atributos.")
@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import tempfile
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -25,9 +26,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'predictions.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  
+    'predictions.middleware.StaticFilesMiddleware',  # WhiteNoise com suporte a ASGI
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -59,14 +61,59 @@ WSGI_APPLICATION = 'occupancy_api.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Modo de journal do arquivo do banco. Ao contrário dos PRAGMAs abaixo, fica gravado no próprio
+# arquivo: é aplicado uma vez pela migração predictions/0009_sqlite_journal_mode (no deploy, com o
+# migrate) e não a cada conexão. WAL deixa leitores e o escritor trabalharem ao mesmo tempo.
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+
+# PRAGMAs executados em cada conexão nova com o SQLite. Com WAL, synchronous=NORMAL continua
+# seguro contra corrupção. cache_size negativo é em KiB.
+SQLITE_PRAGMAS = {
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # 0: cada requisição abre e fecha a sua conexão (abrir um arquivo SQLite é barato). Sob ASGI
+        # as views assíncronas usam threads do executor, e conexões persistentes ficariam abertas
+        # nessas threads sem o fechamento do fim da requisição; o Django recomenda 0 com ASGI.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Segundos que uma conexão espera pelo lock antes de "database is locked"
+            'timeout': float(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+            # Transações pegam o lock de escrita no início: com DEFERRED, a promoção
+            # de leitura para escrita falha na hora, sem respeitar o timeout
+            'transaction_mode': os.environ.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+            'init_command': ';'.join(f'PRAGMA {nome}={valor}' for nome, valor in SQLITE_PRAGMAS.items()),
+        },
     }
 }
 
 
+# Cache
+# O alias 'predictions' guarda versões e respostas prontas de /predictions e /series.
+# Precisa ser compartilhado entre os workers do host para a invalidação valer para todos.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'predictions': {
+        'BACKEND': os.environ.get('PREDICTION_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('PREDICTION_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'occupancy_api_cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('PREDICTION_CACHE_MAX_ENTRIES', 2000)),
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -118,3 +165,73 @@ REST_FRAMEWORK = {
 }
 
 ALLOWED_HOSTS = ['*']
+
+# Quantidade máxima de modelos mantidos em memória por processo (LRU)
+PREDICTION_MODEL_REGISTRY_SIZE = int(os.environ.get('PREDICTION_MODEL_REGISTRY_SIZE', 8))
+
+# Artefatos de inferência gerados por `manage.py export_inference_artifacts`.
+# Quando existem e correspondem ao arquivo original, são carregados no lugar dele.
+PREDICTION_ARTIFACT_DIR = os.environ.get('PREDICTION_ARTIFACT_DIR', str(BASE_DIR / 'predictions' / 'model' / 'inference'))
+PREDICTION_USE_ARTIFACTS = os.environ.get('PREDICTION_USE_ARTIFACTS', '1').lower() in ('1', 'true', 'yes', 'on')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simples': {
+            'format': '%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simples',
+        },
+    },
+    'loggers': {
+        'predictions': {
+            'handlers': ['console'],
+            'level': os.environ.get('PREDICTIONS_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
+# Linhas por lote no upsert de previsões (predictions/storage.py)
+PREDICTION_WRITE_BATCH_SIZE = int(os.environ.get('PREDICTION_WRITE_BATCH_SIZE', 5000))
+
+# Locks de geração sob demanda (single-flight entre workers do mesmo host)
+PREDICTION_LOCK_DIR = os.environ.get('PREDICTION_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'occupancy_api_locks'))
+PREDICTION_LOCK_TIMEOUT = float(os.environ.get('PREDICTION_LOCK_TIMEOUT', 300))
+
+# Métricas (/metrics, formato Prometheus): cada processo grava um snapshot neste diretório
+# no máximo a cada PREDICTION_METRICS_FLUSH_INTERVAL segundos e o endpoint soma todos.
+# Com PREDICTION_METRICS_TOKEN definido, o scrape precisa do header "Authorization: Bearer <token>".
+PREDICTION_METRICS_DIR = os.environ.get('PREDICTION_METRICS_DIR', os.path.join(tempfile.gettempdir(), 'occupancy_api_metrics'))
+PREDICTION_METRICS_FLUSH_INTERVAL = float(os.environ.get('PREDICTION_METRICS_FLUSH_INTERVAL', 1.0))
+PREDICTION_METRICS_TOKEN = os.environ.get('PREDICTION_METRICS_TOKEN')
+
+# Threads do executor que roda a inferência (Prophet/XGBoost) e as gravações das views
+# assíncronas (predictions/async_views.py), fora do event loop do worker ASGI.
+PREDICTION_INFERENCE_WORKERS = int(os.environ.get('PREDICTION_INFERENCE_WORKERS', 2))
+
+# Fila de PredictionJob (manage.py run_prediction_jobs): o worker renova heartbeat_at dos jobs em execução;
+# um job 'running' sem renovação há mais de PREDICTION_JOB_LEASE_SECONDS (worker que caiu) volta para a fila,
+# até PREDICTION_JOB_MAX_ATTEMPTS tentativas, e depois é marcado como 'failed'.
+PREDICTION_JOB_LEASE_SECONDS = float(os.environ.get('PREDICTION_JOB_LEASE_SECONDS', 300))
+PREDICTION_JOB_MAX_ATTEMPTS = int(os.environ.get('PREDICTION_JOB_MAX_ATTEMPTS', 3))
+
+# Servidor de inferência do host (`manage.py inference_server`): as views, os jobs e o generate_predictions
+# pedem as previsões por este socket em vez de carregar os modelos (memória paga uma vez por host; deixe
+# PREDICTION_PREWARM_MODELS desligado nos workers). PREDICTION_USE_INFERENCE_SERVER: 'auto' (padrão) usa o
+# servidor quando ele aceita conexões no socket e faz a inferência no próprio processo sem ele; 1 sempre tenta
+# o servidor; 0 desliga. No modo 'auto' cada processo testa o socket no máximo uma vez a cada
+# PREDICTION_INFERENCE_PROBE_INTERVAL segundos (e o marca fora do ar quando uma conexão é recusada).
+_modo_inferencia = os.environ.get('PREDICTION_USE_INFERENCE_SERVER', 'auto').lower()
+PREDICTION_USE_INFERENCE_SERVER = 'auto' if _modo_inferencia == 'auto' else _modo_inferencia in ('1', 'true', 'yes', 'on')
+PREDICTION_INFERENCE_SOCKET = os.environ.get('PREDICTION_INFERENCE_SOCKET', os.path.join(tempfile.gettempdir(), 'occupancy_api_inference.sock'))
+PREDICTION_INFERENCE_TIMEOUT = float(os.environ.get('PREDICTION_INFERENCE_TIMEOUT', 300))
+PREDICTION_INFERENCE_PROBE_INTERVAL = float(os.environ.get('PREDICTION_INFERENCE_PROBE_INTERVAL', 30))
+
+# Agregados por dia/semana/mês (PredictionRollup), recalculados a cada gravação de previsões
+# e lidos com ?resolution=D|W|M em /predictions. `manage.py rebuild_rollups` refaz tudo.
+PREDICTION_ROLLUPS_ENABLED = os.environ.get('PREDICTION_ROLLUPS_ENABLED', '1').lower() in ('1', 'true', 'yes', 'on')
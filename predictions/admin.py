@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Forecast, PredictionModel, Prediction
+from .models import Forecast, PredictionModel, Prediction, PredictionJob, PredictionArchive, PredictionRollup
 
 @admin.register(Forecast)
 class ForecastAdmin(admin.ModelAdmin):
@@ -8,13 +8,31 @@ class ForecastAdmin(admin.ModelAdmin):
 
 @admin.register(PredictionModel)
 class PredictionModelAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "forecast", "granularity", "path", "created_at")
+    list_display = ("id", "name", "forecast", "granularity", "path", "horizon_days", "materialized_until", "created_at")
     list_filter = ("forecast", "granularity")
     search_fields = ("name", "forecast__name")
+    readonly_fields = ("materialized_from", "materialized_until")
 
 @admin.register(Prediction)
 class PredictionAdmin(admin.ModelAdmin):
     list_display = ("id", "model", "prediction_datetime", "value", "created_at")
-    list_filter = ("model__forecast", "model")
+    list_filter = ("forecast", "model")
     date_hierarchy = "prediction_datetime"
     search_fields = ("model__name", "model__forecast__name")
+
+@admin.register(PredictionJob)
+class PredictionJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "model", "start_datetime", "end_datetime", "status", "progress", "rows_written", "attempts", "heartbeat_at", "created_at")
+    list_filter = ("status", "model")
+
+@admin.register(PredictionArchive)
+class PredictionArchiveAdmin(admin.ModelAdmin):
+    list_display = ("id", "model", "prediction_datetime", "value", "archived_at")
+    list_filter = ("forecast", "model")
+    date_hierarchy = "prediction_datetime"
+
+@admin.register(PredictionRollup)
+class PredictionRollupAdmin(admin.ModelAdmin):
+    list_display = ("id", "model", "resolution", "period_start", "value_sum", "value_mean", "value_max", "count", "updated_at")
+    list_filter = ("resolution", "model")
+    date_hierarchy = "period_start"
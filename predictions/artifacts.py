@@ -0,0 +1,94 @@
+# Em predictions/artifacts.py
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Versão do layout dos artefatos; artefatos de outra versão são ignorados
+# (2: o artefato do Prophet passou a incluir o histórico de treino)
+FORMATO = 2
+ARQUIVO_META = 'meta.json'
+
+
+def diretorio_artefato(model_path):
+    """Diretório do artefato de inferência gerado a partir de PredictionModel.path."""
+    nome = os.path.normpath(model_path).replace(os.sep, '__')
+    return os.path.join(settings.PREDICTION_ARTIFACT_DIR, nome)
+
+
+def _sha1(full_path):
+    h = hashlib.sha1()
+    with open(full_path, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def meta_valida(model_path, full_path, model_type):
+    """
+    Metadados do artefato, se ele existir e tiver sido gerado do arquivo original atual
+    (mesmo conteúdo e tipo); caso contrário None e o original é usado.
+    """
+    caminho_meta = os.path.join(diretorio_artefato(model_path), ARQUIVO_META)
+    try:
+        with open(caminho_meta, 'r') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get('formato') != FORMATO or meta.get('model_type') != model_type:
+        return None
+    if meta.get('origem_sha1') != _sha1(full_path):
+        logger.warning("Artefato de inferência desatualizado para %s; usando o arquivo original.", model_path)
+        return None
+    return meta
+
+
+def carregar(model_path, full_path, predictor):
+    """Carrega o artefato de inferência do modelo, ou None se não houver um válido."""
+    meta = meta_valida(model_path, full_path, predictor.model_type)
+    if meta is None:
+        return None
+    destino = diretorio_artefato(model_path)
+    logger.info("Carregando artefato de inferência de: %s", destino)
+    return predictor.load_artifact(destino, meta)
+
+
+def exportar(model_path, full_path, predictor, modelo):
+    """
+    Grava o artefato de inferência do modelo já carregado. A escrita é feita num diretório
+    temporário e trocada de uma vez, para que um worker nunca leia um artefato pela metade.
+    Retorna o diretório do artefato.
+    """
+    destino = diretorio_artefato(model_path)
+    os.makedirs(settings.PREDICTION_ARTIFACT_DIR, exist_ok=True)
+    temporario = tempfile.mkdtemp(prefix='.tmp_', dir=settings.PREDICTION_ARTIFACT_DIR)
+    try:
+        meta = predictor.export_artifact(modelo, temporario)
+        meta.update({
+            'formato': FORMATO,
+            'model_type': predictor.model_type,
+            'origem': model_path,
+            'origem_sha1': _sha1(full_path),
+        })
+        with open(os.path.join(temporario, ARQUIVO_META), 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.chmod(temporario, 0o755)
+
+        antigo = None
+        if os.path.exists(destino):
+            antigo = tempfile.mkdtemp(prefix='.old_', dir=settings.PREDICTION_ARTIFACT_DIR)
+            os.replace(destino, os.path.join(antigo, 'artefato'))
+        os.replace(temporario, destino)
+        if antigo:
+            shutil.rmtree(antigo, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(temporario, ignore_errors=True)
+        raise
+    return destino
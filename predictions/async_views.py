@@ -0,0 +1,267 @@
+# Em predictions/async_views.py
+"""
+Versões assíncronas (ASGI) da leitura e da geração de previsões.
+
+As consultas ao banco usam o ORM assíncrono e a inferência (Prophet/XGBoost), que é
+CPU-bound, roda num executor de tamanho fixo (PREDICTION_INFERENCE_WORKERS threads).
+Assim um worker ASGI continua atendendo leituras em cache e intervalos já gravados
+enquanto um lazy load está gerando previsões.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse, JsonResponse
+from django.http.response import HttpResponseBase
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import encoders, metrics, rollups
+from .materialization import dentro_da_janela
+from .models import Prediction, PredictionModel
+from .streaming import CAMPOS_PREDICTION
+from .views import (
+    ForecastResultView,
+    PredictionSeriesView,
+    consulta_previsoes,
+    consulta_rollups,
+    consulta_serie,
+    grade_esperada,
+    guardar_resposta,
+    normalizar_consulta,
+    parse_and_validate_dates,
+    process_missing_predictions,
+    process_prediction_task,
+    resposta_em_cache,
+    serializar_serie,
+)
+
+logger = logging.getLogger(__name__)
+
+# Criado sem threads: elas só sobem na primeira tarefa (seguro com o preload_app do gunicorn)
+_executor = ThreadPoolExecutor(max_workers=settings.PREDICTION_INFERENCE_WORKERS, thread_name_prefix='inferencia')
+
+
+async def em_executor(funcao, *args):
+    """
+    Roda funcao(*args) (inferência/ORM síncrono) no executor de inferência sem bloquear o
+    event loop. O contexto é copiado para que as etapas entrem no Server-Timing da requisição.
+    """
+    contexto = contextvars.copy_context()
+
+    def executar():
+        close_old_connections()
+        try:
+            return funcao(*args)
+        finally:
+            close_old_connections()
+
+    return await asyncio.get_running_loop().run_in_executor(_executor, contexto.run, executar)
+
+
+async def alazy_load_predictions(model_db, start_str, end_str):
+    """
+    Equivalente assíncrono de views.lazy_load_predictions: a checagem do intervalo é feita
+    com o ORM assíncrono e só a geração dos pontos faltantes vai para o executor.
+    Retorna (start_naive, end_naive, completo).
+    """
+    start_naive, end_naive = parse_and_validate_dates(start_str, end_str, granularity=model_db.granularity)
+    if dentro_da_janela(model_db, start_naive, end_naive):
+        return start_naive, end_naive, True
+
+    grade = grade_esperada(model_db, start_naive, end_naive)
+    if grade.empty:
+        return start_naive, end_naive, True
+    existentes = await Prediction.objects.filter(
+        model_id=model_db.id, prediction_datetime__range=(grade[0], grade[-1])
+    ).acount()
+    if existentes >= len(grade):
+        return start_naive, end_naive, True
+
+    try:
+        await em_executor(process_missing_predictions, model_db, start_naive, end_naive)
+    except Exception:
+        logger.exception("Erro no lazy loading do modelo ID %s", model_db.id)
+        return start_naive, end_naive, False
+    return start_naive, end_naive, True
+
+
+async def _intervalo_com_lazy_load(model_id, start_str, end_str):
+    """
+    Como ForecastResultView._montar_queryset: faz o lazy load quando model_id, start_date e
+    end_date são informados. Retorna (intervalo, completo); erros são só registrados.
+    """
+    if not (start_str and end_str and model_id):
+        return None, True
+    try:
+        model_db = await PredictionModel.objects.aget(id=model_id)
+        start_naive, end_naive, completo = await alazy_load_predictions(model_db, start_str, end_str)
+    except Exception:
+        logger.exception("Erro no lazy loading do modelo ID %s", model_id)
+        return None, True
+    return (start_naive, end_naive), completo
+
+
+async def _com_cache(request, rota, forecast_id, gerar, *extras):
+    """
+    Mesmo cache HTTP (e mesmas chaves) das views síncronas (ver PredictionCacheMixin). `gerar` é
+    uma corrotina que devolve (conteudo, content_type, completo) ou uma resposta de erro.
+    """
+    normalizada = await sync_to_async(normalizar_consulta)(rota, request.GET, forecast_id, *extras)
+    if normalizada is None:
+        resultado = await gerar()
+        return resultado if isinstance(resultado, HttpResponseBase) else HttpResponse(resultado[0], content_type=resultado[1])
+
+    chave, model_id = normalizada
+    resposta, etag, modificado_em = await sync_to_async(resposta_em_cache)(request, chave, model_id, forecast_id)
+    if resposta is not None:
+        return resposta
+
+    resultado = await gerar()
+    if isinstance(resultado, HttpResponseBase):
+        return resultado
+    conteudo, content_type, completo = resultado
+    return await sync_to_async(guardar_resposta)(chave, model_id, forecast_id, etag, modificado_em, conteudo, content_type, completo)
+
+
+class AsyncForecastResultView(View):
+    """
+    GET: Previsões do Forecast (lista JSON com os campos de /predictions, sem paginação),
+    com lazy loading quando model_id, start_date e end_date são informados.
+    Com ?resolution=D|W|M devolve os agregados, como ForecastResultView.list_rollups.
+    """
+
+    async def get(self, request, forecast_id):
+        model_id = request.GET.get('model_id')
+        start_str = request.GET.get('start_date')
+        end_str = request.GET.get('end_date')
+        resolucao = request.GET.get('resolution')
+
+        if resolucao:
+            resolucao = resolucao.upper()
+            if resolucao not in rollups.RESOLUCOES:
+                return JsonResponse({"erro": "resolution deve ser D, W ou M."}, status=400)
+
+            async def gerar_rollups():
+                intervalo, completo = await _intervalo_com_lazy_load(model_id, start_str, end_str)
+                with metrics.etapa('serialize'):
+                    linhas = [linha async for linha in consulta_rollups(forecast_id, resolucao, model_id, intervalo)]
+                    corpo = encoders.dumps(linhas)
+                return corpo, 'application/json', completo
+
+            return await _com_cache(request, ForecastResultView.cache_rota, forecast_id, gerar_rollups, 'rollup', resolucao)
+
+        async def gerar():
+            intervalo, completo = await _intervalo_com_lazy_load(model_id, start_str, end_str)
+            with metrics.etapa('serialize'):
+                queryset = consulta_previsoes(forecast_id, model_id, intervalo)
+                linhas = [linha async for linha in queryset.values(*CAMPOS_PREDICTION)]
+                corpo = encoders.dumps(linhas)
+            return corpo, 'application/json', completo
+
+        # Sem paginação: a mesma chave da consulta síncrona sem page_size/cursor
+        return await _com_cache(request, ForecastResultView.cache_rota, forecast_id, gerar, None, None)
+
+
+class AsyncPredictionSeriesView(View):
+    """
+    GET: Série de um modelo em formato colunar ({"t": [...], "v": [...]}), como /series.
+    """
+
+    async def get(self, request, forecast_id):
+        model_id = request.GET.get('model_id')
+        start_str = request.GET.get('start_date')
+        end_str = request.GET.get('end_date')
+
+        if not model_id:
+            return JsonResponse({"erro": "model_id é obrigatório."}, status=400)
+
+        async def gerar():
+            try:
+                model_db = await PredictionModel.objects.aget(id=model_id, forecast_id=forecast_id)
+            except (PredictionModel.DoesNotExist, ValueError):
+                return JsonResponse({"erro": "Modelo não encontrado."}, status=404)
+
+            intervalo, completo = None, True
+            if start_str and end_str:
+                try:
+                    start_naive, end_naive, completo = await alazy_load_predictions(model_db, start_str, end_str)
+                except ValueError as ve:
+                    return JsonResponse({"erro": str(ve)}, status=400)
+                intervalo = (start_naive, end_naive)
+
+            with metrics.etapa('serialize'):
+                linhas = [linha async for linha in consulta_serie(model_db, intervalo)]
+                corpo = serializar_serie(model_db, linhas)
+            return corpo, 'application/json', completo
+
+        return await _com_cache(request, PredictionSeriesView.cache_rota, forecast_id, gerar)
+
+
+def _autenticar(request):
+    """
+    Autentica com as mesmas classes do DRF (sessão com CSRF, Basic...), como as views
+    síncronas. Retorna a resposta de erro, ou None se o usuário está autenticado.
+    """
+    drf_request = Request(request, authenticators=[classe() for classe in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        usuario = drf_request.user
+    except exceptions.APIException as e:
+        return JsonResponse({"detail": str(e.detail)}, status=e.status_code)
+    if not (usuario and usuario.is_authenticated):
+        erro = exceptions.NotAuthenticated()
+        return JsonResponse({"detail": str(erro.detail)}, status=403)
+    return None
+
+
+class AsyncGeneratePredictionView(View):
+    """
+    POST: Força a geração de previsões, como /predict/, com a inferência no executor.
+    Corpo JSON: {"model_id", "data_inicio", "data_fim"}.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # A checagem de CSRF fica com a autenticação por sessão, como no APIView
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def post(self, request):
+        erro = await sync_to_async(_autenticar)(request)
+        if erro is not None:
+            return erro
+
+        try:
+            dados = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({"erro": "JSON inválido."}, status=400)
+
+        model_id = dados.get('model_id')
+        start_str = dados.get('data_inicio')
+        end_str = dados.get('data_fim')
+        if not all([model_id, start_str, end_str]):
+            return JsonResponse({"erro": "Campos obrigatórios faltando."}, status=400)
+
+        try:
+            model_db = await PredictionModel.objects.aget(id=model_id)
+            start_naive, end_naive = parse_and_validate_dates(start_str, end_str, granularity=model_db.granularity)
+            qtd = await em_executor(process_prediction_task, model_db, start_naive, end_naive)
+        except PredictionModel.DoesNotExist:
+            return JsonResponse({"erro": "Modelo não encontrado."}, status=404)
+        except ValueError as ve:
+            return JsonResponse({"erro": str(ve)}, status=400)
+        except Exception as e:
+            logger.exception("Erro ao gerar previsões do modelo ID %s", model_id)
+            return JsonResponse({"erro": f"Erro interno: {str(e)}"}, status=500)
+
+        return JsonResponse(
+            {"status": "Processamento concluído", "registros_gerados": qtd, "forecast_id": model_db.forecast_id},
+            status=201,
+        )
@@ -0,0 +1,25 @@
+# Em predictions/encoders.py
+import json
+from datetime import datetime
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele usamos o json da biblioteca padrão
+    orjson = None
+
+
+def _default(valor):
+    if isinstance(valor, datetime):
+        texto = valor.isoformat()
+        return texto[:-6] + 'Z' if texto.endswith('+00:00') else texto
+    raise TypeError(f"Objeto do tipo {type(valor).__name__} não é serializável em JSON")
+
+
+def dumps(obj):
+    """
+    Serializa para JSON (bytes) usando orjson quando disponível.
+    Datetimes em UTC saem em ISO 8601 com sufixo Z, como no DRF.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode('utf-8')
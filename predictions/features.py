@@ -0,0 +1,163 @@
+# Em predictions/features.py
+from datetime import date
+from functools import lru_cache
+
+import holidays
+import numpy as np
+import pandas as pd
+
+# Ordem exata das colunas usada no treinamento do XGBoost
+FEATURES_XGBOOST = [
+    'is_segunda', 'is_terca', 'is_quarta', 'is_quinta', 'is_sexta', 'is_sabado', 'is_domingo',
+    'mes_sin', 'mes_cos', 'dia_mes', 'ano', 'eh_feriado'
+]
+
+PAIS_FERIADOS = 'BR'
+# Pontos facultativos que o modelo trata como feriado (além dos feriados nacionais)
+FERIADOS_FACULTATIVOS = ('Carnaval', 'Corpus Christi')
+
+# As datas gravadas são naive em UTC; os modelos foram treinados no horário local (UTC-3)
+DESLOCAMENTO_LOCAL = pd.Timedelta(hours=3)
+
+# Faixa mínima coberta pela tabela de calendário; é ampliada se a requisição sair dela
+ANO_INICIO_CALENDARIO = 2015
+ANOS_FUTUROS_CALENDARIO = 15
+
+
+def feriados(ano_inicio, ano_fim):
+    """
+    Datas tratadas como feriado entre ano_inicio e ano_fim (inclusive), vindas do pacote holidays.
+    """
+    anos = range(ano_inicio, ano_fim + 1)
+    datas = set(holidays.country_holidays(PAIS_FERIADOS, years=anos, language='pt_BR').keys())
+    facultativos = holidays.country_holidays(PAIS_FERIADOS, years=anos, categories=('optional',), language='pt_BR')
+    datas.update(dia for dia, nome in facultativos.items() if nome in FERIADOS_FACULTATIVOS)
+    return np.array(sorted(datas), dtype='datetime64[D]')
+
+
+@lru_cache(maxsize=4)
+def _tabela_calendario(ano_inicio, ano_fim):
+    """
+    Pré-calcula, uma linha por dia, as features de calendário na ordem de FEATURES_XGBOOST.
+    A tabela é somente leitura e compartilhada entre requisições.
+    """
+    dias = np.arange(
+        np.datetime64(f'{ano_inicio:04d}-01-01'), np.datetime64(f'{ano_fim + 1:04d}-01-01'), dtype='datetime64[D]'
+    )
+    # 1970-01-01 foi quinta-feira (dayofweek == 3)
+    dia_semana = (dias.astype(np.int64) + 3) % 7
+    ano = dias.astype('datetime64[Y]').astype(np.int64) + 1970
+    mes = dias.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    dia_mes = (dias - dias.astype('datetime64[M]')).astype(np.int64) + 1
+
+    tabela = np.empty((len(dias), len(FEATURES_XGBOOST)), dtype=np.float64)
+    tabela[:, 0:7] = dia_semana[:, None] == np.arange(7)
+    tabela[:, 7] = np.sin(2 * np.pi * mes / 12)
+    tabela[:, 8] = np.cos(2 * np.pi * mes / 12)
+    tabela[:, 9] = dia_mes
+    tabela[:, 10] = ano
+    tabela[:, 11] = np.isin(dias, feriados(ano_inicio, ano_fim))
+
+    tabela.setflags(write=False)
+    return dias[0], tabela
+
+
+def tabela_calendario(ano_min, ano_max):
+    """Retorna (primeiro_dia, tabela) cobrindo pelo menos os anos pedidos."""
+    ano_inicio = min(ANO_INICIO_CALENDARIO, ano_min)
+    ano_fim = max(date.today().year + ANOS_FUTUROS_CALENDARIO, ano_max)
+    return _tabela_calendario(ano_inicio, ano_fim)
+
+
+def matriz_features_xgboost(datas):
+    """
+    Monta a matriz de features (n_datas x len(FEATURES_XGBOOST)) fatiando a tabela de calendário.
+    Aceita qualquer sequência de datas (DatetimeIndex, Series ou array datetime64).
+    """
+    dias = np.asarray(datas, dtype='datetime64[ns]').astype('datetime64[D]')
+    if len(dias) == 0:
+        return np.empty((0, len(FEATURES_XGBOOST)), dtype=np.float64)
+
+    anos = np.array([dias.min(), dias.max()]).astype('datetime64[Y]').astype(np.int64) + 1970
+    primeiro_dia, tabela = tabela_calendario(int(anos[0]), int(anos[1]))
+    return tabela[(dias - primeiro_dia).astype(np.int64)]
+
+
+def horario_local(datas):
+    """Converte as datas gravadas (naive, UTC) para o horário local usado no treino dos modelos."""
+    return pd.DatetimeIndex(datas) - DESLOCAMENTO_LOCAL
+
+
+# Features derivadas só da data local, disponíveis por nome em exog_columns/exog_rules
+FEATURES_DERIVADAS = {
+    'hora': lambda d: d.hour,
+    'dia_semana': lambda d: d.dayofweek,
+    'mes': lambda d: d.month,
+    'fim_de_semana': lambda d: d.dayofweek >= 5,
+    'dia_util': lambda d: d.dayofweek < 5,
+    'hora_sin': lambda d: np.sin(2 * np.pi * d.hour / 24),
+    'hora_cos': lambda d: np.cos(2 * np.pi * d.hour / 24),
+}
+
+
+def _indicador_datas(locais, datas):
+    dias = locais.values.astype('datetime64[D]')
+    return np.isin(dias, np.array(datas, dtype='datetime64[D]'))
+
+
+def _indicador_intervalos(locais, intervalos):
+    mascara = np.zeros(len(locais), dtype=bool)
+    for inicio, fim in intervalos:
+        mascara |= (locais >= pd.Timestamp(inicio)) & (locais <= pd.Timestamp(fim))
+    return mascara
+
+
+# Regras em forma de dicionário: {"<tipo>": <parâmetro>}
+REGRAS_EXOG = {
+    'constante': lambda d, valor: np.full(len(d), valor, dtype=np.float64),
+    'dia_semana': lambda d, valores: np.isin(d.dayofweek, valores),
+    'mes': lambda d, valores: np.isin(d.month, valores),
+    'hora': lambda d, valores: np.isin(d.hour, valores),
+    'datas': _indicador_datas,
+    'intervalos': _indicador_intervalos,
+}
+
+
+def prepare_future_exog(colunas, regras, datas):
+    """
+    Monta a matriz exógena (n_datas x len(colunas)) para as datas futuras, coluna a coluna
+    e sem laço por data. Cada coluna é resolvida, nesta ordem:
+
+    - pela regra em `regras` (exog_rules): o nome de uma feature (ex.: "eh_feriado") ou um
+      dicionário como {"dia_semana": [5, 6]}, {"mes": [12, 1]}, {"hora": [11, 12]},
+      {"datas": ["2025-12-24"]}, {"intervalos": [["2025-12-20", "2026-01-05 23:00"]]} ou
+      {"constante": 1};
+    - pelo próprio nome, se for uma feature de calendário (FEATURES_XGBOOST) ou derivada.
+
+    As regras são avaliadas no horário local, como no treino dos modelos.
+    """
+    regras = regras or {}
+    locais = horario_local(datas)
+    matriz = np.empty((len(locais), len(colunas)), dtype=np.float64)
+    calendario = None
+
+    for i, coluna in enumerate(colunas):
+        regra = regras.get(coluna, coluna)
+
+        if isinstance(regra, dict):
+            if len(regra) != 1 or next(iter(regra)) not in REGRAS_EXOG:
+                raise ValueError(f"Regra inválida para a coluna exógena '{coluna}': {regra}")
+            tipo, parametro = next(iter(regra.items()))
+            matriz[:, i] = REGRAS_EXOG[tipo](locais, parametro)
+        elif regra in FEATURES_XGBOOST:
+            if calendario is None:
+                calendario = matriz_features_xgboost(locais)
+            matriz[:, i] = calendario[:, FEATURES_XGBOOST.index(regra)]
+        elif regra in FEATURES_DERIVADAS:
+            matriz[:, i] = FEATURES_DERIVADAS[regra](locais)
+        else:
+            raise ValueError(
+                f"Coluna exógena '{coluna}' sem regra em exog_rules e sem feature com esse nome."
+            )
+
+    return matriz
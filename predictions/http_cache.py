@@ -0,0 +1,117 @@
+# Em predictions/http_cache.py
+import hashlib
+import time
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, quote_etag
+
+# Alias em settings.CACHES compartilhado pelos workers do host (FileBasedCache por padrão)
+CACHE_ALIAS = 'predictions'
+TIMEOUT_CORPO = 24 * 3600
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def model_meta(model_id):
+    """
+    (forecast_id, granularity) do modelo, guardado no cache para que uma requisição
+    condicional não precise consultar o banco. Retorna None se o modelo não existir.
+    """
+    from .models import PredictionModel
+
+    chave = f"pred_meta:{model_id}"
+    meta = _cache().get(chave)
+    if meta is None:
+        meta = PredictionModel.objects.filter(id=model_id).values_list('forecast_id', 'granularity').first()
+        if meta is None:
+            return None
+        _cache().set(chave, tuple(meta), timeout=None)
+    return meta
+
+
+def invalidate_model_meta(model_id):
+    _cache().delete(f"pred_meta:{model_id}")
+
+
+def _versao(escopo):
+    """(token, timestamp) da última escrita no escopo ('model:<id>' ou 'forecast:<id>')."""
+    chave = f"pred_versao:{escopo}"
+    versao = _cache().get(chave)
+    if versao is None:
+        versao = (uuid.uuid4().hex, int(time.time()))
+        _cache().add(chave, versao, timeout=None)
+        versao = _cache().get(chave, versao)
+    return versao
+
+
+def _renovar_versao(model_id, forecast_ids):
+    versao = (uuid.uuid4().hex, int(time.time()))
+    chaves = {f"pred_versao:model:{model_id}": versao}
+    chaves.update({f"pred_versao:forecast:{forecast_id}": versao for forecast_id in forecast_ids})
+    _cache().set_many(chaves, timeout=None)
+
+
+def invalidate_predictions(model_db, forecast_ids=()):
+    """
+    Invalida as respostas em cache do modelo e do seu Forecast, além dos `forecast_ids`
+    informados (ex.: o Forecast anterior de um modelo que trocou de Forecast).
+    Executado após o commit, para que ninguém guarde dados antigos com a versão nova.
+    """
+    # Os IDs são lidos agora: depois de um delete() o Django zera o pk da instância
+    model_id = model_db.id
+    ids = {model_db.forecast_id, *forecast_ids}
+    transaction.on_commit(lambda: _renovar_versao(model_id, ids))
+
+
+def validadores(chave_consulta, model_id=None, forecast_id=None):
+    """ETag e Last-Modified da consulta normalizada, na versão atual dos dados."""
+    token, modificado_em = _versao(f"model:{model_id}" if model_id else f"forecast:{forecast_id}")
+    etag = quote_etag(hashlib.sha1(f"{chave_consulta}|{token}".encode('utf-8')).hexdigest())
+    return etag, modificado_em
+
+
+def not_modified(request, etag, modificado_em):
+    """
+    Resposta 304 se o cliente já tem a versão atual (If-None-Match); caso contrário None.
+    If-Modified-Since não é usado: o Last-Modified tem resolução de 1 segundo e duas escritas
+    no mesmo segundo dariam um 304 com dados antigos. Toda resposta leva o ETag.
+    """
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is None:
+        return None
+    etags = parse_etags(if_none_match)
+    # Comparação fraca (RFC 9110): ignora o prefixo W/
+    if '*' in etags or etag in (e.removeprefix('W/') for e in etags):
+        return _com_validadores(HttpResponseNotModified(), etag, modificado_em)
+    return None
+
+
+def cached_response(etag, modificado_em):
+    """Corpo já renderizado desta consulta/versão, se existir."""
+    corpo = _cache().get(f"pred_corpo:{etag}")
+    if corpo is None:
+        return None
+    conteudo, content_type = corpo
+    return _com_validadores(HttpResponse(conteudo, content_type=content_type), etag, modificado_em)
+
+
+def store_response(etag, modificado_em, conteudo, content_type):
+    """
+    Guarda o corpo só após o commit: dentro de uma transação aberta ele pode conter escritas
+    que serão desfeitas (ex.: benchmark_read_path), e o cache é compartilhado pelos workers.
+    Fora de transação o on_commit executa na hora.
+    """
+    transaction.on_commit(lambda: _cache().set(f"pred_corpo:{etag}", (conteudo, content_type), timeout=TIMEOUT_CORPO))
+    return _com_validadores(HttpResponse(conteudo, content_type=content_type), etag, modificado_em)
+
+
+def _com_validadores(resposta, etag, modificado_em):
+    resposta['ETag'] = etag
+    resposta['Last-Modified'] = http_date(modificado_em)
+    resposta['Cache-Control'] = 'no-cache'
+    return resposta
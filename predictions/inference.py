@@ -0,0 +1,270 @@
+# Em predictions/inference.py
+"""
+Servidor de inferência local (um por host) e o cliente usado pelos workers web.
+
+O servidor (`manage.py inference_server`) é o único processo que mantém os modelos
+carregados; os workers pedem previsões por um socket Unix e não carregam nada. Pedidos
+simultâneos para o mesmo modelo que chegam dentro da janela de batching (ou enquanto
+um lote do modelo ainda está rodando) são atendidos com uma única chamada a `prever`
+sobre a união das datas.
+
+Protocolo: cada mensagem é um frame com dois inteiros de 32 bits (tamanho do cabeçalho
+JSON e do payload binário), o cabeçalho e o payload.
+  pedido:   {"model_id": id, "n": n}            + n datas int64 (ns, UTC naive)
+  resposta: {"n": k, "inteiro": bool}           + k datas int64 + k valores float64
+  erro:     {"erro": mensagem, "tipo": classe}
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_FRAME = struct.Struct('!II')
+_INT64 = np.dtype('<i8')
+_FLOAT64 = np.dtype('<f8')
+
+
+class ServidorIndisponivel(ConnectionError):
+    """O servidor de inferência não está rodando (socket ausente ou recusando conexões)."""
+
+
+class ErroInferencia(Exception):
+    """Erro devolvido pelo servidor de inferência."""
+
+
+def _montar_frame(cabecalho, payload=b''):
+    texto = json.dumps(cabecalho).encode('utf-8')
+    return _FRAME.pack(len(texto), len(payload)) + texto + payload
+
+
+def _decodificar_resposta(cabecalho, payload):
+    if 'erro' in cabecalho:
+        # ValueError continua ValueError (as views respondem 400), como na inferência local
+        classe = ValueError if cabecalho.get('tipo') == 'ValueError' else ErroInferencia
+        raise classe(cabecalho['erro'])
+
+    n = cabecalho['n']
+    datas = np.frombuffer(payload, dtype=_INT64, count=n)
+    valores = np.frombuffer(payload, dtype=_FLOAT64, count=n, offset=n * _INT64.itemsize)
+    df = pd.DataFrame({'prediction_datetime': pd.DatetimeIndex(datas.astype('datetime64[ns]')), 'value': valores})
+    if cabecalho['inteiro']:
+        df = df.astype({'value': int})
+    return df
+
+
+# ---------------------------------------------------------------------------
+# Cliente (workers web)
+# ---------------------------------------------------------------------------
+
+# Resultado da última sonda do modo 'auto' por caminho de socket: (servidor vivo, instante da sonda)
+_sondas = {}
+_sondas_lock = threading.Lock()
+
+
+def _servidor_vivo(caminho):
+    """Se há um servidor aceitando conexões no socket (um arquivo órfão de um servidor que caiu não conta)."""
+    if not os.path.exists(caminho):
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(1)
+        try:
+            sock.connect(caminho)
+        except OSError:
+            return False
+    return True
+
+
+def _marcar_indisponivel(caminho):
+    # Uma conexão recusada vale como sonda: até a próxima, os pedidos vão direto para a inferência local
+    with _sondas_lock:
+        _sondas[caminho] = (False, time.monotonic())
+
+
+def habilitado():
+    """
+    Se a inferência deve ser pedida ao servidor do host. No modo 'auto' o processo testa a conexão
+    com o socket no máximo uma vez a cada PREDICTION_INFERENCE_PROBE_INTERVAL segundos e guarda o
+    resultado; sem servidor a inferência é feita no próprio processo.
+    """
+    modo = settings.PREDICTION_USE_INFERENCE_SERVER
+    if not hasattr(socket, 'AF_UNIX') or not modo:
+        return False
+    if modo != 'auto':
+        return True
+
+    caminho = settings.PREDICTION_INFERENCE_SOCKET
+    with _sondas_lock:
+        sonda = _sondas.get(caminho)
+        agora = time.monotonic()
+        if sonda is None or agora - sonda[1] >= settings.PREDICTION_INFERENCE_PROBE_INTERVAL:
+            sonda = _sondas[caminho] = (_servidor_vivo(caminho), agora)
+    return sonda[0]
+
+
+def _receber_exato(sock, tamanho):
+    partes = []
+    while tamanho:
+        bloco = sock.recv(min(tamanho, 1 << 20))
+        if not bloco:
+            raise ErroInferencia("Conexão encerrada pelo servidor de inferência.")
+        partes.append(bloco)
+        tamanho -= len(bloco)
+    return b''.join(partes)
+
+
+def prever_remoto(model_db, datas, timeout=None):
+    """
+    Pede ao servidor de inferência as previsões do modelo para as datas (naive, UTC).
+    Devolve o mesmo DataFrame (prediction_datetime, value) de predictors.prever.
+    Levanta ServidorIndisponivel se não houver servidor escutando no socket.
+    """
+    datas = pd.DatetimeIndex(datas)
+    payload = np.ascontiguousarray(datas.asi8, dtype=_INT64).tobytes()
+    inicio = time.perf_counter()
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout or settings.PREDICTION_INFERENCE_TIMEOUT)
+        try:
+            sock.connect(settings.PREDICTION_INFERENCE_SOCKET)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            _marcar_indisponivel(settings.PREDICTION_INFERENCE_SOCKET)
+            raise ServidorIndisponivel(f"Servidor de inferência indisponível em {settings.PREDICTION_INFERENCE_SOCKET}: {e}")
+        sock.sendall(_montar_frame({'model_id': model_db.id, 'n': len(datas)}, payload))
+        tamanho_cabecalho, tamanho_payload = _FRAME.unpack(_receber_exato(sock, _FRAME.size))
+        cabecalho = json.loads(_receber_exato(sock, tamanho_cabecalho))
+        resposta = _receber_exato(sock, tamanho_payload)
+
+    df = _decodificar_resposta(cabecalho, resposta)
+    metrics.registrar_etapa('inference_remote', time.perf_counter() - inicio)
+    logger.debug("Modelo ID %s: %s pontos do servidor de inferência em %.1f ms", model_db.id, len(df), (time.perf_counter() - inicio) * 1000)
+    return df
+
+
+# ---------------------------------------------------------------------------
+# Servidor (manage.py inference_server)
+# ---------------------------------------------------------------------------
+
+class ServidorInferencia:
+    """
+    Atende pedidos de previsão pelo socket Unix. Os pedidos de cada modelo entram numa fila;
+    o primeiro agenda o lote, que espera `janela` segundos (e o término do lote anterior do
+    mesmo modelo) e roda uma única inferência com a união das datas no executor.
+    """
+
+    def __init__(self, janela=0.005, workers=2):
+        self.janela = janela
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='inferencia')
+        self._filas = {}
+        self._locks = {}
+        self._tarefas = set()
+        self.lotes = 0
+        self.pedidos = 0
+
+    async def atender(self, reader, writer):
+        try:
+            while True:
+                try:
+                    tamanho_cabecalho, tamanho_payload = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+                except asyncio.IncompleteReadError:
+                    break
+                cabecalho = json.loads(await reader.readexactly(tamanho_cabecalho))
+                payload = await reader.readexactly(tamanho_payload)
+
+                try:
+                    datas = np.frombuffer(payload, dtype=_INT64, count=cabecalho['n'])
+                    inteiro, res_datas, res_valores = await self._enfileirar(int(cabecalho['model_id']), datas)
+                    resposta = _montar_frame(
+                        {'n': len(res_datas), 'inteiro': inteiro},
+                        res_datas.astype(_INT64).tobytes() + res_valores.astype(_FLOAT64).tobytes(),
+                    )
+                except Exception as e:
+                    resposta = _montar_frame({'erro': str(e), 'tipo': type(e).__name__})
+                writer.write(resposta)
+                await writer.drain()
+        except (ConnectionError, ValueError) as e:
+            logger.warning("Conexão de inferência encerrada com erro: %s", e)
+        finally:
+            writer.close()
+
+    async def _enfileirar(self, model_id, datas):
+        futuro = asyncio.get_running_loop().create_future()
+        fila = self._filas.setdefault(model_id, [])
+        fila.append((datas, futuro))
+        if len(fila) == 1:
+            tarefa = asyncio.create_task(self._despachar(model_id))
+            self._tarefas.add(tarefa)
+            tarefa.add_done_callback(self._tarefas.discard)
+        return await futuro
+
+    async def _despachar(self, model_id):
+        await asyncio.sleep(self.janela)
+        # Enquanto o lote anterior do modelo roda, os novos pedidos se acumulam na fila
+        async with self._locks.setdefault(model_id, asyncio.Lock()):
+            pedidos = self._filas.pop(model_id, [])
+            if not pedidos:
+                return
+            try:
+                inteiro, res_datas, res_valores = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self._prever, model_id, [datas for datas, _ in pedidos]
+                )
+            except Exception as e:
+                for _, futuro in pedidos:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                return
+
+        self.lotes += 1
+        self.pedidos += len(pedidos)
+        for datas, futuro in pedidos:
+            if futuro.done():
+                continue
+            mascara = np.isin(res_datas, datas)
+            futuro.set_result((inteiro, res_datas[mascara], res_valores[mascara]))
+
+    def _prever(self, model_id, lista_datas):
+        from .models import PredictionModel
+        from .predictors import get_predictor, prever
+        from .registry import model_registry
+
+        close_old_connections()
+        # Lido a cada lote: mudanças de granularidade/exógenas no Admin valem sem reiniciar
+        model_db = PredictionModel.objects.get(id=model_id)
+        with metrics.etapa('load'):
+            modelo = model_registry.get(model_db)
+
+        todas = np.unique(np.concatenate(lista_datas))
+        df = prever(model_db, modelo, pd.DatetimeIndex(todas.astype('datetime64[ns]')))
+        logger.debug("Lote do modelo ID %s: %s pedido(s), %s datas.", model_id, len(lista_datas), len(todas))
+
+        res_datas = df['prediction_datetime'].to_numpy(dtype='datetime64[ns]').view(_INT64)
+        res_valores = df['value'].to_numpy(dtype=np.float64)
+        metrics.metricas.flush()
+        return get_predictor(model_db.model_type).valores_inteiros, res_datas, res_valores
+
+
+def preparar_socket(caminho):
+    """Remove um socket órfão; erro se já houver um servidor escutando nele."""
+    if not os.path.exists(caminho):
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(caminho)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(caminho)
+            return
+    raise RuntimeError(f"Já existe um servidor de inferência escutando em {caminho}.")
@@ -0,0 +1,102 @@
+# Em predictions/jobs.py
+import logging
+from datetime import timezone as dt_timezone
+
+import pandas as pd
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import PredictionJob
+
+logger = logging.getLogger(__name__)
+
+
+def claim_next_job():
+    """
+    Marca o próximo job pendente como 'running' e retorna seu ID (ou None).
+    O UPDATE condicional garante que dois workers nunca peguem o mesmo job.
+    """
+    pendentes = PredictionJob.objects.filter(status='pending').order_by('created_at', 'id')
+    for job_id in pendentes.values_list('id', flat=True)[:20]:
+        agora = timezone.now()
+        claimed = PredictionJob.objects.filter(id=job_id, status='pending').update(
+            status='running', started_at=agora, heartbeat_at=agora, progress=0, attempts=F('attempts') + 1
+        )
+        if claimed:
+            return job_id
+    return None
+
+
+def heartbeat(job_ids):
+    """Renova o lease dos jobs que este worker está executando."""
+    if not job_ids:
+        return 0
+    return PredictionJob.objects.filter(id__in=list(job_ids), status='running').update(heartbeat_at=timezone.now())
+
+
+def requeue_expired_jobs(lease_seconds=None, max_attempts=None):
+    """
+    Jobs 'running' cujo worker parou de renovar o lease (ex.: processo morto no meio do job)
+    voltam para 'pending'; os que já usaram todas as tentativas são marcados como 'failed'.
+    Retorna (reenfileirados, falhos).
+    """
+    lease_seconds = settings.PREDICTION_JOB_LEASE_SECONDS if lease_seconds is None else lease_seconds
+    max_attempts = settings.PREDICTION_JOB_MAX_ATTEMPTS if max_attempts is None else max_attempts
+    agora = timezone.now()
+    limite = agora - pd.Timedelta(seconds=lease_seconds)
+
+    # Jobs de antes do heartbeat só têm started_at
+    expirados = PredictionJob.objects.filter(status='running').filter(
+        Q(heartbeat_at__lt=limite) | Q(heartbeat_at__isnull=True, started_at__lt=limite)
+    )
+    falhos = expirados.filter(attempts__gte=max_attempts).update(
+        status='failed', finished_at=agora,
+        error=f"Worker parou de responder (lease de {lease_seconds:.0f}s expirado) em {max_attempts} tentativa(s).",
+    )
+    reenfileirados = expirados.filter(attempts__lt=max_attempts).update(
+        status='pending', started_at=None, heartbeat_at=None, progress=0, rows_written=0
+    )
+    return reenfileirados, falhos
+
+
+def _naive_utc(valor):
+    return pd.Timestamp(valor.astimezone(dt_timezone.utc).replace(tzinfo=None))
+
+
+def run_prediction_job(job_id, pontos_por_lote=24 * 30):
+    """
+    Executa um job já reservado: gera o intervalo em lotes de `pontos_por_lote` datas
+    e atualiza o progresso no banco após cada lote.
+    """
+    from .views import grade_esperada, process_prediction_task
+
+    close_old_connections()
+    job = PredictionJob.objects.select_related('model').get(id=job_id)
+    try:
+        model_db = job.model
+        inicio = _naive_utc(job.start_datetime)
+        fim = _naive_utc(job.end_datetime)
+
+        datas = grade_esperada(model_db, inicio, fim)
+        lotes = [datas[i:i + pontos_por_lote] for i in range(0, len(datas), pontos_por_lote)]
+
+        gravados = 0
+        for numero, lote in enumerate(lotes, start=1):
+            gravados += process_prediction_task(model_db, lote[0], lote[-1], future_dates=lote)
+            PredictionJob.objects.filter(id=job_id).update(
+                progress=round(numero / len(lotes), 4), rows_written=gravados, heartbeat_at=timezone.now()
+            )
+
+        PredictionJob.objects.filter(id=job_id).update(
+            status='done', progress=1, rows_written=gravados, finished_at=timezone.now()
+        )
+        return gravados
+    except Exception as e:
+        # O traceback vai só para o log: o erro do job é exposto pela API
+        logger.exception("Job %s falhou", job_id)
+        PredictionJob.objects.filter(id=job_id).update(status='failed', error=str(e), finished_at=timezone.now())
+        raise
+    finally:
+        connection.close()
@@ -0,0 +1,94 @@
+# Em predictions/locks.py
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem flock, a coordenação fica restrita ao processo
+    fcntl = None
+
+# Quantidade fixa de locks: as chaves são espalhadas por hash entre eles, então o número de
+# arquivos de lock (e de locks em memória) não cresce com os intervalos pedidos
+SLOTS = 256
+
+_thread_locks = tuple(threading.Lock() for _ in range(SLOTS))
+_slots_da_thread = threading.local()
+
+
+def _slot(chave):
+    # sha1 e não hash(): o slot de uma chave precisa ser o mesmo em todos os processos
+    return int.from_bytes(hashlib.sha1(chave.encode('utf-8')).digest()[:8], 'big') % SLOTS
+
+
+def _caminho_lock(slot):
+    os.makedirs(settings.PREDICTION_LOCK_DIR, exist_ok=True)
+    return os.path.join(settings.PREDICTION_LOCK_DIR, f"slot_{slot:03d}.lock")
+
+
+def _slots_detidos():
+    if not hasattr(_slots_da_thread, 'slots'):
+        _slots_da_thread.slots = set()
+    return _slots_da_thread.slots
+
+
+@contextmanager
+def _flock(chave, slot, timeout):
+    with open(_caminho_lock(slot), 'a') as f:
+        limite = None if timeout is None else time.monotonic() + timeout
+        esperou = False
+        while True:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                esperou = True
+                if limite is not None and time.monotonic() >= limite:
+                    raise TimeoutError(f"Tempo esgotado aguardando o lock '{chave}'.")
+                time.sleep(0.05)
+        try:
+            yield esperou
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def _thread_lock(chave, slot, timeout):
+    lock = _thread_locks[slot]
+    esperou = not lock.acquire(blocking=False)
+    if esperou and not lock.acquire(timeout=-1 if timeout is None else timeout):
+        raise TimeoutError(f"Tempo esgotado aguardando o lock '{chave}'.")
+    try:
+        yield esperou
+    finally:
+        lock.release()
+
+
+@contextmanager
+def single_flight(chave, timeout=None):
+    """
+    Exclusão mútua por chave entre threads e entre processos (workers do gunicorn) do mesmo host,
+    usando flock em um de SLOTS arquivos fixos, escolhido pelo hash da chave. O valor do `with`
+    indica se foi preciso esperar outro chamador; quem esperou deve conferir de novo o estado
+    antes de refazer o trabalho. Chaves diferentes no mesmo slot apenas se serializam; uma chave
+    aninhada que cai no slot já detido pela thread segue sem esperar.
+    """
+    if timeout is None:
+        timeout = settings.PREDICTION_LOCK_TIMEOUT
+    slot = _slot(chave)
+    detidos = _slots_detidos()
+    if slot in detidos:
+        yield False
+        return
+
+    lock = _thread_lock if fcntl is None else _flock
+    with lock(chave, slot, timeout) as esperou:
+        detidos.add(slot)
+        try:
+            yield esperou
+        finally:
+            detidos.discard(slot)
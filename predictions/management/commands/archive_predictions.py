@@ -0,0 +1,91 @@
+import time
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from predictions import http_cache, rollups
+from predictions.materialization import avancar_inicio_das_janelas
+from predictions.models import Prediction, PredictionArchive, PredictionModel
+
+
+class Command(BaseCommand):
+    help = (
+        "Move previsões antigas (prediction_datetime < --before) para a tabela de arquivo, "
+        "mês a mês, com INSERT ... SELECT e DELETE em lote."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help="Data limite (ISO 8601, UTC). Padrão: hoje menos --keep-days.")
+        parser.add_argument('--keep-days', type=int, default=365, help="Dias mantidos na tabela principal quando --before não é informado.")
+        parser.add_argument('--model-id', type=int, action='append', dest='model_ids', help="Restringe a estes modelos (pode repetir).")
+        parser.add_argument('--dry-run', action='store_true', help="Apenas conta as linhas que seriam arquivadas.")
+
+    def handle(self, *args, **options):
+        if options['before']:
+            limite = pd.Timestamp(options['before'])
+            limite = limite.tz_convert('UTC') if limite.tz is not None else limite.tz_localize('UTC')
+        else:
+            limite = pd.Timestamp.now(tz='UTC').normalize() - pd.Timedelta(days=options['keep_days'])
+        limite = limite.to_pydatetime()
+
+        previsoes = Prediction.objects.filter(prediction_datetime__lt=limite)
+        if options['model_ids']:
+            previsoes = previsoes.filter(model_id__in=options['model_ids'])
+
+        primeira = previsoes.order_by('prediction_datetime').values_list('prediction_datetime', flat=True).first()
+        if primeira is None:
+            self.stdout.write(self.style.WARNING(f"Nenhuma previsão anterior a {limite.isoformat()}."))
+            return
+        if options['dry_run']:
+            self.stdout.write(f"{previsoes.count()} previsões seriam arquivadas (anteriores a {limite.isoformat()}).")
+            return
+
+        inicio_total = time.perf_counter()
+        total = 0
+        # Um mês por transação, para não segurar o lock do banco por muito tempo
+        primeiro_mes = pd.Timestamp(primeira).tz_convert('UTC').replace(day=1, hour=0, minute=0, second=0, microsecond=0, nanosecond=0)
+        cortes = [c.to_pydatetime() for c in pd.date_range(primeiro_mes, limite, freq='MS')[1:] if c < limite] + [limite]
+        de = None
+        for ate in cortes:
+            lote = previsoes.filter(prediction_datetime__lt=ate)
+            if de is not None:
+                lote = lote.filter(prediction_datetime__gte=de)
+            with transaction.atomic():
+                movidas = self._mover(lote)
+            if movidas:
+                self.stdout.write(f"  até {ate:%Y-%m-%d}: {movidas} previsões arquivadas")
+            total += movidas
+            de = ate
+
+        afetados = PredictionModel.objects.all()
+        if options['model_ids']:
+            afetados = afetados.filter(id__in=options['model_ids'])
+        for model_db in afetados:
+            http_cache.invalidate_predictions(model_db)
+        avancar_inicio_das_janelas(limite, model_ids=options['model_ids'])
+        rollups.podar_rollups(limite, model_ids=options['model_ids'])
+
+        duracao = time.perf_counter() - inicio_total
+        self.stdout.write(self.style.SUCCESS(f"{total} previsões arquivadas em {duracao:.2f}s."))
+
+    def _mover(self, lote):
+        colunas = ('model_id', 'forecast_id', 'prediction_datetime', 'value', 'created_at')
+        qn = connection.ops.quote_name
+        select_sql, params = lote.values_list(*colunas).query.sql_with_params()
+        destino = qn(PredictionArchive._meta.db_table)
+        lista = ", ".join(qn(c) for c in colunas)
+        arquivado_em = connection.ops.adapt_datetimefield_value(timezone.now())
+
+        with connection.cursor() as cursor:
+            # A subconsulta evita ambiguidade do ON CONFLICT com INSERT ... SELECT no SQLite
+            cursor.execute(
+                f"INSERT INTO {destino} ({lista}, {qn('archived_at')}) "
+                f"SELECT *, %s FROM ({select_sql}) AS origem WHERE true "
+                f"ON CONFLICT ({qn('model_id')}, {qn('prediction_datetime')}) DO UPDATE SET "
+                f"{qn('value')} = EXCLUDED.{qn('value')}, {qn('created_at')} = EXCLUDED.{qn('created_at')}",
+                (arquivado_em, *params),
+            )
+        movidas, _ = lote.delete()
+        return movidas
@@ -0,0 +1,244 @@
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import statistics
+import time
+from importlib.metadata import PackageNotFoundError, version
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from predictions.models import Forecast, Prediction, PredictionModel
+from predictions.predictors import get_predictor
+from predictions.registry import model_registry
+from predictions.utils import get_model_by_id
+from predictions.views import (
+    ForecastResultView,
+    frequencia_do_modelo,
+    grade_esperada,
+    parse_and_validate_dates,
+    run_prediction,
+    salvar_previsoes,
+)
+
+# Modelos empacotados em predictions/model/, cada um na granularidade em que foi treinado
+CENARIOS = [
+    ('prophet', 'H', 'predictions/model/modelo_prophet_final.json'),
+    ('xgboost', 'D', 'predictions/model/modelo_restaurante_v3_flags.pkl'),
+]
+# Módulos que os motores importam sob demanda na primeira carga; são importados antes das
+# medições para que o load_cold do primeiro cenário não inclua o custo único da importação
+MODULOS_DOS_MOTORES = {
+    'prophet': ('prophet.serialize',),
+    'xgboost': ('joblib', 'xgboost'),
+}
+HORIZONTES = {'1d': 1, '7d': 7, '30d': 30, '1y': 365, '3y': 3 * 365}
+ETAPAS = ('parse', 'load_cold', 'load_warm', 'features', 'predict', 'write', 'view')
+PACOTES = ('django', 'djangorestframework', 'numpy', 'pandas', 'prophet', 'xgboost')
+
+# As respostas da view não podem vir do cache HTTP durante a medição
+SEM_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'predictions': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _versao(pacote):
+    try:
+        return version(pacote)
+    except PackageNotFoundError:
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede cada etapa do pipeline de previsão (datas, carga fria/quente do modelo, features, inferência, "
+        "escrita e serialização do ForecastResultView) com os modelos de predictions/model/, em granularidade "
+        "diária/horária e horizontes de 1 dia a 3 anos. Salva os resultados em JSON e compara com uma baseline. "
+        "Tudo roda dentro de uma transação desfeita ao final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3, help="Repetições de cada medição (usa a mediana).")
+        parser.add_argument('--horizons', default=','.join(HORIZONTES), help=f"Horizontes medidos ({', '.join(HORIZONTES)}).")
+        parser.add_argument('--stages', default=','.join(ETAPAS), help=f"Etapas medidas ({', '.join(ETAPAS)}).")
+        parser.add_argument('--save', help="Grava os resultados neste arquivo JSON (ex.: uma nova baseline).")
+        parser.add_argument('--compare', help="Compara com uma baseline JSON gravada antes com --save.")
+        parser.add_argument('--threshold', type=float, default=0.25, help="Piora relativa considerada regressão (0.25 = 25%%).")
+        parser.add_argument('--min-delta-ms', type=float, default=1.0, help="Diferenças absolutas menores que isso são ignoradas.")
+        parser.add_argument('--fail-on-regression', action='store_true', help="Termina com erro se houver regressão.")
+
+    def handle(self, *args, **options):
+        horizontes = [h for h in options['horizons'].split(',') if h]
+        etapas = [e for e in options['stages'].split(',') if e]
+        invalidos = [h for h in horizontes if h not in HORIZONTES] + [e for e in etapas if e not in ETAPAS]
+        if invalidos:
+            raise CommandError(f"Horizontes/etapas desconhecidos: {', '.join(invalidos)}")
+
+        importacoes = self._importar_motores()
+        resultados = {}
+        try:
+            with override_settings(CACHES=SEM_CACHE), transaction.atomic():
+                self._executar(horizontes, etapas, options['repeat'], resultados)
+                raise _Rollback()
+        except _Rollback:
+            pass
+        finally:
+            model_registry.clear()
+
+        relatorio = {
+            'meta': {
+                'criado_em': pd.Timestamp.now(tz='UTC').isoformat(),
+                'python': platform.python_version(),
+                'plataforma': platform.platform(),
+                'cpus': os.cpu_count(),
+                'pacotes': {p: _versao(p) for p in PACOTES},
+                'repeticoes': options['repeat'],
+                'importacao_ms': importacoes,
+            },
+            'resultados': resultados,
+        }
+
+        if options['save']:
+            os.makedirs(os.path.dirname(os.path.abspath(options['save'])), exist_ok=True)
+            with open(options['save'], 'w') as f:
+                json.dump(relatorio, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Resultados gravados em {options['save']}"))
+
+        if options['compare']:
+            regressoes = self._comparar(options['compare'], resultados, options['threshold'], options['min_delta_ms'])
+            if regressoes and options['fail_on_regression']:
+                raise CommandError(f"{regressoes} regressão(ões) acima de {options['threshold']:.0%}.")
+
+    def _importar_motores(self):
+        """Importa os módulos dos motores medidos e retorna o tempo de cada um (ms), fora das etapas."""
+        tempos = {}
+        for model_type, _, _ in CENARIOS:
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for modulo in MODULOS_DOS_MOTORES.get(model_type, ()):
+                    importlib.import_module(modulo)
+            tempos[model_type] = round((time.perf_counter() - t0) * 1000, 3)
+        self.stdout.write("Importação dos motores (fora das etapas): " + ", ".join(f"{t} {ms:.1f} ms" for t, ms in tempos.items()))
+        return tempos
+
+    def _executar(self, horizontes, etapas, repeticoes, resultados):
+        forecast = Forecast.objects.create(name=f"benchmark_pipeline_{time.time_ns()}")
+        inicio = pd.Timestamp('2030-01-01T00:00:00Z')
+        fabrica = APIRequestFactory()
+        view = ForecastResultView.as_view()
+
+        self.stdout.write(f"{'cenário':<28}" + ''.join(f"{e:>11}" for e in etapas) + f"{'pontos':>9}")
+        for model_type, granularidade, caminho in CENARIOS:
+            model_db = PredictionModel.objects.create(
+                forecast=forecast, model_type=model_type, name=f"{model_type}_{granularidade}", path=caminho, granularity=granularidade
+            )
+            predictor = get_predictor(model_type)
+
+            for horizonte in horizontes:
+                chave = f"{model_type}/{granularidade}/{horizonte}"
+                start_str = inicio.isoformat()
+                end_str = (inicio + pd.Timedelta(days=HORIZONTES[horizonte]) - pd.Timedelta(hours=1)).isoformat()
+
+                medidas = {}
+
+                def medir(etapa, funcao, preparar=None):
+                    if etapa not in etapas:
+                        return funcao()
+                    tempos = []
+                    for _ in range(repeticoes):
+                        if preparar:
+                            preparar()
+                        t0 = time.perf_counter()
+                        resultado = funcao()
+                        tempos.append(time.perf_counter() - t0)
+                    medidas[etapa] = {
+                        'mediana_ms': round(statistics.median(tempos) * 1000, 3),
+                        'min_ms': round(min(tempos) * 1000, 3),
+                    }
+                    return resultado
+
+                with contextlib.redirect_stdout(io.StringIO()):
+                    start_naive, end_naive = medir(
+                        'parse', lambda: parse_and_validate_dates(start_str, end_str, granularity=granularidade)
+                    )
+                    modelo = medir(
+                        'load_cold', lambda: get_model_by_id(model_db.id, model_db=model_db),
+                        preparar=lambda: model_registry.invalidate(model_db.id),
+                    )
+                    modelo = medir('load_warm', lambda: get_model_by_id(model_db.id, model_db=model_db))
+
+                    datas = grade_esperada(model_db, start_naive, end_naive)
+                    medir('features', lambda: predictor.build_features(model_db, modelo, datas))
+                    df_previsao = medir(
+                        'predict', lambda: run_prediction(model_db, modelo, start_naive, end_naive, future_dates=datas)
+                    )
+                    # Escrita de um intervalo novo, como no process_prediction_task
+                    medir(
+                        'write', lambda: salvar_previsoes(model_db, df_previsao),
+                        preparar=lambda: Prediction.objects.filter(model=model_db).delete(),
+                    )
+                    if 'write' not in etapas:
+                        salvar_previsoes(model_db, df_previsao)
+
+                    params = {'model_id': model_db.id, 'start_date': start_str, 'end_date': end_str}
+                    url = f'/api/forecasts/{forecast.id}/predictions'
+
+                    def requisitar():
+                        resposta = view(fabrica.get(url, params), forecast_id=forecast.id)
+                        if hasattr(resposta, 'render'):
+                            resposta.render()
+                        if resposta.status_code != 200:
+                            raise CommandError(f"{url} respondeu {resposta.status_code}: {resposta.content[:200]!r}")
+                        return resposta
+
+                    medir('view', requisitar)
+
+                resultados[chave] = {'pontos': len(datas), 'frequencia': frequencia_do_modelo(model_db), 'etapas': medidas}
+                self.stdout.write(
+                    f"{chave:<28}"
+                    + ''.join(f"{medidas[e]['mediana_ms']:>8.1f} ms" if e in medidas else f"{'-':>11}" for e in etapas)
+                    + f"{len(datas):>9}"
+                )
+
+    def _comparar(self, caminho, resultados, limite, min_delta_ms):
+        try:
+            with open(caminho, 'r') as f:
+                baseline = json.load(f)['resultados']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Baseline inválida ({caminho}): {e}")
+
+        self.stdout.write("")
+        self.stdout.write(self.style.NOTICE(f"Comparação com {caminho} (regressão: > {limite:.0%} e > {min_delta_ms} ms)"))
+        regressoes = melhorias = 0
+        for chave, atual in resultados.items():
+            anterior = baseline.get(chave, {}).get('etapas', {})
+            for etapa, medida in atual['etapas'].items():
+                if etapa not in anterior:
+                    continue
+                antes, depois = anterior[etapa]['mediana_ms'], medida['mediana_ms']
+                razao = depois / antes if antes > 0 else np.inf
+                delta = depois - antes
+                linha = f"  {chave + ' ' + etapa:<40}{antes:>10.1f} ms{depois:>10.1f} ms{razao:>8.2f}x"
+                if razao > 1 + limite and delta > min_delta_ms:
+                    regressoes += 1
+                    self.stdout.write(self.style.ERROR(linha + "  REGRESSÃO"))
+                elif razao < 1 / (1 + limite) and -delta > min_delta_ms:
+                    melhorias += 1
+                    self.stdout.write(self.style.SUCCESS(linha + "  melhora"))
+                else:
+                    self.stdout.write(linha)
+
+        self.stdout.write(f"Regressões: {regressoes} | Melhorias: {melhorias}")
+        return regressoes
@@ -0,0 +1,73 @@
+import contextlib
+import io
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from predictions.models import PredictionModel
+from predictions.predictors import gerar_datas, get_predictor
+from predictions.utils import get_model_by_id
+
+
+def _mediana(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - t0)
+    return statistics.median(tempos), resultado
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara a latência do Prophet.predict completo (com amostragem de incerteza) "
+        "com o caminho pontual usado na geração de previsões, em horizontes horários. "
+        "O modelo vem do registro, como nas views (artefato de inferência, se houver)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-id', type=int, help="Modelo Prophet usado (padrão: o primeiro cadastrado).")
+        parser.add_argument('--start', default='2026-01-01T03:00:00', help="Início do horizonte (naive, UTC).")
+        parser.add_argument(
+            '--horizons', default='24,168,720,2160,8760',
+            help="Horizontes em horas, separados por vírgula.",
+        )
+        parser.add_argument('--repeat', type=int, default=5, help="Repetições de cada medição.")
+
+    def handle(self, *args, **options):
+        modelos = PredictionModel.objects.filter(model_type='prophet').order_by('id')
+        model_db = modelos.filter(id=options['model_id']).first() if options['model_id'] else modelos.first()
+        if model_db is None:
+            raise CommandError("Nenhum PredictionModel do tipo 'prophet' encontrado.")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            modelo = get_model_by_id(model_db.id, model_db=model_db)
+        if modelo is None:
+            raise CommandError(f"Não foi possível carregar o modelo ID {model_db.id}")
+
+        predictor = get_predictor('prophet')
+        horizontes = [int(h) for h in options['horizons'].split(',') if h.strip() and int(h) > 0]
+        self.stdout.write(
+            f"Modelo ID {model_db.id} ({model_db.name}, {model_db.granularity}), "
+            f"{modelo.uncertainty_samples} amostras de incerteza, {options['repeat']} repetições"
+        )
+        self.stdout.write(f"{'horas':>7}{'completo':>14}{'pontual':>14}{'ganho':>9}{'dif. máx.':>12}")
+
+        for horas in horizontes:
+            inicio = pd.Timestamp(options['start'])
+            datas = gerar_datas(inicio, inicio + pd.Timedelta(hours=horas - 1), 'H')
+            features = predictor.build_features(model_db, modelo, datas)
+
+            # Os mesmos caminhos de prever(): com intervalos=True e o pontual
+            completo, (yhat_completo, _, _) = _mediana(
+                lambda: predictor.predict_intervals(model_db, modelo, datas, features), options['repeat'],
+            )
+            pontual, yhat = _mediana(lambda: predictor.predict_batch(model_db, modelo, datas, features), options['repeat'])
+            diferenca = float(np.max(np.abs(np.asarray(yhat_completo) - np.asarray(yhat))))
+
+            self.stdout.write(
+                f"{horas:>7}{completo * 1000:>11.1f} ms{pontual * 1000:>11.1f} ms{completo / pontual:>8.1f}x{diferenca:>12.2e}"
+            )
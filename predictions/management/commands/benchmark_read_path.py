@@ -0,0 +1,81 @@
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+
+from predictions.management.commands.benchmark_pipeline import SEM_CACHE
+from predictions.models import PredictionModel
+from predictions.storage import upsert_predictions
+from predictions.views import grade_esperada, parse_and_validate_dates
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o endpoint /predictions (DRF) com o caminho rápido /series para a mesma série. "
+        "Os dados sintéticos são gravados dentro de uma transação desfeita ao final, com o cache HTTP "
+        "desligado (as respostas medidas não vêm do cache nem são guardadas nele)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-id', type=int, help="Modelo usado (padrão: o primeiro cadastrado).")
+        parser.add_argument('--start', default='2030-01-01T00:00:00Z', help="Início da série sintética (ISO 8601).")
+        parser.add_argument('--days', type=int, default=365, help="Tamanho da série em dias.")
+        parser.add_argument('--repeat', type=int, default=5, help="Repetições de cada requisição.")
+
+    def handle(self, *args, **options):
+        model_db = PredictionModel.objects.order_by('id')
+        model_db = model_db.filter(id=options['model_id']).first() if options['model_id'] else model_db.first()
+        if model_db is None:
+            raise CommandError("Nenhum PredictionModel encontrado.")
+
+        try:
+            with override_settings(CACHES=SEM_CACHE), transaction.atomic():
+                self._executar(model_db, options)
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _executar(self, model_db, options):
+        import pandas as pd
+
+        inicio = pd.Timestamp(options['start'])
+        fim = inicio + pd.Timedelta(days=options['days'])
+        start_str, end_str = inicio.isoformat(), fim.isoformat()
+
+        # Grava exatamente a grade que o endpoint espera, para não disparar o lazy loading
+        start_naive, end_naive = parse_and_validate_dates(start_str, end_str, granularity=model_db.granularity)
+        grade = grade_esperada(model_db, start_naive, end_naive)
+        upsert_predictions(model_db, grade, np.random.default_rng(0).uniform(0, 500, len(grade)).round(2))
+
+        params = {'model_id': model_db.id, 'start_date': start_str, 'end_date': end_str}
+        client = Client()
+        urls = {
+            'predictions (DRF)': f'/api/forecasts/{model_db.forecast_id}/predictions',
+            'series (colunar)': f'/api/forecasts/{model_db.forecast_id}/series',
+        }
+
+        self.stdout.write(f"Modelo ID {model_db.id} ({model_db.granularity}), {len(grade)} pontos, {options['repeat']} repetições")
+        resultados = {}
+        for nome, url in urls.items():
+            tempos = []
+            for _ in range(options['repeat']):
+                t0 = time.perf_counter()
+                resposta = client.get(url, params)
+                corpo = resposta.content
+                tempos.append(time.perf_counter() - t0)
+                if resposta.status_code != 200:
+                    raise CommandError(f"{url} respondeu {resposta.status_code}: {corpo[:200]!r}")
+            resultados[nome] = (statistics.median(tempos), min(tempos), len(corpo))
+
+        for nome, (mediana, minimo, tamanho) in resultados.items():
+            self.stdout.write(f"  {nome:<20} mediana {mediana * 1000:8.1f} ms  mínimo {minimo * 1000:8.1f} ms  {tamanho / 1024:8.1f} KiB")
+
+        base, rapido = resultados['predictions (DRF)'][0], resultados['series (colunar)'][0]
+        self.stdout.write(self.style.SUCCESS(f"Ganho do caminho rápido: {base / rapido:.1f}x"))
@@ -0,0 +1,153 @@
+import contextlib
+import multiprocessing
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+
+from predictions.models import Prediction, PredictionModel
+
+# Configuração original do projeto: journal em modo DELETE, timeout padrão do
+# sqlite3 (5s), transações DEFERRED e uma conexão nova por requisição
+CONFIG_PADRAO = {'CONN_MAX_AGE': 0, 'OPTIONS': {'init_command': 'PRAGMA journal_mode=DELETE'}}
+
+
+def _config_ajustada():
+    banco = settings.DATABASES['default']
+    return {'CONN_MAX_AGE': banco.get('CONN_MAX_AGE', 0), 'OPTIONS': dict(banco.get('OPTIONS', {}))}
+
+
+def _apontar_para(nome_banco, config):
+    conexao = connections['default']
+    conexao.close()
+    conexao.settings_dict['NAME'] = nome_banco
+    conexao.settings_dict['CONN_MAX_AGE'] = config['CONN_MAX_AGE']
+    conexao.settings_dict['OPTIONS'] = dict(config['OPTIONS'])
+    # Os parâmetros de conexão são lidos de settings_dict a cada connect()
+    return conexao
+
+
+def _worker(papel, nome_banco, config, duracao, modelos, semente):
+    """
+    Roda em um processo separado, como um worker do gunicorn: repete a operação
+    do papel ('leitor' ou 'escritor') até o fim do tempo. Retorna latências e erros.
+    """
+    conexao = _apontar_para(nome_banco, config)
+    rng = np.random.default_rng(semente)
+    base = pd.Timestamp('2031-01-01', tz='UTC')
+    latencias, erros = [], 0
+
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        fim = time.perf_counter() + duracao
+        while time.perf_counter() < fim:
+            model_db = modelos[rng.integers(len(modelos))]
+            inicio = base + pd.Timedelta(hours=int(rng.integers(24 * 365)))
+            t0 = time.perf_counter()
+            try:
+                if papel == 'escritor':
+                    # Mesmo caminho de escrita do lazy loading: um dia de pontos horários
+                    from predictions.storage import upsert_predictions
+
+                    datas = pd.date_range(inicio, periods=24, freq='h')
+                    upsert_predictions(model_db, datas, rng.uniform(0, 500, len(datas)).round(2))
+                else:
+                    list(
+                        Prediction.objects.filter(
+                            forecast_id=model_db.forecast_id,
+                            model_id=model_db.id,
+                            prediction_datetime__range=(inicio, inicio + pd.Timedelta(days=7)),
+                        ).values_list('prediction_datetime', 'value')
+                    )
+                latencias.append(time.perf_counter() - t0)
+            except OperationalError:
+                erros += 1
+            if not config['CONN_MAX_AGE']:
+                # Equivale ao fechamento feito pelo Django ao fim de cada requisição
+                conexao.close()
+
+    conexao.close()
+    return papel, latencias, erros
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de carga de leitura/escrita concorrentes no SQLite: compara a configuração "
+        "original (journal DELETE, sem conexões persistentes) com a de settings.DATABASES, "
+        "em cópias do banco atual."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=6, help="Processos leitores.")
+        parser.add_argument('--writers', type=int, default=2, help="Processos escritores.")
+        parser.add_argument('--duration', type=float, default=10.0, help="Duração de cada rodada, em segundos.")
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError("Este teste de carga é específico para SQLite.")
+
+        modelos = list(PredictionModel.objects.order_by('id'))
+        if not modelos:
+            raise CommandError("Nenhum PredictionModel encontrado.")
+
+        origem = str(settings.DATABASES['default']['NAME'])
+        diretorio = tempfile.mkdtemp(prefix='bench_sqlite_')
+        configuracoes = {'padrão': CONFIG_PADRAO, 'ajustada': _config_ajustada()}
+        resultados = {}
+        try:
+            for nome, config in configuracoes.items():
+                copia = os.path.join(diretorio, f'{nome}.sqlite3')
+                connections['default'].close()
+                shutil.copyfile(origem, copia)
+                _apontar_para(copia, config)
+                call_command('migrate', verbosity=0)
+                connections['default'].close()
+
+                resultados[nome] = self._rodada(copia, config, modelos, options)
+                self._relatorio(nome, resultados[nome], options['duration'])
+        finally:
+            _apontar_para(origem, _config_ajustada())
+            shutil.rmtree(diretorio, ignore_errors=True)
+
+        antes, depois = resultados['padrão'], resultados['ajustada']
+        for papel in ('leitor', 'escritor'):
+            if antes[papel]['ops'] and depois[papel]['ops']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Ganho de vazão ({papel}es): {depois[papel]['ops'] / antes[papel]['ops']:.1f}x"
+                ))
+
+    def _rodada(self, nome_banco, config, modelos, options):
+        papeis = ['escritor'] * options['writers'] + ['leitor'] * options['readers']
+        contexto = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        with contexto.Pool(len(papeis)) as pool:
+            saidas = pool.starmap(
+                _worker,
+                [(papel, nome_banco, config, options['duration'], modelos, semente) for semente, papel in enumerate(papeis)],
+            )
+
+        agregado = {papel: {'latencias': [], 'erros': 0} for papel in ('leitor', 'escritor')}
+        for papel, latencias, erros in saidas:
+            agregado[papel]['latencias'].extend(latencias)
+            agregado[papel]['erros'] += erros
+        for dados in agregado.values():
+            dados['ops'] = len(dados['latencias'])
+        return agregado
+
+    def _relatorio(self, nome, resultado, duracao):
+        self.stdout.write(self.style.NOTICE(f"Configuração {nome}:"))
+        for papel, dados in resultado.items():
+            latencias = sorted(dados['latencias'])
+            if latencias:
+                p50 = statistics.median(latencias) * 1000
+                p95 = latencias[int(len(latencias) * 0.95) - 1] * 1000 if len(latencias) > 1 else p50
+                linha = f"{dados['ops'] / duracao:9.1f} ops/s  p50 {p50:8.2f} ms  p95 {p95:8.2f} ms"
+            else:
+                linha = f"{0:9.1f} ops/s"
+            self.stdout.write(f"  {papel + 'es':<10}{linha}  erros (database is locked): {dados['erros']}")
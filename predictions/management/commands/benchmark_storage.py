@@ -0,0 +1,201 @@
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+# Esquema anterior (0005): só a chave única (model, prediction_datetime); filtrar por Forecast exige join
+ESQUEMA_ANTES = [
+    'CREATE TABLE predictions_predictionmodel ("id" integer NOT NULL PRIMARY KEY, "forecast_id" bigint NOT NULL)',
+    'CREATE INDEX predictions_predictionmodel_forecast_id ON predictions_predictionmodel ("forecast_id")',
+    'CREATE TABLE predictions_prediction ("id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, "prediction_datetime" datetime NOT NULL, '
+    '"value" real NOT NULL, "created_at" datetime NOT NULL, "model_id" bigint NOT NULL)',
+]
+INDICES_ANTES = [
+    'CREATE UNIQUE INDEX predictions_prediction_uniq ON predictions_prediction ("model_id", "prediction_datetime")',
+    'CREATE INDEX predictions_prediction_model_id ON predictions_prediction ("model_id")',
+]
+
+# Esquema atual (0006): forecast_id desnormalizado + índices compostos
+ESQUEMA_DEPOIS = [
+    'CREATE TABLE predictions_predictionmodel ("id" integer NOT NULL PRIMARY KEY, "forecast_id" bigint NOT NULL)',
+    'CREATE INDEX predictions_predictionmodel_forecast_id ON predictions_predictionmodel ("forecast_id")',
+    'CREATE TABLE predictions_prediction ("id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, "prediction_datetime" datetime NOT NULL, '
+    '"value" real NOT NULL, "created_at" datetime NOT NULL, "model_id" bigint NOT NULL, "forecast_id" bigint NOT NULL)',
+]
+INDICES_DEPOIS = INDICES_ANTES + [
+    'CREATE INDEX pred_forecast_dt_idx ON predictions_prediction ("forecast_id", "prediction_datetime")',
+    'CREATE INDEX pred_model_dt_value_idx ON predictions_prediction ("model_id", "prediction_datetime", "value")',
+]
+
+CONSULTAS = {
+    'forecast, 1 mês (join)': {
+        'antes': 'SELECT p.id, p.prediction_datetime, p.value, p.created_at, p.model_id FROM predictions_prediction p '
+                 'INNER JOIN predictions_predictionmodel m ON p.model_id = m.id '
+                 'WHERE m.forecast_id = :forecast AND p.prediction_datetime BETWEEN :inicio AND :fim_mes ORDER BY p.prediction_datetime',
+        'depois': 'SELECT id, prediction_datetime, value, created_at, model_id FROM predictions_prediction '
+                  'WHERE forecast_id = :forecast AND prediction_datetime BETWEEN :inicio AND :fim_mes ORDER BY prediction_datetime',
+    },
+    'forecast+modelo, 1 mês': {
+        'antes': 'SELECT p.id, p.prediction_datetime, p.value, p.created_at, p.model_id FROM predictions_prediction p '
+                 'INNER JOIN predictions_predictionmodel m ON p.model_id = m.id '
+                 'WHERE m.forecast_id = :forecast AND p.model_id = :modelo AND p.prediction_datetime BETWEEN :inicio AND :fim_mes '
+                 'ORDER BY p.prediction_datetime',
+        'depois': 'SELECT id, prediction_datetime, value, created_at, model_id FROM predictions_prediction '
+                  'WHERE forecast_id = :forecast AND model_id = :modelo AND prediction_datetime BETWEEN :inicio AND :fim_mes '
+                  'ORDER BY prediction_datetime',
+    },
+    'série colunar, 1 ano': {
+        'antes': 'SELECT prediction_datetime, value FROM predictions_prediction '
+                 'WHERE model_id = :modelo AND prediction_datetime BETWEEN :inicio AND :fim_ano ORDER BY prediction_datetime',
+        'depois': 'SELECT prediction_datetime, value FROM predictions_prediction '
+                  'WHERE model_id = :modelo AND prediction_datetime BETWEEN :inicio AND :fim_ano ORDER BY prediction_datetime',
+    },
+    'contagem lazy load, 1 ano': {
+        'antes': 'SELECT COUNT(*) FROM predictions_prediction '
+                 'WHERE model_id = :modelo AND prediction_datetime BETWEEN :inicio AND :fim_ano',
+        'depois': 'SELECT COUNT(*) FROM predictions_prediction '
+                  'WHERE model_id = :modelo AND prediction_datetime BETWEEN :inicio AND :fim_ano',
+    },
+}
+
+INICIO_SERIE = np.datetime64('2020-01-01T00:00:00')
+LOTE = 200_000
+
+
+def _texto(datas):
+    return np.char.replace(np.datetime_as_string(datas, unit='s'), 'T', ' ')
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark do armazenamento de previsões em SQLite: compara o esquema anterior (join por modelo) "
+        "com o atual (forecast_id desnormalizado e índices compostos) em bancos temporários."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000_000, help="Linhas de previsão por banco.")
+        parser.add_argument('--forecasts', type=int, default=10)
+        parser.add_argument('--models-per-forecast', type=int, default=4)
+        parser.add_argument('--queries', type=int, default=100, help="Execuções de cada consulta.")
+        parser.add_argument('--dir', default=None, help="Diretório dos bancos temporários.")
+        parser.add_argument('--keep', action='store_true', help="Não apaga os bancos ao final.")
+
+    def handle(self, *args, **options):
+        diretorio = tempfile.mkdtemp(prefix='bench_storage_', dir=options['dir'])
+        modelos = [
+            (forecast * 100 + m, forecast)
+            for forecast in range(1, options['forecasts'] + 1)
+            for m in range(options['models_per_forecast'])
+        ]
+        horas_por_modelo = options['rows'] // len(modelos)
+        self.stdout.write(
+            f"{len(modelos)} modelos x {horas_por_modelo} horas = {len(modelos) * horas_por_modelo:,} linhas por banco ({diretorio})"
+        )
+
+        try:
+            resultados = {}
+            for nome, esquema, indices in (('antes', ESQUEMA_ANTES, INDICES_ANTES), ('depois', ESQUEMA_DEPOIS, INDICES_DEPOIS)):
+                caminho = os.path.join(diretorio, f'{nome}.sqlite3')
+                resultados[nome] = self._medir(caminho, nome, esquema, indices, modelos, horas_por_modelo, options['queries'])
+        finally:
+            if not options['keep']:
+                shutil.rmtree(diretorio, ignore_errors=True)
+
+        self.stdout.write("")
+        self.stdout.write(f"{'':<28}{'antes':>14}{'depois':>14}{'ganho':>10}")
+        for chave in resultados['antes']:
+            antes, depois = resultados['antes'][chave], resultados['depois'][chave]
+            if chave.startswith('tamanho'):
+                self.stdout.write(f"{chave:<28}{antes:>11.0f} MB{depois:>11.0f} MB")
+            else:
+                self.stdout.write(f"{chave:<28}{antes * 1000:>11.2f} ms{depois * 1000:>11.2f} ms{antes / depois:>9.1f}x")
+
+    def _medir(self, caminho, nome, esquema, indices, modelos, horas_por_modelo, n_consultas):
+        conn = sqlite3.connect(caminho)
+        conn.execute('PRAGMA journal_mode=OFF')
+        conn.execute('PRAGMA synchronous=OFF')
+        for ddl in esquema:
+            conn.execute(ddl)
+        conn.executemany('INSERT INTO predictions_predictionmodel VALUES (?, ?)', modelos)
+
+        com_forecast = nome == 'depois'
+        criado_em = '2026-01-01 00:00:00'
+        rng = np.random.default_rng(0)
+        datas = _texto(INICIO_SERIE + np.arange(horas_por_modelo).astype('timedelta64[h]')).tolist()
+
+        t0 = time.perf_counter()
+        for model_id, forecast_id in modelos:
+            valores = rng.uniform(0, 500, horas_por_modelo).round(2).tolist()
+            for i in range(0, horas_por_modelo, LOTE):
+                fatia = zip(datas[i:i + LOTE], valores[i:i + LOTE])
+                if com_forecast:
+                    conn.executemany(
+                        'INSERT INTO predictions_prediction (prediction_datetime, value, created_at, model_id, forecast_id) VALUES (?, ?, ?, ?, ?)',
+                        ((d, v, criado_em, model_id, forecast_id) for d, v in fatia),
+                    )
+                else:
+                    conn.executemany(
+                        'INSERT INTO predictions_prediction (prediction_datetime, value, created_at, model_id) VALUES (?, ?, ?, ?)',
+                        ((d, v, criado_em, model_id) for d, v in fatia),
+                    )
+        conn.commit()
+        carga = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for ddl in indices:
+            conn.execute(ddl)
+        conn.execute('ANALYZE')
+        conn.commit()
+        indexacao = time.perf_counter() - t0
+        conn.close()
+
+        # Reabre com as configurações padrão para medir as leituras e a escrita incremental
+        conn = sqlite3.connect(caminho)
+        resultado = {'carga': carga, 'criação de índices': indexacao}
+
+        total_horas = horas_por_modelo
+        for rotulo, sqls in CONSULTAS.items():
+            tempos = []
+            for _ in range(n_consultas):
+                model_id, forecast_id = modelos[rng.integers(len(modelos))]
+                inicio = INICIO_SERIE + np.timedelta64(int(rng.integers(max(1, total_horas - 24 * 365))), 'h')
+                params = {
+                    'forecast': forecast_id,
+                    'modelo': model_id,
+                    'inicio': str(_texto(inicio)),
+                    'fim_mes': str(_texto(inicio + np.timedelta64(24 * 31, 'h'))),
+                    'fim_ano': str(_texto(inicio + np.timedelta64(24 * 365, 'h'))),
+                }
+                t0 = time.perf_counter()
+                conn.execute(sqls[nome], params).fetchall()
+                tempos.append(time.perf_counter() - t0)
+            resultado[rotulo] = statistics.median(tempos)
+
+        # Escrita incremental: upsert de 30 dias horários num modelo já carregado
+        model_id, forecast_id = modelos[0]
+        datas_upsert = _texto(INICIO_SERIE + np.arange(24 * 30).astype('timedelta64[h]')).tolist()
+        t0 = time.perf_counter()
+        if com_forecast:
+            conn.executemany(
+                'INSERT INTO predictions_prediction (prediction_datetime, value, created_at, model_id, forecast_id) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (model_id, prediction_datetime) DO UPDATE SET value = excluded.value',
+                ((d, 1.0, criado_em, model_id, forecast_id) for d in datas_upsert),
+            )
+        else:
+            conn.executemany(
+                'INSERT INTO predictions_prediction (prediction_datetime, value, created_at, model_id) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (model_id, prediction_datetime) DO UPDATE SET value = excluded.value',
+                ((d, 1.0, criado_em, model_id) for d in datas_upsert),
+            )
+        conn.commit()
+        resultado['upsert 720 linhas'] = time.perf_counter() - t0
+        conn.close()
+
+        resultado['tamanho do banco'] = os.path.getsize(caminho) / 1024 / 1024
+        self.stdout.write(f"[{nome}] carga {carga:.1f}s, índices {indexacao:.1f}s, {resultado['tamanho do banco']:.0f} MB")
+        return resultado
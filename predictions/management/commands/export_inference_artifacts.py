@@ -0,0 +1,106 @@
+import contextlib
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from predictions import artifacts
+from predictions.models import PredictionModel
+from predictions.predictors import Predictor, gerar_datas, get_predictor, prever
+
+
+def _tamanho(caminho):
+    if os.path.isdir(caminho):
+        return sum(os.path.getsize(os.path.join(caminho, nome)) for nome in os.listdir(caminho))
+    return os.path.getsize(caminho)
+
+
+def _cronometrar(funcao):
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultado = funcao()
+    return resultado, time.perf_counter() - t0
+
+
+class Command(BaseCommand):
+    help = (
+        "Converte os modelos cadastrados em artefatos de inferência compactos (Prophet: parâmetros e histórico em .npy "
+        "lidos com mmap; XGBoost: booster UBJSON). Os artefatos são validados contra o modelo original "
+        "e passam a ser carregados no lugar dele. Rode no build/deploy, depois de atualizar os modelos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-id', type=int, action='append', dest='model_ids', help="Filtra por PredictionModel (pode repetir).")
+        parser.add_argument('--force', action='store_true', help="Regrava mesmo artefatos já atualizados.")
+        parser.add_argument('--check-days', type=int, default=7, help="Dias de previsão usados para validar o artefato.")
+
+    def handle(self, *args, **options):
+        modelos = PredictionModel.objects.order_by('id')
+        if options['model_ids']:
+            modelos = modelos.filter(id__in=options['model_ids'])
+        modelos = list(modelos)
+        if not modelos:
+            raise CommandError("Nenhum PredictionModel encontrado.")
+
+        self.stdout.write(f"Diretório dos artefatos: {settings.PREDICTION_ARTIFACT_DIR}")
+        exportados, erros = 0, 0
+        vistos = set()
+        for model_db in modelos:
+            # Vários PredictionModel podem apontar para o mesmo arquivo
+            if (model_db.path, model_db.model_type) in vistos:
+                continue
+            vistos.add((model_db.path, model_db.model_type))
+
+            try:
+                if self._exportar(model_db, options):
+                    exportados += 1
+            except Exception as e:
+                erros += 1
+                self.stdout.write(self.style.ERROR(f"-> Modelo ID {model_db.id} ({model_db.path}): {e}"))
+
+        self.stdout.write(self.style.SUCCESS(f"Artefatos gravados: {exportados}"))
+        if erros:
+            raise CommandError(f"{erros} modelo(s) com erro.")
+
+    def _exportar(self, model_db, options):
+        predictor = get_predictor(model_db.model_type)
+        if not predictor.suporta_artefato:
+            self.stdout.write(f"-> Modelo ID {model_db.id}: tipo '{model_db.model_type}' sem artefato de inferência, mantém o original.")
+            return False
+
+        full_path = os.path.join(settings.BASE_DIR, model_db.path)
+        if not os.path.exists(full_path):
+            raise CommandError(f"Arquivo de modelo não encontrado em: {full_path}")
+        if not full_path.endswith(predictor.extensoes):
+            raise CommandError(f"Extensão incompatível com o tipo '{model_db.model_type}'.")
+        if not options['force'] and artifacts.meta_valida(model_db.path, full_path, model_db.model_type):
+            self.stdout.write(f"-> Modelo ID {model_db.id}: artefato já atualizado ({artifacts.diretorio_artefato(model_db.path)}).")
+            return False
+
+        original, tempo_original = _cronometrar(lambda: predictor.load(full_path))
+        destino = artifacts.exportar(model_db.path, full_path, predictor, original)
+        artefato, tempo_artefato = _cronometrar(lambda: artifacts.carregar(model_db.path, full_path, predictor))
+
+        # Validação: as previsões dos dois precisam ser iguais
+        inicio = pd.Timestamp.now().normalize() + pd.Timedelta(hours=3)
+        datas = gerar_datas(inicio, inicio + pd.Timedelta(days=options['check_days']), predictor.frequencia(model_db))
+        esperado, _ = _cronometrar(lambda: prever(model_db, original, datas))
+        obtido, _ = _cronometrar(lambda: prever(model_db, artefato, datas))
+        if not np.allclose(esperado['value'].to_numpy(), obtido['value'].to_numpy(), atol=0.01):
+            raise CommandError("As previsões do artefato diferem das do modelo original; artefato descartado.")
+        if type(predictor).predict_intervals is not Predictor.predict_intervals:
+            # O artefato também precisa atender o caminho com intervalos (a amostragem é aleatória; compara só o valor)
+            obtido, _ = _cronometrar(lambda: prever(model_db, artefato, datas[:24], intervalos=True))
+            if not np.allclose(esperado['value'].to_numpy()[:24], obtido['value'].to_numpy(), atol=0.01):
+                raise CommandError("Os intervalos do artefato diferem dos do modelo original; artefato descartado.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"-> Modelo ID {model_db.id} ({model_db.model_type}): {destino}\n"
+            f"   tamanho {_tamanho(full_path) / 1024:,.0f} KiB -> {_tamanho(destino) / 1024:,.0f} KiB | "
+            f"carga {tempo_original * 1000:,.0f} ms -> {tempo_artefato * 1000:,.0f} ms"
+        ))
+        return True
@@ -1,34 +1,131 @@
-from django.core.management.base import BaseCommand
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from predictions import inference
 from predictions.models import PredictionModel
-from predictions.utils import generate_and_save_predictions
+
+
+def _inicializar_worker():
+    # Com spawn o processo filho começa sem o Django configurado; com fork isso é um no-op
+    django.setup()
+    connections.close_all()
+
+
+def _gerar_modelo(model_id, start_str, end_str):
+    """
+    Roda em um processo do pool: regenera as previsões de um modelo usando a
+    própria conexão com o banco. Retorna um dicionário com o resultado.
+    """
+    from predictions.views import parse_and_validate_dates, process_prediction_task
+
+    inicio = time.perf_counter()
+    resultado = {"model_id": model_id, "registros": 0, "erro": None}
+    try:
+        model_db = PredictionModel.objects.get(id=model_id)
+        resultado["nome"] = model_db.name
+        start_naive, end_naive = parse_and_validate_dates(start_str, end_str, granularity=model_db.granularity)
+        resultado["registros"] = process_prediction_task(model_db, start_naive, end_naive)
+    except Exception as e:
+        resultado["erro"] = str(e)
+    finally:
+        connections.close_all()
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
+
+
+def _data_iso(valor):
+    data = pd.Timestamp(valor)
+    if data.tz is None:
+        data = data.tz_localize('UTC')
+    return data.isoformat()
+
 
 class Command(BaseCommand):
+    help = "Regera em lote as previsões dos modelos cadastrados, em paralelo."
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="Início do intervalo (ISO 8601; sem fuso = UTC). Padrão: hoje.")
+        parser.add_argument('--end', help="Fim do intervalo (ISO 8601; sem fuso = UTC). Padrão: início + --days.")
+        parser.add_argument('--days', type=int, default=30, help="Tamanho do intervalo quando --end não é informado.")
+        parser.add_argument('--forecast-id', type=int, action='append', dest='forecast_ids', help="Filtra por Forecast (pode repetir).")
+        parser.add_argument('--model-id', type=int, action='append', dest='model_ids', help="Filtra por PredictionModel (pode repetir).")
+        parser.add_argument('--workers', type=int, default=1, help="Quantidade de processos em paralelo.")
+
+    def handle(self, *args, **options):
         self.stdout.write(self.style.NOTICE("Iniciando o processo de geração de previsões..."))
 
+        try:
+            inicio = pd.Timestamp(options['start']) if options['start'] else pd.Timestamp.now(tz='UTC').normalize()
+            fim = pd.Timestamp(options['end']) if options['end'] else inicio + pd.Timedelta(days=options['days'])
+            start_str, end_str = _data_iso(inicio), _data_iso(fim)
+        except (TypeError, ValueError) as e:
+            raise CommandError(f"Datas inválidas: {e}")
+
         prediction_models = PredictionModel.objects.all()
+        if options['forecast_ids']:
+            prediction_models = prediction_models.filter(forecast_id__in=options['forecast_ids'])
+        if options['model_ids']:
+            prediction_models = prediction_models.filter(id__in=options['model_ids'])
+        model_ids = list(prediction_models.order_by('id').values_list('id', flat=True))
 
-        if not prediction_models.exists():
+        if not model_ids:
             self.stdout.write(self.style.WARNING("Nenhum modelo de previsão foi encontrado no banco de dados."))
             return
 
-        success_count = 0
-        error_count = 0
+        workers = max(1, min(options['workers'], len(model_ids)))
+        self.stdout.write(f"Intervalo: {start_str} a {end_str} | Modelos: {len(model_ids)} | Workers: {workers}")
+        # process_prediction_task pede as previsões ao servidor do host, se houver; os modelos
+        # só são carregados nos processos deste comando quando ele não está no ar
+        if inference.habilitado():
+            self.stdout.write(f"Inferência: servidor do host em {settings.PREDICTION_INFERENCE_SOCKET}")
+        else:
+            self.stdout.write("Inferência: local (servidor de inferência do host fora do ar)")
 
-        for model in prediction_models:
-            self.stdout.write(f"Processando modelo: {model}")
-            try:
-                generate_and_save_predictions(model.id)
-                self.stdout.write(self.style.SUCCESS(f"-> Previsões geradas com sucesso para o modelo '{model.name}'."))
-                success_count += 1
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"-> Ocorreu um erro ao processar o modelo '{model.name}': {e}"))
-                error_count += 1
+        inicio_total = time.perf_counter()
+        resultados = []
+        if workers == 1:
+            for model_id in model_ids:
+                resultados.append(self._reportar(_gerar_modelo(model_id, start_str, end_str)))
+        else:
+            # Conexões do processo pai não podem ser herdadas pelos filhos
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker) as executor:
+                futures = [executor.submit(_gerar_modelo, model_id, start_str, end_str) for model_id in model_ids]
+                for future in as_completed(futures):
+                    resultados.append(self._reportar(future.result()))
+        duracao_total = time.perf_counter() - inicio_total
+
+        success_count = sum(1 for r in resultados if r["erro"] is None)
+        error_count = len(resultados) - success_count
+        total_registros = sum(r["registros"] for r in resultados)
 
         self.stdout.write("\n" + self.style.NOTICE("="*30))
         self.stdout.write(self.style.NOTICE("Processo finalizado!"))
         self.stdout.write(self.style.SUCCESS(f"Modelos processados com sucesso: {success_count}"))
         if error_count > 0:
             self.stdout.write(self.style.ERROR(f"Modelos com erro: {error_count}"))
-        self.stdout.write(self.style.NOTICE("="*30))
\ No newline at end of file
+        self.stdout.write(f"Tempo total: {duracao_total:.2f}s")
+        self.stdout.write(f"Vazão: {len(resultados) / duracao_total:.2f} modelos/s | {total_registros / duracao_total:,.0f} registros/s")
+        self.stdout.write("Tempo por modelo:")
+        for r in sorted(resultados, key=lambda r: r["model_id"]):
+            self.stdout.write(f"  ID {r['model_id']:>5} {r.get('nome', '-'):<30} {r['registros']:>8} registros  {r['segundos']:.2f}s")
+        self.stdout.write(self.style.NOTICE("="*30))
+
+        # Saída diferente de zero para o cron/CI perceber falhas parciais
+        if error_count > 0:
+            falhos = ', '.join(str(r['model_id']) for r in sorted(resultados, key=lambda r: r['model_id']) if r['erro'] is not None)
+            raise CommandError(f"{error_count} de {len(resultados)} modelo(s) com erro (IDs: {falhos}).")
+
+    def _reportar(self, resultado):
+        nome = resultado.get('nome', resultado['model_id'])
+        if resultado["erro"] is None:
+            self.stdout.write(self.style.SUCCESS(f"-> Previsões geradas com sucesso para o modelo '{nome}' ({resultado['registros']} registros)."))
+        else:
+            self.stdout.write(self.style.ERROR(f"-> Ocorreu um erro ao processar o modelo '{nome}': {resultado['erro']}"))
+        return resultado
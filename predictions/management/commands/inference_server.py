@@ -0,0 +1,51 @@
+import asyncio
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from predictions.inference import ServidorInferencia, preparar_socket
+from predictions.registry import prewarm_models
+
+
+class Command(BaseCommand):
+    help = (
+        "Servidor de inferência local: um único processo por host mantém os modelos carregados e atende "
+        "os workers web por um socket Unix, agrupando pedidos simultâneos do mesmo modelo em um lote. "
+        "Enquanto ele estiver no ar, views, jobs e generate_predictions passam a usá-lo "
+        "(PREDICTION_USE_INFERENCE_SERVER=auto, o padrão)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=settings.PREDICTION_INFERENCE_SOCKET, help="Caminho do socket Unix.")
+        parser.add_argument('--workers', type=int, default=2, help="Threads de inferência (lotes de modelos diferentes em paralelo).")
+        parser.add_argument('--batch-window-ms', type=float, default=5.0, help="Espera para juntar pedidos do mesmo modelo num lote.")
+        parser.add_argument('--prewarm', action='store_true', help="Carrega todos os PredictionModel antes de aceitar conexões.")
+
+    def handle(self, *args, **options):
+        try:
+            preparar_socket(options['socket'])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        if options['prewarm']:
+            carregados = prewarm_models()
+            self.stdout.write(f"Pre-warm: {len(carregados)} modelo(s) carregado(s).")
+
+        servidor = ServidorInferencia(janela=options['batch_window_ms'] / 1000, workers=options['workers'])
+        try:
+            asyncio.run(self._servir(servidor, options['socket']))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Interrompido."))
+        finally:
+            if os.path.exists(options['socket']):
+                os.remove(options['socket'])
+        self.stdout.write(self.style.NOTICE(f"Servidor de inferência finalizado ({servidor.pedidos} pedidos em {servidor.lotes} lotes)."))
+
+    async def _servir(self, servidor, caminho):
+        server = await asyncio.start_unix_server(servidor.atender, path=caminho)
+        # Só o usuário da aplicação conversa com o servidor
+        os.chmod(caminho, 0o600)
+        self.stdout.write(self.style.SUCCESS(f"Servidor de inferência escutando em {caminho}"))
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from predictions.locks import single_flight
+from predictions.materialization import materializar_modelo, podar_modelo
+from predictions.models import PredictionModel
+
+
+class Command(BaseCommand):
+    help = (
+        "Mantém pré-calculado o horizonte (horizon_days) de cada PredictionModel: a cada ciclo estende a "
+        "janela materializada e apaga em lote as previsões além de retention_days. Leituras dentro da "
+        "janela não disparam inferência."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=300.0, help="Segundos entre ciclos.")
+        parser.add_argument('--max-points', type=int, default=24 * 31, help="Máximo de datas geradas por modelo em cada ciclo.")
+        parser.add_argument('--model-id', type=int, action='append', dest='model_ids', help="Filtra por PredictionModel (pode repetir).")
+        parser.add_argument('--once', action='store_true', help="Roda ciclos até todos os horizontes estarem completos e encerra.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE(f"Materializador iniciado (ciclo a cada {options['interval']:.0f}s)."))
+        try:
+            while True:
+                close_old_connections()
+                avancados = self._ciclo(options)
+                connection.close()
+                if options['once'] and avancados == 0:
+                    break
+                if not options['once']:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Interrompido."))
+        self.stdout.write(self.style.NOTICE("Materializador finalizado."))
+
+    def _ciclo(self, options):
+        modelos = PredictionModel.objects.filter(horizon_days__gt=0).order_by('id')
+        if options['model_ids']:
+            modelos = modelos.filter(id__in=options['model_ids'])
+
+        inicio_ciclo = time.perf_counter()
+        total_avancados = total_gravados = total_apagadas = 0
+        for model_db in modelos:
+            t0 = time.perf_counter()
+            try:
+                # Duas instâncias do materializador não processam o mesmo modelo ao mesmo tempo
+                with single_flight(f"materialize:{model_db.id}"):
+                    model_db.refresh_from_db()
+                    avancados, gravados = materializar_modelo(model_db, max_pontos=options['max_points'])
+                    apagadas = podar_modelo(model_db)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"-> Modelo ID {model_db.id} ({model_db.name}): {e}"))
+                continue
+
+            total_avancados += avancados
+            total_gravados += gravados
+            total_apagadas += apagadas
+            if avancados or apagadas:
+                self.stdout.write(
+                    f"-> Modelo ID {model_db.id} ({model_db.name}): +{avancados} datas na janela, "
+                    f"{gravados} geradas, {apagadas} apagadas, "
+                    f"janela até {model_db.materialized_until:%Y-%m-%d %H:%M} ({time.perf_counter() - t0:.2f}s)"
+                )
+
+        self.stdout.write(
+            f"Ciclo concluído em {time.perf_counter() - inicio_ciclo:.2f}s: "
+            f"{total_gravados} previsões gravadas, {total_apagadas} apagadas."
+        )
+        return total_avancados
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from predictions import http_cache
+from predictions.models import PredictionModel
+from predictions.rollups import recalcular_modelo
+
+
+class Command(BaseCommand):
+    help = (
+        "Refaz os agregados diários, semanais e mensais (PredictionRollup) a partir das previsões gravadas. "
+        "Necessário depois de gravar previsões com PREDICTION_ROLLUPS_ENABLED=0 ou na primeira implantação."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-id', type=int, action='append', dest='model_ids', help="Filtra por PredictionModel (pode repetir).")
+
+    def handle(self, *args, **options):
+        modelos = PredictionModel.objects.order_by('id')
+        if options['model_ids']:
+            modelos = modelos.filter(id__in=options['model_ids'])
+
+        for model_db in modelos:
+            gravados = recalcular_modelo(model_db)
+            http_cache.invalidate_predictions(model_db)
+            self.stdout.write(f"Modelo ID {model_db.id} ({model_db.name}): {gravados} agregados.")
+        self.stdout.write(self.style.SUCCESS("Agregados recalculados."))
@@ -0,0 +1,67 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from predictions.jobs import claim_next_job, heartbeat, requeue_expired_jobs, run_prediction_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Processa a fila de PredictionJob com concorrência limitada. Renova o lease dos jobs em execução "
+        "e devolve à fila os jobs de workers que pararam de responder (PREDICTION_JOB_LEASE_SECONDS)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help="Quantidade máxima de jobs simultâneos.")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Segundos entre consultas à fila vazia.")
+        parser.add_argument('--once', action='store_true', help="Processa os jobs pendentes e encerra quando a fila esvaziar.")
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        self.stdout.write(self.style.NOTICE(f"Worker de jobs iniciado (concorrência: {concurrency})."))
+
+        em_execucao = {}
+        # Heartbeat e verificação de leases expirados algumas vezes dentro de cada lease
+        intervalo_lease = settings.PREDICTION_JOB_LEASE_SECONDS / 5
+        ultima_renovacao = 0.0
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            try:
+                while True:
+                    if time.monotonic() - ultima_renovacao >= intervalo_lease:
+                        heartbeat(em_execucao.values())
+                        reenfileirados, falhos = requeue_expired_jobs()
+                        if reenfileirados or falhos:
+                            self.stdout.write(self.style.WARNING(
+                                f"Leases expirados: {reenfileirados} job(s) de volta à fila, {falhos} marcado(s) como falhos."
+                            ))
+                        ultima_renovacao = time.monotonic()
+
+                    while len(em_execucao) < concurrency:
+                        job_id = claim_next_job()
+                        if job_id is None:
+                            break
+                        self.stdout.write(f"Job {job_id} iniciado.")
+                        em_execucao[executor.submit(run_prediction_job, job_id)] = job_id
+                    connection.close()
+
+                    if not em_execucao:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    concluidos, _ = wait(list(em_execucao), timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    for future in concluidos:
+                        job_id = em_execucao.pop(future)
+                        try:
+                            gravados = future.result()
+                            self.stdout.write(self.style.SUCCESS(f"Job {job_id} concluído: {gravados} registros."))
+                        except Exception as e:
+                            self.stdout.write(self.style.ERROR(f"Job {job_id} falhou: {e}"))
+            except KeyboardInterrupt:
+                self.stdout.write(self.style.WARNING("Interrompido; aguardando os jobs em execução terminarem..."))
+
+        self.stdout.write(self.style.NOTICE("Worker de jobs finalizado."))
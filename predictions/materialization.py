@@ -0,0 +1,103 @@
+# Em predictions/materialization.py
+from datetime import timezone as dt_timezone
+
+import pandas as pd
+from django.utils import timezone
+
+from . import http_cache, rollups
+from .models import Prediction, PredictionModel
+
+
+def _naive_utc(valor):
+    return pd.Timestamp(valor.astimezone(dt_timezone.utc).replace(tzinfo=None))
+
+
+def _aware(valor):
+    return pd.Timestamp(valor).tz_localize('UTC').to_pydatetime()
+
+
+def janela_materializada(model_db):
+    """(inicio, fim) naive em UTC em que todas as previsões do modelo estão gravadas, ou None."""
+    if model_db.materialized_from is None or model_db.materialized_until is None:
+        return None
+    return _naive_utc(model_db.materialized_from), _naive_utc(model_db.materialized_until)
+
+
+def dentro_da_janela(model_db, data_inicio, data_fim):
+    """True se o intervalo pedido está todo dentro da janela materializada (não precisa de inferência)."""
+    janela = janela_materializada(model_db)
+    return janela is not None and janela[0] <= data_inicio and data_fim <= janela[1]
+
+
+def limite_de_retencao(model_db, agora=None):
+    """Data (com fuso) antes da qual as previsões do modelo são apagadas pelo materializador, ou None."""
+    if model_db.retention_days is None:
+        return None
+    return (agora or timezone.now()) - pd.Timedelta(days=model_db.retention_days)
+
+
+def materializar_modelo(model_db, agora=None, max_pontos=None):
+    """
+    Estende a janela materializada do modelo até agora + horizon_days, a partir do fim da
+    janela atual (ou do início do dia local, na primeira vez). Gera no máximo `max_pontos`
+    datas por chamada. Retorna (datas acrescentadas à janela, previsões geradas); datas que
+    já tinham previsão (ex.: gravadas por um lazy load) entram na janela sem nova inferência.
+    """
+    from .views import grade_esperada, parse_and_validate_dates, process_missing_predictions
+
+    agora = agora or timezone.now()
+    # Mesma normalização das leituras: o início do dia local e o fim do horizonte
+    hoje, _ = parse_and_validate_dates(agora.isoformat(), agora.isoformat(), granularity='D')
+    _, alvo = parse_and_validate_dates(
+        agora.isoformat(), (agora + pd.Timedelta(days=model_db.horizon_days)).isoformat(), granularity=model_db.granularity
+    )
+
+    janela = janela_materializada(model_db)
+    # Janela que não alcança hoje (materializador parado por muito tempo) recomeça de hoje
+    inicio = janela[1] if janela is not None and janela[1] >= hoje else hoje
+    grade = grade_esperada(model_db, inicio, alvo)
+    if janela is not None and inicio == janela[1]:
+        grade = grade[grade > janela[1]]
+    if max_pontos:
+        grade = grade[:max_pontos]
+    if grade.empty:
+        return 0, 0
+
+    gravados = process_missing_predictions(model_db, grade[0], grade[-1])
+
+    # update() não dispara os signals de PredictionModel (registro/cache continuam válidos)
+    de = janela[0] if janela is not None and inicio == janela[1] else grade[0]
+    PredictionModel.objects.filter(id=model_db.id).update(materialized_from=_aware(de), materialized_until=_aware(grade[-1]))
+    model_db.materialized_from, model_db.materialized_until = _aware(de), _aware(grade[-1])
+    return len(grade), gravados
+
+
+def podar_modelo(model_db, agora=None):
+    """
+    Apaga de uma vez as previsões anteriores a agora - retention_days e avança o início
+    da janela materializada. Retorna a quantidade de linhas apagadas.
+    """
+    limite = limite_de_retencao(model_db, agora)
+    if limite is None:
+        return 0
+
+    # Sem signals nem cascatas em Prediction, o Django faz um único DELETE ... WHERE
+    apagadas, _ = Prediction.objects.filter(model_id=model_db.id, prediction_datetime__lt=limite).delete()
+
+    avancar_inicio_das_janelas(limite, model_ids=[model_db.id])
+    if apagadas:
+        rollups.podar_rollups(limite, model_ids=[model_db.id])
+    if model_db.materialized_from is not None and model_db.materialized_from < limite:
+        model_db.materialized_from = limite
+
+    if apagadas:
+        http_cache.invalidate_predictions(model_db)
+    return apagadas
+
+
+def avancar_inicio_das_janelas(limite, model_ids=None):
+    """Ajusta o início das janelas materializadas após apagar/arquivar previsões anteriores a `limite`."""
+    modelos = PredictionModel.objects.filter(materialized_from__lt=limite)
+    if model_ids:
+        modelos = modelos.filter(id__in=model_ids)
+    return modelos.update(materialized_from=limite)
@@ -0,0 +1,310 @@
+# Em predictions/metrics.py
+"""
+Métricas de desempenho do pipeline de previsão no formato de texto do Prometheus.
+
+Cada processo acumula contadores e histogramas em memória e grava periodicamente um
+snapshot em PREDICTION_METRICS_DIR (um arquivo por PID). O endpoint /metrics soma os
+snapshots dos processos vivos, então a leitura vale para todos os workers do gunicorn
+do host, e não só para o que atendeu o scrape. O snapshot de um processo encerrado é
+somado ao acumulado dos encerrados antes de ser removido, para os contadores nunca
+diminuírem (o Prometheus leria a queda como um reset).
+
+As etapas medidas com `etapa()`/`registrar_etapa()` também vão para o header
+Server-Timing da requisição em andamento (ver predictions/middleware.py).
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem flock, a agregação é serializada só dentro do processo
+    fcntl = None
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# nome -> (tipo, descrição)
+DEFINICOES = {
+    'predictions_http_request_seconds': ('histogram', "Duração das requisições HTTP por rota, método e status."),
+    'predictions_stage_seconds': ('histogram', "Duração de cada etapa do pipeline (load, features, inference, db_write, rollup, serialize)."),
+    'predictions_model_registry_requests_total': ('counter', "Consultas ao registro de modelos em memória por resultado (hit/miss)."),
+    'predictions_http_cache_requests_total': ('counter', "Leituras do cache HTTP de previsões por resultado (hit/not_modified/miss)."),
+    'predictions_lazy_load_triggers_total': ('counter', "Leituras que dispararam a geração de previsões faltantes (lazy load)."),
+    'predictions_rows_written_total': ('counter', "Previsões gravadas (upsert) no banco."),
+}
+
+# Soma dos snapshots de processos já encerrados, no mesmo formato dos snapshots
+ARQUIVO_ENCERRADOS = 'encerrados.json'
+
+_tempos_requisicao = contextvars.ContextVar('predictions_tempos_requisicao', default=None)
+_lock_agregacao = threading.Lock()
+
+
+def _chave(nome, labels):
+    return nome, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metricas:
+    """Contadores e histogramas do processo, gravados em disco no máximo a cada `intervalo` segundos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._zerar()
+
+    def _zerar(self):
+        self._pid = os.getpid()
+        self._contadores = {}
+        self._histogramas = {}
+        self._ultimo_flush = 0.0
+
+    def inc(self, nome, valor=1, **labels):
+        chave = _chave(nome, labels)
+        if DEFINICOES[nome][0] != 'counter':
+            raise ValueError(f"Métrica '{nome}' não é um contador.")
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def observe(self, nome, segundos, **labels):
+        chave = _chave(nome, labels)
+        if DEFINICOES[nome][0] != 'histogram':
+            raise ValueError(f"Métrica '{nome}' não é um histograma.")
+        with self._lock:
+            hist = self._histogramas.get(chave)
+            if hist is None:
+                hist = self._histogramas[chave] = [[0] * (len(BUCKETS) + 1), 0.0]
+            posicao = next((i for i, limite in enumerate(BUCKETS) if segundos <= limite), len(BUCKETS))
+            hist[0][posicao] += 1
+            hist[1] += segundos
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'contadores': [[nome, dict(labels), valor] for (nome, labels), valor in self._contadores.items()],
+                'histogramas': [[nome, dict(labels), list(b), s] for (nome, labels), (b, s) in self._histogramas.items()],
+            }
+
+    def flush(self, forcar=False):
+        """Grava o snapshot do processo (atômico: arquivo temporário + rename)."""
+        agora = time.monotonic()
+        if not forcar and agora - self._ultimo_flush < settings.PREDICTION_METRICS_FLUSH_INTERVAL:
+            return
+        self._ultimo_flush = agora
+
+        diretorio = settings.PREDICTION_METRICS_DIR
+        os.makedirs(diretorio, exist_ok=True)
+        _gravar_snapshot(os.path.join(diretorio, f"{os.getpid()}.json"), self.snapshot())
+
+    def _apos_fork(self):
+        # O filho herda a memória do pai (ex.: pre-warm no master): começa do zero para não contar em dobro
+        self._lock = threading.Lock()
+        self._zerar()
+
+
+metricas = Metricas()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=lambda: _flush_seguro(metricas), after_in_child=metricas._apos_fork)
+
+
+def _flush_seguro(registro):
+    try:
+        registro.flush(forcar=True)
+    except Exception:
+        pass
+
+
+def registrar_etapa(nome, segundos, **labels):
+    """Registra a duração de uma etapa no histograma e no Server-Timing da requisição atual."""
+    metricas.observe('predictions_stage_seconds', segundos, stage=nome, **labels)
+    tempos = _tempos_requisicao.get()
+    if tempos is not None:
+        tempos[nome] = tempos.get(nome, 0.0) + segundos
+
+
+@contextmanager
+def etapa(nome, **labels):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_etapa(nome, time.perf_counter() - inicio, **labels)
+
+
+@contextmanager
+def coletar_etapas():
+    """
+    Acumula à parte as etapas registradas dentro do bloco ({etapa: segundos}), sem tirá-las
+    do Server-Timing da requisição atual.
+    """
+    parciais = {}
+    externas = _tempos_requisicao.get()
+    token = _tempos_requisicao.set(parciais)
+    try:
+        yield parciais
+    finally:
+        _tempos_requisicao.reset(token)
+        if externas is not None:
+            for nome, segundos in parciais.items():
+                externas[nome] = externas.get(nome, 0.0) + segundos
+
+
+def iniciar_requisicao():
+    """Começa a acumular as etapas da requisição; devolve o token para `finalizar_requisicao`."""
+    return _tempos_requisicao.set({})
+
+
+def finalizar_requisicao(token):
+    """Encerra a requisição e devolve {etapa: segundos} acumulados nela."""
+    tempos = _tempos_requisicao.get() or {}
+    _tempos_requisicao.reset(token)
+    return tempos
+
+
+def _pid_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _gravar_snapshot(destino, snapshot):
+    # Atômico: arquivo temporário + rename
+    temporario = f"{destino}.tmp"
+    with open(temporario, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(temporario, destino)
+
+
+def _ler_snapshot(caminho):
+    try:
+        with open(caminho, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _somar(contadores, histogramas, snapshot):
+    for nome, labels, valor in snapshot['contadores']:
+        chave = _chave(nome, labels)
+        contadores[chave] = contadores.get(chave, 0) + valor
+    for nome, labels, buckets, soma in snapshot['histogramas']:
+        chave = _chave(nome, labels)
+        atual = histogramas.setdefault(chave, [[0] * (len(BUCKETS) + 1), 0.0])
+        atual[0] = [a + b for a, b in zip(atual[0], buckets)]
+        atual[1] += soma
+
+
+@contextmanager
+def _agregacao_exclusiva(diretorio):
+    """
+    Uma agregação por vez no host (flock no diretório das métricas): duas leituras simultâneas
+    não podem somar o mesmo snapshot encerrado ao acumulado, nem ver o snapshot já somado e
+    ainda não removido.
+    """
+    with _lock_agregacao:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(diretorio, 'agregacao.lock'), 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _agregar():
+    """
+    Soma os snapshots dos processos vivos e o acumulado dos encerrados. Os snapshots de
+    processos encerrados entram no acumulado e só então são removidos.
+    """
+    _flush_seguro(metricas)
+    contadores, histogramas = {}, {}
+    diretorio = settings.PREDICTION_METRICS_DIR
+    try:
+        os.makedirs(diretorio, exist_ok=True)
+    except OSError:
+        return contadores, histogramas
+
+    with _agregacao_exclusiva(diretorio):
+        vivos, encerrados, temporarios = [], [], []
+        for nome_arquivo in os.listdir(diretorio):
+            pid, _, extensao = nome_arquivo.partition('.')
+            if extensao not in ('json', 'json.tmp') or not pid.isdigit():
+                continue
+            caminho = os.path.join(diretorio, nome_arquivo)
+            if _pid_vivo(int(pid)):
+                if extensao == 'json':
+                    vivos.append(caminho)
+            else:
+                (encerrados if extensao == 'json' else temporarios).append(caminho)
+
+        caminho_acumulado = os.path.join(diretorio, ARQUIVO_ENCERRADOS)
+        acumulado = _ler_snapshot(caminho_acumulado)
+        if acumulado is not None:
+            _somar(contadores, histogramas, acumulado)
+
+        if encerrados:
+            for caminho in encerrados:
+                snapshot = _ler_snapshot(caminho)
+                if snapshot is not None:
+                    _somar(contadores, histogramas, snapshot)
+            _gravar_snapshot(caminho_acumulado, {
+                'contadores': [[nome, dict(labels), valor] for (nome, labels), valor in contadores.items()],
+                'histogramas': [[nome, dict(labels), list(b), s] for (nome, labels), (b, s) in histogramas.items()],
+            })
+        for caminho in encerrados + temporarios:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+        for caminho in vivos:
+            snapshot = _ler_snapshot(caminho)
+            if snapshot is not None:
+                _somar(contadores, histogramas, snapshot)
+    return contadores, histogramas
+
+
+def _labels_texto(labels, extra=()):
+    pares = list(labels) + list(extra)
+    if not pares:
+        return ''
+    valores = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pares)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pares, valores)) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exposicao():
+    """Texto no formato de exposição do Prometheus (text/plain; version=0.0.4)."""
+    contadores, histogramas = _agregar()
+    linhas = []
+    for nome, (tipo, descricao) in DEFINICOES.items():
+        linhas.append(f"# HELP {nome} {descricao}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        if tipo == 'counter':
+            for (nome_m, labels), valor in sorted(contadores.items()):
+                if nome_m == nome:
+                    linhas.append(f"{nome}{_labels_texto(labels)} {_numero(valor)}")
+        else:
+            for (nome_m, labels), (buckets, soma) in sorted(histogramas.items()):
+                if nome_m != nome:
+                    continue
+                acumulado = 0
+                for limite, quantidade in zip(BUCKETS + ('+Inf',), buckets):
+                    acumulado += quantidade
+                    linhas.append(f"{nome}_bucket{_labels_texto(labels, [('le', limite)])} {acumulado}")
+                linhas.append(f"{nome}_sum{_labels_texto(labels)} {_numero(soma)}")
+                linhas.append(f"{nome}_count{_labels_texto(labels)} {acumulado}")
+    return '\n'.join(linhas) + '\n'
@@ -0,0 +1,91 @@
+# Em predictions/middleware.py
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ServerTimingMiddleware:
+    """
+    Mede cada requisição e devolve as etapas do pipeline registradas durante ela
+    (load, features, inference, db_write, serialize) no header Server-Timing, além do total.
+    Também alimenta o histograma de latência por rota exposto em /metrics.
+    Deve ser o primeiro da lista MIDDLEWARE para que o total inclua os demais.
+    Funciona em WSGI e ASGI (sem forçar as views assíncronas para uma thread).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = metrics.iniciar_requisicao()
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            tempos = metrics.finalizar_requisicao(token)
+        return self._finalizar(request, response, tempos, time.perf_counter() - inicio)
+
+    async def __acall__(self, request):
+        token = metrics.iniciar_requisicao()
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            tempos = metrics.finalizar_requisicao(token)
+        return self._finalizar(request, response, tempos, time.perf_counter() - inicio)
+
+    def _finalizar(self, request, response, tempos, total):
+        partes = [f"{nome};dur={segundos * 1000:.1f}" for nome, segundos in tempos.items()]
+        partes.append(f"total;dur={total * 1000:.1f}")
+        response['Server-Timing'] = ', '.join(partes)
+
+        rota = request.resolver_match.url_name if request.resolver_match else None
+        metrics.metricas.observe(
+            'predictions_http_request_seconds', total,
+            view=rota or 'desconhecida', method=request.method, status=response.status_code,
+        )
+        try:
+            metrics.metricas.flush()
+        except OSError as e:
+            logger.warning("Não foi possível gravar o snapshot de métricas: %s", e)
+
+        logger.debug("%s %s -> %s em %.1f ms (%s)", request.method, request.path, response.status_code, total * 1000, response['Server-Timing'])
+        return response
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise com suporte a ASGI. O middleware original é só síncrono e, sob ASGI, faria
+    o Django executar toda a cadeia (e as views assíncronas) numa thread por requisição.
+    Os arquivos estáticos continuam servidos pelo WhiteNoise; o resto segue assíncrono.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        static_file = self.find_file(request.path_info) if self.autorefresh else self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def preencher_forecast(apps, schema_editor):
+    Prediction = apps.get_model('predictions', 'Prediction')
+    PredictionModel = apps.get_model('predictions', 'PredictionModel')
+    Prediction.objects.update(
+        forecast_id=Subquery(PredictionModel.objects.filter(id=OuterRef('model_id')).values('forecast_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0005_predictionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prediction',
+            name='forecast',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='predictions', to='predictions.forecast'),
+        ),
+        migrations.RunPython(preencher_forecast, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='prediction',
+            name='forecast',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='predictions', to='predictions.forecast'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['forecast', 'prediction_datetime'], name='pred_forecast_dt_idx'),
+        ),
+        migrations.CreateModel(
+            name='PredictionArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prediction_datetime', models.DateTimeField()),
+                ('value', models.FloatField()),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('forecast', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_predictions', to='predictions.forecast')),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_predictions', to='predictions.predictionmodel')),
+            ],
+            options={
+                'unique_together': {('model', 'prediction_datetime')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0006_prediction_forecast_indexes_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionmodel',
+            name='horizon_days',
+            field=models.PositiveIntegerField(default=0, help_text='Dias à frente mantidos pré-calculados pelo materializador (0 = desligado).'),
+        ),
+        migrations.AddField(
+            model_name='predictionmodel',
+            name='materialized_from',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='predictionmodel',
+            name='materialized_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='predictionmodel',
+            name='retention_days',
+            field=models.PositiveIntegerField(blank=True, help_text='Previsões mais antigas que isso são apagadas pelo materializador (vazio = mantém).', null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0007_predictionmodel_materialization'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('D', 'Diário'), ('W', 'Semanal'), ('M', 'Mensal')], max_length=1)),
+                ('period_start', models.DateTimeField()),
+                ('value_sum', models.FloatField()),
+                ('value_mean', models.FloatField()),
+                ('value_max', models.FloatField()),
+                ('count', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='predictions.predictionmodel')),
+            ],
+            options={
+                'unique_together': {('model', 'resolution', 'period_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def aplicar_journal_mode(apps, schema_editor):
+    # O modo fica gravado no arquivo do banco: basta aplicar uma vez, fora de transação
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}')
+
+
+def voltar_para_delete(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=DELETE')
+
+
+class Migration(migrations.Migration):
+    # PRAGMA journal_mode não tem efeito dentro de uma transação
+    atomic = False
+
+    dependencies = [
+        ('predictions', '0008_predictionrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(aplicar_journal_mode, voltar_para_delete),
+    ]
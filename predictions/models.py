@@ -34,6 +34,17 @@ class PredictionModel(models.Model):
     exog_rules = models.JSONField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Materialização contínua (manage.py materialize_predictions)
+    horizon_days = models.PositiveIntegerField(
+        default=0, help_text="Dias à frente mantidos pré-calculados pelo materializador (0 = desligado)."
+    )
+    retention_days = models.PositiveIntegerField(
+        blank=True, null=True, help_text="Previsões mais antigas que isso são apagadas pelo materializador (vazio = mantém)."
+    )
+    # Intervalo em que todas as previsões estão gravadas; leituras dentro dele não disparam inferência
+    materialized_from = models.DateTimeField(blank=True, null=True, editable=False)
+    materialized_until = models.DateTimeField(blank=True, null=True, editable=False)
+
     class Meta:
         unique_together = ("forecast", "name")
 
@@ -47,12 +58,119 @@ class Prediction(models.Model):
         on_delete=models.CASCADE,
         related_name="predictions",
     )
+    # Cópia de model.forecast_id para filtrar por Forecast sem join (mantida pelos writers e signals)
+    forecast = models.ForeignKey(
+        Forecast,
+        on_delete=models.CASCADE,
+        related_name="predictions",
+        editable=False,
+        db_index=False,  # coberto por pred_forecast_dt_idx
+    )
     prediction_datetime = models.DateTimeField()
     value = models.FloatField()
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ("model", "prediction_datetime")
+        indexes = [
+            # Leituras de um Forecast inteiro por intervalo, já ordenadas por data
+            models.Index(fields=["forecast", "prediction_datetime"], name="pred_forecast_dt_idx"),
+            # Leituras de um modelo por intervalo usam o índice da chave única (model, prediction_datetime).
+            # Sem índice de cobertura (model, prediction_datetime, value): as linhas já saem em ordem
+            # pelo índice único e o value é lido da tabela; o índice extra repetia as mesmas colunas,
+            # encarecia cada upsert e aumentava o banco sem ganho nas leituras.
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.forecast_id is None and self.model_id is not None:
+            self.forecast_id = PredictionModel.objects.values_list('forecast_id', flat=True).get(id=self.model_id)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.model} - {self.prediction_datetime}: {self.value}"
+
+
+class PredictionArchive(models.Model):
+    """
+    Previsões de horizontes antigos, movidas da tabela principal pelo comando archive_predictions.
+    """
+    model = models.ForeignKey(
+        PredictionModel,
+        on_delete=models.CASCADE,
+        related_name="archived_predictions",
+    )
+    forecast = models.ForeignKey(
+        Forecast,
+        on_delete=models.CASCADE,
+        related_name="archived_predictions",
+    )
+    prediction_datetime = models.DateTimeField()
+    value = models.FloatField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("model", "prediction_datetime")
+
+    def __str__(self):
+        return f"{self.model} - {self.prediction_datetime}: {self.value} (arquivada)"
+
+class PredictionRollup(models.Model):
+    """
+    Agregados das previsões de um modelo por dia, semana (segunda a domingo) ou mês locais.
+    Recalculados por predictions/rollups.py para os períodos tocados a cada gravação.
+    """
+    RESOLUTION_CHOICES = [
+        ('D', 'Diário'),
+        ('W', 'Semanal'),
+        ('M', 'Mensal'),
+    ]
+
+    model = models.ForeignKey(
+        PredictionModel,
+        on_delete=models.CASCADE,
+        related_name="rollups",
+    )
+    resolution = models.CharField(max_length=1, choices=RESOLUTION_CHOICES)
+    # Início do período local (00:00 em UTC-3), gravado em UTC como prediction_datetime
+    period_start = models.DateTimeField()
+    value_sum = models.FloatField()
+    value_mean = models.FloatField()
+    value_max = models.FloatField()
+    count = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("model", "resolution", "period_start")
+
+    def __str__(self):
+        return f"{self.model} - {self.get_resolution_display()} {self.period_start}: {self.value_sum}"
+
+class PredictionJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('running', 'Executando'),
+        ('done', 'Concluído'),
+        ('failed', 'Falhou'),
+    ]
+
+    model = models.ForeignKey(
+        PredictionModel,
+        on_delete=models.CASCADE,
+        related_name="jobs",
+    )
+    start_datetime = models.DateTimeField()
+    end_datetime = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    progress = models.FloatField(default=0)
+    rows_written = models.IntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    # Renovado pelo worker enquanto o job roda; sem renovação dentro do lease o job volta para a fila
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
 
     def __str__(self):
-        return f"{self.model} - {self.prediction_datetime}: {self.value}"
\ No newline at end of file
+        return f"Job {self.id} - {self.model} [{self.status}]"
@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class PredictionCursorPagination(CursorPagination):
+    """
+    Paginação por cursor (keyset) em prediction_datetime.
+    Só é ativada quando o cliente envia `page_size`; sem ele a resposta continua sendo a lista completa.
+    """
+    ordering = ('prediction_datetime', 'id')
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 10000
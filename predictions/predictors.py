@@ -0,0 +1,352 @@
+# Em predictions/predictors.py
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .features import (
+    DESLOCAMENTO_LOCAL,
+    FEATURES_XGBOOST,
+    horario_local,
+    matriz_features_xgboost,
+    prepare_future_exog,
+)
+from .metrics import registrar_etapa
+
+logger = logging.getLogger(__name__)
+
+# Registro dos motores de previsão por PredictionModel.model_type
+PREDICTORS = {}
+
+# Granularidades do Admin que o pandas passou a escrever de outro jeito
+ALIAS_FREQUENCIA = {'H': 'h'}
+
+
+def register(cls):
+    """Decorator: registra o motor para o seu model_type."""
+    PREDICTORS[cls.model_type] = cls()
+    return cls
+
+
+def get_predictor(model_type):
+    predictor = PREDICTORS.get(model_type)
+    if predictor is None:
+        raise ValueError(f"Tipo '{model_type}' não suportado.")
+    return predictor
+
+
+def gerar_datas(data_inicio, data_fim, freq):
+    return pd.date_range(start=data_inicio, end=data_fim, freq=ALIAS_FREQUENCIA.get(freq, freq))
+
+
+def colunas_exogenas(model_db, nomes_do_modelo=None):
+    """Colunas exógenas na ordem do treino: exog_columns do Admin ou, se vazio, as guardadas no próprio modelo."""
+    colunas = model_db.exog_columns or nomes_do_modelo or []
+    return [str(c) for c in colunas]
+
+
+def prophet_yhat(modelo, df):
+    """
+    Previsão pontual do Prophet sem amostragem de incerteza: tendência mais os termos
+    sazonais aditivos/multiplicativos, nas mesmas contas de Prophet.predict (que também
+    calcula yhat_lower/yhat_upper por Monte Carlo e cada componente separado).
+    """
+    df = modelo.setup_dataframe(df.copy())
+    tendencia = modelo.predict_trend(df).to_numpy()
+    features, _, componentes, _ = modelo.make_all_seasonality_features(df)
+    X = features.to_numpy()
+    beta = modelo.params['beta']
+
+    aditivo = np.nanmean(X @ (beta * componentes['additive_terms'].to_numpy()).T, axis=1) * modelo.y_scale
+    multiplicativo = np.nanmean(X @ (beta * componentes['multiplicative_terms'].to_numpy()).T, axis=1)
+    return tendencia * (1 + multiplicativo) + aditivo
+
+
+def pos_processar(valores, inteiro=False, casas=2):
+    """
+    Pós-processamento comum a todos os motores, vetorizado: ocupação não negativa,
+    arredondada (ou truncada para inteiro). NaN é mantido para ser descartado depois.
+    """
+    valores = np.maximum(np.asarray(valores, dtype=np.float64), 0)
+    if inteiro:
+        return np.trunc(valores)
+    return np.round(valores, casas)
+
+
+class Predictor:
+    """
+    Interface de um motor de previsão:
+
+    - load(full_path): lê o arquivo do modelo;
+    - build_features(model_db, modelo, datas): entrada do modelo para as datas (naive, UTC);
+    - predict_batch(model_db, modelo, datas, features): valores brutos, um por data.
+
+    Motores com suporta_artefato também sabem gravar/ler um artefato de inferência
+    compacto (export_artifact/load_artifact; ver predictions/artifacts.py).
+
+    As features de motores que devolvem chave_features(model_db) são reaproveitadas
+    entre modelos com a mesma chave (ex.: no lote de /predict/batch).
+    """
+    model_type = None
+    extensoes = ('.pkl',)
+    valores_inteiros = False
+    suporta_artefato = False
+
+    def load(self, full_path):
+        import joblib
+
+        logger.info("Carregando modelo PKL (Joblib) de: %s", full_path)
+        return joblib.load(full_path)
+
+    def frequencia(self, model_db):
+        return model_db.granularity
+
+    def chave_features(self, model_db):
+        return None
+
+    def build_features(self, model_db, modelo, datas):
+        raise NotImplementedError
+
+    def predict_batch(self, model_db, modelo, datas, features):
+        raise NotImplementedError
+
+    def predict_intervals(self, model_db, modelo, datas, features):
+        """(valores, inferior, superior) para motores com intervalo de previsão."""
+        raise ValueError(f"Tipo '{self.model_type}' não calcula intervalos de previsão.")
+
+    def export_artifact(self, modelo, destino):
+        """Grava o artefato no diretório `destino` e retorna metadados extras (dict)."""
+        raise NotImplementedError
+
+    def load_artifact(self, destino, meta):
+        raise NotImplementedError
+
+
+@register
+class ProphetPredictor(Predictor):
+    """
+    Artefato: parâmetros ajustados, changepoints e as colunas do histórico de treino em .npy
+    (lidos com mmap, páginas compartilhadas entre os workers) e o restante da configuração em
+    JSON. O histórico fica no artefato porque Prophet.predict (intervalos) exige um modelo ajustado.
+    """
+    model_type = 'prophet'
+    extensoes = ('.json',)
+    suporta_artefato = True
+
+    def load(self, full_path):
+        from prophet.serialize import model_from_json
+
+        logger.info("Carregando modelo Prophet de: %s", full_path)
+        with open(full_path, 'r') as f:
+            return model_from_json(f.read())
+
+    def chave_features(self, model_db):
+        return ('prophet', model_db.granularity)
+
+    def build_features(self, model_db, modelo, datas):
+        if model_db.granularity not in ['H', 'D']:
+            raise ValueError(f"Prophet com granularidade '{model_db.granularity}' não suportada.")
+
+        # O Prophet precisa receber a hora local (00:00) para entender feriados e sazonalidade diária
+        df_para_modelo = pd.DataFrame({'ds': horario_local(datas)})
+        if model_db.granularity == 'H':
+            dia_semana = df_para_modelo['ds'].dt.dayofweek
+            df_para_modelo['weekday'] = dia_semana < 5
+            df_para_modelo['weekend'] = dia_semana >= 5
+        return df_para_modelo
+
+    def predict_batch(self, model_db, modelo, datas, features):
+        return prophet_yhat(modelo, features)
+
+    def predict_intervals(self, model_db, modelo, datas, features):
+        # Caminho completo do Prophet, com a amostragem de incerteza
+        forecast = modelo.predict(features)
+        return forecast['yhat'].to_numpy(), forecast['yhat_lower'].to_numpy(), forecast['yhat_upper'].to_numpy()
+
+    def export_artifact(self, modelo, destino):
+        from prophet.serialize import model_to_dict
+
+        config = model_to_dict(modelo)
+        config['history'] = None
+        config['history_dates'] = None
+        config['changepoints_t'] = []
+        config['params'] = {}
+
+        arrays = {f'param_{nome}': valor for nome, valor in modelo.params.items()}
+        arrays['changepoints_t'] = modelo.changepoints_t
+        arrays.update({f'history_{i}': modelo.history[coluna].to_numpy() for i, coluna in enumerate(modelo.history.columns)})
+        for nome, valor in arrays.items():
+            np.save(os.path.join(destino, f'{nome}.npy'), np.ascontiguousarray(valor))
+        with open(os.path.join(destino, 'prophet.json'), 'w') as f:
+            json.dump(config, f)
+        return {'params': sorted(modelo.params), 'history': [str(coluna) for coluna in modelo.history.columns]}
+
+    def load_artifact(self, destino, meta):
+        from prophet.serialize import model_from_dict
+
+        with open(os.path.join(destino, 'prophet.json'), 'r') as f:
+            modelo = model_from_dict(json.load(f))
+        modelo.params = {
+            nome: np.load(os.path.join(destino, f'param_{nome}.npy'), mmap_mode='r') for nome in meta['params']
+        }
+        modelo.changepoints_t = np.load(os.path.join(destino, 'changepoints_t.npy'), mmap_mode='r')
+        modelo.history = pd.DataFrame({
+            coluna: np.load(os.path.join(destino, f'history_{i}.npy'), mmap_mode='r')
+            for i, coluna in enumerate(meta['history'])
+        })
+        # Como em Prophet.fit
+        modelo.history_dates = pd.to_datetime(pd.Series(modelo.history['ds'].unique(), name='ds')).sort_values()
+        return modelo
+
+
+@register
+class XGBoostPredictor(Predictor):
+    """Artefato: booster no formato nativo UBJSON do XGBoost (sem pickle)."""
+    model_type = 'xgboost'
+    valores_inteiros = True
+    suporta_artefato = True
+
+    def frequencia(self, model_db):
+        # O XGBoost foi treinado com dados diários, independente da granularidade cadastrada
+        return 'D'
+
+    def chave_features(self, model_db):
+        return ('calendario',)
+
+    def build_features(self, model_db, modelo, datas):
+        return pd.DataFrame(matriz_features_xgboost(datas), columns=FEATURES_XGBOOST)
+
+    def predict_batch(self, model_db, modelo, datas, features):
+        return modelo.predict(features)
+
+    def export_artifact(self, modelo, destino):
+        modelo.save_model(os.path.join(destino, 'model.ubj'))
+        return {'classe': type(modelo).__name__}
+
+    def load_artifact(self, destino, meta):
+        import xgboost as xgb
+
+        modelo = getattr(xgb, meta.get('classe', 'XGBRegressor'))()
+        modelo.load_model(os.path.join(destino, 'model.ubj'))
+        return modelo
+
+
+@register
+class LightGBMPredictor(Predictor):
+    """LightGBM (LGBMRegressor ou Booster): features de exog_columns/exog_rules."""
+    model_type = 'lgbm'
+
+    def _colunas(self, model_db, modelo):
+        nomes_do_modelo = getattr(modelo, 'feature_name_', None)
+        if nomes_do_modelo is None and hasattr(modelo, 'feature_name'):
+            nomes_do_modelo = modelo.feature_name()
+        colunas = colunas_exogenas(model_db, nomes_do_modelo)
+        if not colunas:
+            raise ValueError("Modelo LightGBM sem colunas de features: preencha 'exog_columns' no Admin.")
+        return colunas
+
+    def build_features(self, model_db, modelo, datas):
+        colunas = self._colunas(model_db, modelo)
+        return pd.DataFrame(prepare_future_exog(colunas, model_db.exog_rules, datas), columns=colunas)
+
+    def predict_batch(self, model_db, modelo, datas, features):
+        if features.empty:
+            return np.empty(0)
+        return modelo.predict(features)
+
+
+@register
+class SARIMAXPredictor(Predictor):
+    """
+    SARIMAX (statsmodels): uma única chamada get_forecast cobre do fim do treino até a última data
+    pedida; as datas dentro da amostra de treino usam os valores ajustados.
+    """
+    model_type = 'sarimax'
+
+    def build_features(self, model_db, modelo, datas):
+        indice = getattr(modelo.model, '_index', None)
+        if not isinstance(indice, pd.DatetimeIndex) or indice.freq is None:
+            raise ValueError("O modelo SARIMAX precisa ter sido treinado com um índice de datas com frequência definida.")
+
+        # Posição de cada data pedida em relação à última observação do treino (1 = primeiro passo à frente)
+        locais = horario_local(datas)
+        passo = pd.Timedelta(indice.freq)
+        posicoes = np.asarray((locais - indice[-1]) // passo)
+        if not ((locais - indice[-1]) % passo == pd.Timedelta(0)).all():
+            raise ValueError(f"As datas pedidas não estão alinhadas à frequência do modelo SARIMAX ({indice.freqstr}).")
+
+        exog = None
+        passos = int(posicoes.max()) if len(posicoes) else 0
+        colunas = colunas_exogenas(model_db, modelo.model.exog_names)
+        if passos > 0 and colunas:
+            # A previsão é recursiva: a matriz exógena cobre todos os passos, não só as datas pedidas
+            horizonte = indice[-1] + passo * np.arange(1, passos + 1)
+            exog = prepare_future_exog(colunas, model_db.exog_rules, horizonte + DESLOCAMENTO_LOCAL)
+        return {'locais': locais, 'posicoes': posicoes, 'passos': passos, 'exog': exog}
+
+    def predict_batch(self, model_db, modelo, datas, features):
+        posicoes = features['posicoes']
+        valores = np.full(len(posicoes), np.nan)
+
+        no_treino = posicoes <= 0
+        if no_treino.any():
+            ajustados = pd.Series(np.asarray(modelo.fittedvalues), index=modelo.model._index)
+            valores[no_treino] = ajustados.reindex(features['locais'][no_treino]).to_numpy()
+
+        if features['passos'] > 0:
+            previsto = np.asarray(modelo.get_forecast(steps=features['passos'], exog=features['exog']).predicted_mean)
+            fora = ~no_treino
+            valores[fora] = previsto[posicoes[fora] - 1]
+        return valores
+
+
+def prever(model_db, modelo, datas, cache_features=None, intervalos=False):
+    """
+    Roda o motor do modelo para as datas (naive, UTC) e devolve um DataFrame
+    (prediction_datetime, value) já pós-processado. `cache_features` é um dicionário
+    opcional compartilhado entre chamadas para reaproveitar as features.
+    Com intervalos=True (só motores que suportam) inclui as colunas lower/upper,
+    ao custo da amostragem de incerteza.
+    Os tempos de cada etapa ficam em df.attrs['tempos'] (segundos).
+    """
+    predictor = get_predictor(model_db.model_type)
+    datas = pd.DatetimeIndex(datas)
+
+    t0 = time.perf_counter()
+    chave = predictor.chave_features(model_db)
+    if cache_features is not None and chave is not None:
+        chave = (chave, datas[0] if len(datas) else None, datas[-1] if len(datas) else None, len(datas))
+        if chave not in cache_features:
+            cache_features[chave] = predictor.build_features(model_db, modelo, datas)
+        features = cache_features[chave]
+    else:
+        features = predictor.build_features(model_db, modelo, datas)
+    t1 = time.perf_counter()
+    colunas = {}
+    if intervalos:
+        brutos, colunas['lower'], colunas['upper'] = predictor.predict_intervals(model_db, modelo, datas, features)
+    else:
+        brutos = predictor.predict_batch(model_db, modelo, datas, features)
+    t2 = time.perf_counter()
+
+    colunas = {'value': brutos, **colunas}
+    colunas = {nome: pos_processar(v, inteiro=predictor.valores_inteiros) for nome, v in colunas.items()}
+    validos = ~np.isnan(colunas['value'])
+    if not validos.all():
+        datas = datas[validos]
+        colunas = {nome: v[validos] for nome, v in colunas.items()}
+    df_final = pd.DataFrame({'prediction_datetime': datas, **colunas})
+    if predictor.valores_inteiros:
+        df_final = df_final.astype({nome: int for nome in colunas})
+
+    df_final.attrs['tempos'] = {'features': t1 - t0, 'inferencia': t2 - t1, 'total': time.perf_counter() - t0}
+    registrar_etapa('features', t1 - t0)
+    registrar_etapa('inference', t2 - t1)
+    logger.debug(
+        "Modelo ID %s (%s): %s pontos | features %.1f ms | inferência %.1f ms",
+        model_db.id, model_db.model_type, len(df_final), (t1 - t0) * 1000, (t2 - t1) * 1000,
+    )
+    return df_final
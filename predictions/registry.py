@@ -0,0 +1,180 @@
+# Em predictions/registry.py
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+LOCKS_DE_CARGA = 16
+
+
+class ModelRegistry:
+    """
+    Registro em memória (por processo) dos modelos já carregados.
+
+    Diferente do cache do Django (LocMemCache faz pickle/unpickle a cada get),
+    aqui o objeto carregado é guardado por referência e reutilizado entre requisições.
+    Cada entrada guarda a assinatura (path, model_type, mtime do arquivo e do artefato); se qualquer
+    um mudar, a entrada é descartada e o modelo é recarregado.
+    """
+
+    def __init__(self, max_size=8):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        # Conjunto fixo de locks de carga (um por faixa de IDs): não cresce com os modelos vistos
+        self._load_locks = tuple(threading.Lock() for _ in range(LOCKS_DE_CARGA))
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.loads = 0
+        self.load_time_total = 0.0
+
+    @staticmethod
+    def _mtime(caminho):
+        try:
+            return os.stat(caminho).st_mtime_ns
+        except OSError:
+            return None
+
+    @classmethod
+    def _signature(cls, model_db):
+        from .artifacts import ARQUIVO_META, diretorio_artefato
+
+        full_path = os.path.join(settings.BASE_DIR, model_db.path)
+        # Um artefato de inferência novo (ou removido) também troca a assinatura
+        meta = os.path.join(diretorio_artefato(model_db.path), ARQUIVO_META)
+        return (model_db.path, model_db.model_type, cls._mtime(full_path), cls._mtime(meta))
+
+    def get(self, model_db):
+        """
+        Retorna o modelo executável do PredictionModel informado, carregando do disco
+        apenas quando não há entrada válida no registro.
+        """
+        from .utils import load_model_from_path
+
+        signature = self._signature(model_db)
+
+        with self._lock:
+            entry = self._entries.get(model_db.id)
+            if entry is not None:
+                if entry[0] == signature:
+                    self._entries.move_to_end(model_db.id)
+                    self.hits += 1
+                    metrics.metricas.inc('predictions_model_registry_requests_total', result='hit')
+                    return entry[1]
+                del self._entries[model_db.id]
+                self.invalidations += 1
+            self.misses += 1
+            metrics.metricas.inc('predictions_model_registry_requests_total', result='miss')
+            load_lock = self._load_locks[hash(model_db.id) % len(self._load_locks)]
+
+        # Só uma thread carrega cada modelo; as demais esperam e reaproveitam
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(model_db.id)
+                if entry is not None and entry[0] == signature:
+                    self._entries.move_to_end(model_db.id)
+                    return entry[1]
+
+            inicio = time.perf_counter()
+            modelo = load_model_from_path(model_db.path, model_db.model_type)
+            duracao = time.perf_counter() - inicio
+
+            with self._lock:
+                self.loads += 1
+                self.load_time_total += duracao
+                self._entries[model_db.id] = (signature, modelo, duracao)
+                self._entries.move_to_end(model_db.id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+        return modelo
+
+    def invalidate(self, model_id):
+        with self._lock:
+            if self._entries.pop(model_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, model_id):
+        return model_id in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "loads": self.loads,
+                "load_time_total": self.load_time_total,
+                "load_times": {model_id: entry[2] for model_id, entry in self._entries.items()},
+            }
+
+
+model_registry = ModelRegistry(max_size=getattr(settings, "PREDICTION_MODEL_REGISTRY_SIZE", 8))
+
+
+def _rss_bytes():
+    """Memória residente atual do processo (Linux); None se indisponível."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def prewarm_models(registry=None):
+    """
+    Carrega todos os PredictionModel cadastrados no registro antes da primeira requisição.
+    Registra no log o tempo de carga e o acréscimo de memória de cada modelo.
+    Retorna a lista de (model_id, segundos, bytes) dos modelos carregados.
+    """
+    from .models import PredictionModel
+
+    if registry is None:
+        registry = model_registry
+    carregados = []
+
+    for model_db in PredictionModel.objects.only('id', 'name', 'path', 'model_type').order_by('id'):
+        rss_antes = _rss_bytes()
+        inicio = time.perf_counter()
+        try:
+            registry.get(model_db)
+        except Exception as e:
+            logger.error("Pre-warm: falha ao carregar modelo ID %s (%s): %s", model_db.id, model_db.name, e)
+            continue
+        duracao = time.perf_counter() - inicio
+        rss_depois = _rss_bytes()
+        memoria = (rss_depois - rss_antes) if rss_antes is not None and rss_depois is not None else None
+
+        logger.info(
+            "Pre-warm: modelo ID %s (%s, %s) carregado em %.3fs, memória +%s",
+            model_db.id, model_db.name, model_db.model_type, duracao,
+            f"{memoria / 1024 / 1024:.1f} MiB" if memoria is not None else "n/d",
+        )
+        carregados.append((model_db.id, duracao, memoria))
+
+    return carregados
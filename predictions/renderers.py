@@ -0,0 +1,33 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class _ExportRenderer(BaseRenderer):
+    """
+    Renderers usados apenas na negociação de conteúdo (Accept ou ?format=) da exportação.
+    O corpo é produzido em streaming pela view (ver predictions/streaming.py).
+    """
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Só chega aqui em respostas de erro (dict com a mensagem)
+        if isinstance(data, (bytes, str)):
+            return data
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class CSVRenderer(_ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+
+class ArrowStreamRenderer(_ExportRenderer):
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+
+
+class ParquetRenderer(_ExportRenderer):
+    media_type = 'application/vnd.apache.parquet'
+    format = 'parquet'
@@ -0,0 +1,137 @@
+# Em predictions/rollups.py
+"""
+Agregados temporais das previsões (soma, média, máximo e contagem por dia, semana e mês
+locais), guardados em PredictionRollup. A cada gravação só os períodos que contêm as datas
+gravadas são recalculados, a partir das linhas da tabela principal; assim o agregado é sempre
+o das previsões presentes, mesmo quando um upsert sobrescreve valores.
+"""
+import numpy as np
+import pandas as pd
+from django.db import transaction
+
+from . import metrics
+from .features import DESLOCAMENTO_LOCAL, horario_local
+from .models import Prediction, PredictionModel, PredictionRollup
+
+RESOLUCOES = ('D', 'W', 'M')
+_PASSOS = {'D': pd.DateOffset(days=1), 'W': pd.DateOffset(weeks=1), 'M': pd.DateOffset(months=1)}
+
+
+def _naive_utc(datas):
+    datas = pd.DatetimeIndex(datas)
+    if datas.tz is not None:
+        datas = datas.tz_convert('UTC').tz_localize(None)
+    return datas
+
+
+def _aware(valor):
+    return pd.Timestamp(valor).tz_localize('UTC').to_pydatetime()
+
+
+def inicio_do_periodo(datas, resolucao):
+    """Início (naive, UTC) do dia, da semana (segunda-feira) ou do mês local de cada data."""
+    local = horario_local(_naive_utc(datas))
+    if resolucao == 'D':
+        inicio = local.normalize()
+    elif resolucao == 'W':
+        inicio = local.normalize() - pd.to_timedelta(local.dayofweek, unit='D')
+    elif resolucao == 'M':
+        inicio = local.to_period('M').to_timestamp()
+    else:
+        raise ValueError(f"Resolução '{resolucao}' não suportada (use {', '.join(RESOLUCOES)}).")
+    return pd.DatetimeIndex(inicio) + DESLOCAMENTO_LOCAL
+
+
+def _fim_do_periodo(inicio, resolucao):
+    return (inicio - DESLOCAMENTO_LOCAL) + _PASSOS[resolucao] + DESLOCAMENTO_LOCAL
+
+
+def _gravar(model_db, datas, valores, tocados):
+    """Regrava os agregados dos períodos tocados; períodos tocados que ficaram sem linhas são apagados."""
+    objetos = []
+    for resolucao, periodos in tocados.items():
+        agregados = (
+            pd.DataFrame({'periodo': inicio_do_periodo(datas, resolucao), 'value': valores})
+            .groupby('periodo')['value']
+            .agg(['sum', 'mean', 'max', 'count'])
+        )
+        agregados = agregados[agregados.index.isin(periodos)]
+        vazios = periodos.difference(agregados.index)
+        if len(vazios):
+            PredictionRollup.objects.filter(
+                model_id=model_db.id, resolution=resolucao, period_start__in=[_aware(p) for p in vazios]
+            ).delete()
+        objetos += [
+            PredictionRollup(
+                model_id=model_db.id, resolution=resolucao, period_start=_aware(periodo),
+                value_sum=soma, value_mean=media, value_max=maximo, count=quantidade,
+            )
+            for periodo, soma, media, maximo, quantidade in zip(
+                agregados.index,
+                agregados['sum'].tolist(),
+                agregados['mean'].tolist(),
+                agregados['max'].tolist(),
+                agregados['count'].tolist(),
+            )
+        ]
+
+    PredictionRollup.objects.bulk_create(
+        objetos,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['model', 'resolution', 'period_start'],
+        update_fields=['value_sum', 'value_mean', 'value_max', 'count', 'updated_at'],
+    )
+    return len(objetos)
+
+
+def _linhas(queryset):
+    linhas = list(queryset.values_list('prediction_datetime', 'value'))
+    if not linhas:
+        return pd.DatetimeIndex([]), np.array([], dtype=np.float64)
+    datas, valores = zip(*linhas)
+    return _naive_utc(datas), np.asarray(valores, dtype=np.float64)
+
+
+def atualizar_rollups(model_db, datas):
+    """
+    Recalcula os agregados (D/W/M) dos períodos que contêm as datas informadas, lendo
+    as previsões do modelo só no intervalo coberto por eles. Retorna os agregados gravados.
+    """
+    datas = _naive_utc(datas)
+    if datas.empty:
+        return 0
+
+    with metrics.etapa('rollup'):
+        tocados = {r: inicio_do_periodo(datas, r).unique() for r in RESOLUCOES}
+        de = min(periodos.min() for periodos in tocados.values())
+        ate = max(_fim_do_periodo(periodos.max(), r) for r, periodos in tocados.items())
+        datas_db, valores = _linhas(
+            Prediction.objects.filter(model_id=model_db.id, prediction_datetime__gte=_aware(de), prediction_datetime__lt=_aware(ate))
+        )
+        with transaction.atomic():
+            return _gravar(model_db, datas_db, valores, tocados)
+
+
+def podar_rollups(limite, model_ids=None):
+    """
+    Depois de apagar/arquivar as previsões anteriores a `limite` (datetime com fuso): remove os
+    agregados dos períodos que ficaram vazios e recalcula os que contêm o limite.
+    """
+    rollups = PredictionRollup.objects.filter(period_start__lt=limite)
+    if model_ids:
+        rollups = rollups.filter(model_id__in=model_ids)
+    afetados = set(rollups.values_list('model_id', flat=True).distinct())
+    rollups.delete()
+    for model_db in PredictionModel.objects.filter(id__in=afetados):
+        atualizar_rollups(model_db, [limite])
+
+
+def recalcular_modelo(model_db):
+    """Refaz todos os agregados do modelo a partir das previsões gravadas. Retorna os agregados gravados."""
+    datas, valores = _linhas(Prediction.objects.filter(model_id=model_db.id))
+    with transaction.atomic():
+        PredictionRollup.objects.filter(model_id=model_db.id).delete()
+        if datas.empty:
+            return 0
+        return _gravar(model_db, datas, valores, {r: inicio_do_periodo(datas, r).unique() for r in RESOLUCOES})
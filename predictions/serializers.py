@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Forecast, PredictionModel, Prediction
+from .models import Forecast, PredictionModel, Prediction, PredictionJob
 
 class PredictionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -15,7 +15,8 @@ class ForecastSerializer(serializers.ModelSerializer):
 class PredictionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Prediction
-        fields = '__all__'
+        # forecast é uma cópia de model.forecast só para indexação; fica fora da resposta
+        exclude = ['forecast']
 
 class PredictionModelSerializer(serializers.ModelSerializer):
   
@@ -30,4 +31,24 @@ class PredictionModelSerializer(serializers.ModelSerializer):
             'forecast', 
             'forecast_name', 
             'exog_columns'
-        ]
\ No newline at end of file
+        ]
+
+class PredictionJobSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = PredictionJob
+        fields = [
+            'id',
+            'model',
+            'start_datetime',
+            'end_datetime',
+            'status',
+            'progress',
+            'rows_written',
+            'error',
+            'created_at',
+            'started_at',
+            'heartbeat_at',
+            'attempts',
+            'finished_at'
+        ]
@@ -0,0 +1,45 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import http_cache
+from .models import Prediction, PredictionArchive, PredictionModel
+from .registry import model_registry
+
+
+@receiver(post_save, sender=PredictionModel)
+@receiver(post_delete, sender=PredictionModel)
+def invalidar_modelo_no_registro(sender, instance, **kwargs):
+    # Alterações feitas em outro worker são detectadas pela assinatura (path/model_type/mtime)
+    model_registry.invalidate(instance.id)
+    http_cache.invalidate_model_meta(instance.id)
+
+
+@receiver(post_delete, sender=PredictionModel)
+def invalidar_previsoes_do_modelo_apagado(sender, instance, **kwargs):
+    # As previsões saem em cascata: as respostas do Forecast em cache deixam de valer
+    http_cache.invalidate_predictions(instance)
+
+
+@receiver(pre_save, sender=PredictionModel)
+def guardar_forecast_anterior(sender, instance, **kwargs):
+    instance._forecast_anterior = None
+    if instance.pk is not None:
+        instance._forecast_anterior = (
+            PredictionModel.objects.filter(pk=instance.pk).values_list('forecast_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=PredictionModel)
+def sincronizar_forecast_das_previsoes(sender, instance, created, **kwargs):
+    # Prediction.forecast é uma cópia de model.forecast_id; acompanha a troca de Forecast do modelo
+    anterior = getattr(instance, '_forecast_anterior', None)
+    if created or anterior is None or anterior == instance.forecast_id:
+        return
+    Prediction.objects.filter(model=instance).exclude(forecast_id=instance.forecast_id).update(
+        forecast_id=instance.forecast_id
+    )
+    PredictionArchive.objects.filter(model=instance).exclude(forecast_id=instance.forecast_id).update(
+        forecast_id=instance.forecast_id
+    )
+    # update() não passa por salvar_previsoes: invalida o Forecast antigo e o novo
+    http_cache.invalidate_predictions(instance, forecast_ids=[anterior])
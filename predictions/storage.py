@@ -0,0 +1,123 @@
+# Em predictions/storage.py
+import logging
+import time
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from . import metrics
+from .models import Prediction
+
+logger = logging.getLogger(__name__)
+
+
+def _datas_para_banco(datas):
+    """
+    Converte as datas (naive, em UTC) para o formato que o backend espera,
+    sem criar um datetime Python por linha quando o banco é SQLite.
+    """
+    datas = pd.DatetimeIndex(datas)
+    if datas.tz is not None:
+        datas = datas.tz_convert('UTC').tz_localize(None)
+
+    if connection.vendor == 'sqlite':
+        # Mesmo texto que o Django grava (str(datetime)): sem fração quando microsecond == 0.
+        # O formato precisa bater exatamente para a chave única e os filtros por intervalo.
+        valores = datas.values
+        texto = np.char.replace(np.datetime_as_string(valores, unit='s'), 'T', ' ')
+        com_fracao = datas.microsecond != 0
+        if com_fracao.any():
+            texto_us = np.char.replace(np.datetime_as_string(valores, unit='us'), 'T', ' ')
+            texto = np.where(com_fracao, texto_us, texto)
+        return texto.tolist()
+
+    return list(datas.tz_localize('UTC').to_pydatetime())
+
+
+def upsert_predictions(model_db, datas, valores, batch_size=None):
+    """
+    Grava (ou atualiza) as previsões do modelo direto das colunas NumPy, em lotes,
+    usando a chave única (model, prediction_datetime): não é preciso apagar o intervalo antes.
+    Só grava: agregados (rollups) e cache HTTP ficam com quem chama (ver views.salvar_previsoes).
+    Linhas do intervalo que não estão em `datas` continuam no banco; quem regera um intervalo
+    com outra grade usa apagar_fora_da_grade.
+    Retorna a quantidade de linhas gravadas.
+    """
+    total = len(datas)
+    if total == 0:
+        return 0
+
+    batch_size = batch_size or settings.PREDICTION_WRITE_BATCH_SIZE
+    inicio = time.perf_counter()
+
+    datas_db = _datas_para_banco(datas)
+    valores = np.asarray(valores, dtype=np.float64).tolist()
+    criado_em = timezone.now()
+
+    if not connection.features.supports_update_conflicts_with_target:
+        # Backends sem ON CONFLICT (col, ...) seguem pelo ORM
+        Prediction.objects.bulk_create(
+            [
+                Prediction(model_id=model_db.id, forecast_id=model_db.forecast_id, prediction_datetime=d, value=v)
+                for d, v in zip(pd.DatetimeIndex(datas).to_pydatetime(), valores)
+            ],
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['model', 'prediction_datetime'],
+            update_fields=['value', 'created_at'],
+        )
+    else:
+        qn = connection.ops.quote_name
+        sql = (
+            f"INSERT INTO {qn(Prediction._meta.db_table)} "
+            f"({qn('model_id')}, {qn('forecast_id')}, {qn('prediction_datetime')}, {qn('value')}, {qn('created_at')}) "
+            f"VALUES (%s, %s, %s, %s, %s) "
+            f"ON CONFLICT ({qn('model_id')}, {qn('prediction_datetime')}) "
+            f"DO UPDATE SET {qn('value')} = EXCLUDED.{qn('value')}, {qn('created_at')} = EXCLUDED.{qn('created_at')}"
+        )
+        criado_em_db = connection.ops.adapt_datetimefield_value(criado_em)
+
+        with connection.cursor() as cursor:
+            for i in range(0, total, batch_size):
+                cursor.executemany(
+                    sql,
+                    zip(repeat(model_db.id), repeat(model_db.forecast_id), datas_db[i:i + batch_size], valores[i:i + batch_size], repeat(criado_em_db)),
+                )
+
+    duracao = time.perf_counter() - inicio
+    taxa = total / duracao if duracao > 0 else float('inf')
+    metrics.registrar_etapa('db_write', duracao)
+    metrics.metricas.inc('predictions_rows_written_total', total, model_type=model_db.model_type)
+    logger.debug(
+        "Modelo ID %s: %s previsões gravadas em %.3fs (%s linhas/s, lotes de %s).",
+        model_db.id, total, duracao, f"{taxa:,.0f}", batch_size,
+    )
+    return total
+
+
+def apagar_fora_da_grade(model_db, data_inicio, data_fim, datas):
+    """
+    Apaga as previsões do modelo em [data_inicio, data_fim] (naive, UTC) cujas datas não estão
+    em `datas`: sobras de uma grade anterior (ex.: depois de trocar a granularidade do modelo)
+    que o upsert não sobrescreve. Retorna a quantidade de linhas apagadas.
+    """
+    intervalo = pd.DatetimeIndex([data_inicio, data_fim]).tz_localize('UTC').to_pydatetime()
+    existentes = Prediction.objects.filter(model_id=model_db.id, prediction_datetime__range=tuple(intervalo))
+    atuais = pd.DatetimeIndex(list(existentes.values_list('prediction_datetime', flat=True)))
+    if atuais.empty:
+        return 0
+    if atuais.tz is not None:
+        atuais = atuais.tz_convert('UTC').tz_localize(None)
+
+    sobras = atuais.difference(pd.DatetimeIndex(datas))
+    apagadas = 0
+    for i in range(0, len(sobras), 500):
+        lote = sobras[i:i + 500].tz_localize('UTC').to_pydatetime()
+        apagadas += existentes.filter(prediction_datetime__in=list(lote)).delete()[0]
+    if apagadas:
+        logger.info("Modelo ID %s: %s previsões fora da grade apagadas.", model_db.id, apagadas)
+    return apagadas
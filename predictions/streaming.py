@@ -0,0 +1,171 @@
+# Em predictions/streaming.py
+import json
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+
+# Mesmos campos (e ordem) do PredictionSerializer
+CAMPOS_PREDICTION = ('id', 'prediction_datetime', 'value', 'created_at', 'model')
+_COLUNAS_DB = ('id', 'prediction_datetime', 'value', 'created_at', 'model_id')
+
+LINHAS_POR_CHUNK = 2000
+
+
+def _iso(valor):
+    # Mesmo formato do DateTimeField do DRF (UTC com sufixo Z)
+    texto = valor.isoformat()
+    if texto.endswith('+00:00'):
+        texto = texto[:-6] + 'Z'
+    return texto
+
+
+def _linhas(queryset):
+    for id_, data, valor, criado, model_id in queryset.values_list(*_COLUNAS_DB).iterator(chunk_size=LINHAS_POR_CHUNK):
+        yield json.dumps(
+            {'id': id_, 'prediction_datetime': _iso(data), 'value': valor, 'created_at': _iso(criado), 'model': model_id},
+            separators=(',', ':'),
+        )
+
+
+def _agrupar(linhas, prefixo, separador, sufixo):
+    # Agrupa as linhas em blocos para não emitir um chunk HTTP por registro
+    yield prefixo
+    bloco = []
+    primeiro = True
+    for linha in linhas:
+        bloco.append(linha)
+        if len(bloco) >= LINHAS_POR_CHUNK:
+            yield ('' if primeiro else separador) + separador.join(bloco)
+            primeiro = False
+            bloco = []
+    if bloco:
+        yield ('' if primeiro else separador) + separador.join(bloco)
+    yield sufixo
+
+
+def stream_predictions(queryset, formato):
+    """
+    Resposta em streaming das previsões do queryset, linha a linha do cursor do banco,
+    sem montar a lista completa em memória. formato: 'json' (array) ou 'ndjson'.
+    """
+    if formato == 'ndjson':
+        conteudo = _agrupar((linha + '\n' for linha in _linhas(queryset)), '', '', '')
+        content_type = 'application/x-ndjson'
+    elif formato == 'json':
+        conteudo = _agrupar(_linhas(queryset), '[', ',', ']')
+        content_type = 'application/json'
+    else:
+        raise ValueError(f"Formato de streaming '{formato}' não suportado (use 'json' ou 'ndjson').")
+
+    return StreamingHttpResponse(conteudo, content_type=content_type)
+
+
+# --- Exportação colunar (CSV, Arrow IPC, Parquet) ---
+
+LINHAS_POR_LOTE_EXPORT = 65536
+_COLUNAS_EXPORT = ('model_id', 'prediction_datetime', 'value')
+
+
+def _lotes(queryset, tamanho=LINHAS_POR_LOTE_EXPORT):
+    """Lê (model_id, prediction_datetime, value) do banco em lotes de colunas."""
+    iterador = queryset.values_list(*_COLUNAS_EXPORT).iterator(chunk_size=LINHAS_POR_CHUNK)
+    while True:
+        linhas = list(islice(iterador, tamanho))
+        if not linhas:
+            return
+        yield tuple(list(coluna) for coluna in zip(*linhas))
+
+
+def _csv(queryset):
+    yield 'model_id,prediction_datetime,value\n'
+    for model_ids, datas, valores in _lotes(queryset, LINHAS_POR_CHUNK):
+        yield ''.join(f'{m},{_iso(d)},{v!r}\n' for m, d, v in zip(model_ids, datas, valores))
+
+
+class _BufferSink:
+    """Arquivo em memória que o pyarrow escreve e o gerador esvazia a cada lote."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._posicao = 0
+        self.closed = False
+
+    def write(self, dados):
+        dados = memoryview(dados)
+        self._buffer += dados
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def esvaziar(self):
+        dados = bytes(self._buffer)
+        self._buffer.clear()
+        return dados
+
+
+def _schema_arrow(pa):
+    return pa.schema([
+        ('model_id', pa.int64()),
+        ('prediction_datetime', pa.timestamp('us', tz='UTC')),
+        ('value', pa.float64()),
+    ])
+
+
+def _arrow(queryset, formato):
+    import pyarrow as pa
+
+    schema = _schema_arrow(pa)
+    sink = _BufferSink()
+    if formato == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    try:
+        for model_ids, datas, valores in _lotes(queryset):
+            # Cada lote vira um record batch (ou row group no Parquet) e é enviado em seguida
+            writer.write_batch(pa.record_batch([
+                pa.array(model_ids, type=pa.int64()),
+                pa.array(datas, type=schema.field('prediction_datetime').type),
+                pa.array(valores, type=pa.float64()),
+            ], schema=schema))
+            yield sink.esvaziar()
+    finally:
+        writer.close()
+    yield sink.esvaziar()
+
+
+def pyarrow_disponivel():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_predictions(queryset, formato, nome_arquivo):
+    """
+    Exportação em streaming (model_id, prediction_datetime, value) nos formatos 'csv', 'arrow' ou 'parquet'.
+    Arrow e Parquet exigem o pacote pyarrow.
+    """
+    if formato == 'csv':
+        conteudo, content_type = _csv(queryset), 'text/csv; charset=utf-8'
+    elif formato == 'arrow':
+        conteudo, content_type = _arrow(queryset, formato), 'application/vnd.apache.arrow.stream'
+    elif formato == 'parquet':
+        conteudo, content_type = _arrow(queryset, formato), 'application/vnd.apache.parquet'
+    else:
+        raise ValueError(f"Formato de exportação '{formato}' não suportado.")
+
+    resposta = StreamingHttpResponse(conteudo, content_type=content_type)
+    resposta['Content-Disposition'] = f'attachment; filename="{nome_arquivo}.{formato}"'
+    return resposta
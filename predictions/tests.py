@@ -1,2 +1,1718 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import closing
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
 
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from predictions import artifacts, encoders, inference, jobs, locks, materialization, metrics, predictors, registry, storage, views
+from predictions.features import FEATURES_XGBOOST, matriz_features_xgboost, prepare_future_exog
+from predictions.models import Forecast, Prediction, PredictionArchive, PredictionJob, PredictionModel, PredictionRollup
+from predictions.registry import ModelRegistry, prewarm_models
+from predictions.utils import criar_features_xgboost, load_model_from_path
+from predictions.views import salvar_previsoes
+
+# Cache em memória por processo de teste, em vez do FileBasedCache compartilhado pelos workers
+CACHES_DE_TESTE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'testes-default'},
+    'predictions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'testes-predictions'},
+}
+
+
+def dias(inicio, quantidade):
+    """Grade diária (naive, UTC) a partir de `inicio`, como a dos modelos diários."""
+    return pd.date_range(pd.Timestamp(inicio), periods=quantidade, freq='D')
+
+
+def previsoes(datas, valores=None):
+    """DataFrame (prediction_datetime, value) como o devolvido por run_prediction."""
+    datas = pd.DatetimeIndex(datas)
+    valores = range(1, len(datas) + 1) if valores is None else valores
+    return pd.DataFrame({'prediction_datetime': datas, 'value': [float(v) for v in valores]})
+
+
+class ModeloFixo:
+    """Modelo com a interface do XGBoost que prevê sempre o mesmo valor."""
+
+    def __init__(self, valor=10, erro=None):
+        self.valor = valor
+        self.erro = erro
+
+    def predict(self, features):
+        if self.erro is not None:
+            raise self.erro
+        return np.full(len(features), self.valor, dtype=np.float64)
+
+
+@override_settings(CACHES=CACHES_DE_TESTE)
+class PrevisoesTestCase(TestCase):
+    """
+    Base dos testes: um Forecast com um modelo diário. O arquivo do modelo não existe;
+    os testes gravam as previsões diretamente ou simulam a inferência.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.forecast = Forecast.objects.create(name="Restaurante")
+        cls.model_db = PredictionModel.objects.create(
+            forecast=cls.forecast, model_type='xgboost', name="XGB diário", path='predictions/model/teste.pkl', granularity='D'
+        )
+
+    def setUp(self):
+        caches['predictions'].clear()
+
+    def valores(self, model_db=None):
+        return list(
+            Prediction.objects.filter(model=model_db or self.model_db).order_by('prediction_datetime').values_list('value', flat=True)
+        )
+
+
+class RegistroDeModelosTests(SimpleTestCase):
+    """ModelRegistry com a carga do disco simulada: conta as cargas e devolve um objeto novo a cada uma."""
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio, ignore_errors=True)
+        ajuste = override_settings(BASE_DIR=self.diretorio)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+        self.cargas = []
+        carga = mock.patch('predictions.utils.load_model_from_path', side_effect=self.carregar)
+        carga.start()
+        self.addCleanup(carga.stop)
+
+    def carregar(self, path, model_type):
+        self.cargas.append(path)
+        return object()
+
+    def modelo(self, model_id):
+        path = f'modelo_{model_id}.pkl'
+        with open(os.path.join(self.diretorio, path), 'wb') as f:
+            f.write(b'modelo')
+        return PredictionModel(id=model_id, model_type='xgboost', name=f"Modelo {model_id}", path=path, granularity='D')
+
+    def test_reaproveita_o_modelo_carregado(self):
+        registro = ModelRegistry(max_size=2)
+        modelo = self.modelo(1)
+
+        self.assertIs(registro.get(modelo), registro.get(modelo))
+        self.assertEqual(len(self.cargas), 1)
+        self.assertEqual((registro.hits, registro.misses), (1, 1))
+
+    def test_descarta_o_menos_usado_quando_cheio(self):
+        registro = ModelRegistry(max_size=2)
+        a, b, c = self.modelo(1), self.modelo(2), self.modelo(3)
+
+        registro.get(a)
+        registro.get(b)
+        registro.get(a)  # b passa a ser o menos usado
+        registro.get(c)
+
+        self.assertIn(a.id, registro)
+        self.assertNotIn(b.id, registro)
+        self.assertIn(c.id, registro)
+        self.assertEqual(registro.evictions, 1)
+
+    def test_recarrega_quando_o_arquivo_muda(self):
+        registro = ModelRegistry()
+        modelo = self.modelo(1)
+        antes = registro.get(modelo)
+
+        caminho = os.path.join(self.diretorio, modelo.path)
+        mtime = os.stat(caminho).st_mtime_ns + 1_000_000_000
+        os.utime(caminho, ns=(mtime, mtime))
+
+        self.assertIsNot(registro.get(modelo), antes)
+        self.assertEqual((len(self.cargas), registro.invalidations), (2, 1))
+
+    def test_carga_unica_com_requisicoes_simultaneas(self):
+        registro = ModelRegistry()
+        modelo = self.modelo(1)
+
+        def carregar_devagar(path, model_type):
+            time.sleep(0.1)
+            return self.carregar(path, model_type)
+
+        resultados = []
+        with mock.patch('predictions.utils.load_model_from_path', side_effect=carregar_devagar):
+            threads = [threading.Thread(target=lambda: resultados.append(registro.get(modelo))) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(self.cargas), 1)
+        self.assertEqual(len({id(resultado) for resultado in resultados}), 1)
+        self.assertEqual(len(resultados), 8)
+
+    def test_locks_de_carga_nao_crescem_com_os_modelos(self):
+        registro = ModelRegistry(max_size=2)
+        for model_id in range(1, 41):
+            registro.get(self.modelo(model_id))
+
+        self.assertEqual(len(registro._load_locks), registry.LOCKS_DE_CARGA)
+        self.assertEqual(len(self.cargas), 40)
+
+
+class PrewarmTests(TestCase):
+    def test_carrega_todos_os_modelos_e_ignora_os_que_falham(self):
+        forecast = Forecast.objects.create(name="Restaurante")
+        bom = PredictionModel.objects.create(forecast=forecast, model_type='xgboost', name="Bom", path='bom.pkl')
+        PredictionModel.objects.create(forecast=forecast, model_type='xgboost', name="Quebrado", path='quebrado.pkl')
+
+        def carregar(path, model_type):
+            if path == 'quebrado.pkl':
+                raise OSError("arquivo ausente")
+            return object()
+
+        registro = ModelRegistry()
+        with mock.patch('predictions.utils.load_model_from_path', side_effect=carregar):
+            carregados = prewarm_models(registro)
+
+        self.assertEqual([model_id for model_id, _, _ in carregados], [bom.id])
+        self.assertIn(bom.id, registro)
+        self.assertEqual(len(registro), 1)
+
+
+def criar_features_xgboost_original(df_input):
+    """Implementação anterior à tabela de calendário, mantida como referência do treinamento."""
+    df = df_input.copy()
+    df['ds'] = pd.to_datetime(df['ds'])
+    dia_semana = df['ds'].dt.dayofweek
+    df['dia_mes'] = df['ds'].dt.day
+    df['mes'] = df['ds'].dt.month
+    df['ano'] = df['ds'].dt.year
+    df['mes_sin'] = np.sin(2 * np.pi * df['mes'] / 12)
+    df['mes_cos'] = np.cos(2 * np.pi * df['mes'] / 12)
+    for numero, nome in enumerate(['is_segunda', 'is_terca', 'is_quarta', 'is_quinta', 'is_sexta', 'is_sabado', 'is_domingo']):
+        df[nome] = (dia_semana == numero).astype(int)
+    feriados = [
+        '2024-01-01', '2024-02-12', '2024-02-13', '2024-03-29', '2024-04-21',
+        '2024-05-01', '2024-05-30', '2024-09-07', '2024-10-12', '2024-11-02',
+        '2024-11-15', '2024-11-20', '2024-12-25',
+        '2025-01-01', '2025-03-03', '2025-03-04', '2025-04-18', '2025-04-21',
+        '2025-05-01', '2025-06-19', '2025-09-07', '2025-10-12', '2025-11-02',
+        '2025-11-15', '2025-11-20', '2025-12-25'
+    ]
+    df['eh_feriado'] = df['ds'].dt.normalize().isin(pd.to_datetime(feriados)).astype(int)
+    return df
+
+
+class FeaturesXGBoostTests(SimpleTestCase):
+    # Grade dos modelos diários: 00:00 local (03:00 UTC), nos anos cobertos pela lista antiga
+    datas = pd.date_range('2024-01-01 03:00', '2025-12-31 03:00', freq='D')
+
+    def test_matriz_igual_a_implementacao_original(self):
+        esperado = criar_features_xgboost_original(pd.DataFrame({'ds': self.datas}))[FEATURES_XGBOOST]
+        np.testing.assert_array_equal(matriz_features_xgboost(self.datas), esperado.to_numpy(dtype=np.float64))
+
+    def test_criar_features_xgboost_mantem_colunas_e_valores(self):
+        df = pd.DataFrame({'ds': self.datas})
+        pd.testing.assert_frame_equal(
+            criar_features_xgboost(df)[FEATURES_XGBOOST],
+            criar_features_xgboost_original(df)[FEATURES_XGBOOST],
+            check_dtype=False,
+        )
+
+    def test_colunas_na_ordem_do_modelo_treinado(self):
+        import joblib
+
+        modelo = joblib.load(os.path.join(settings.BASE_DIR, 'predictions/model/modelo_restaurante_v3_flags.pkl'))
+        self.assertEqual(modelo.get_booster().feature_names, FEATURES_XGBOOST)
+
+    def test_feriados_depois_de_2025(self):
+        datas = pd.DatetimeIndex(['2026-02-16 03:00', '2026-02-17 03:00', '2026-02-18 03:00', '2026-04-21 03:00'])
+        eh_feriado = matriz_features_xgboost(datas)[:, FEATURES_XGBOOST.index('eh_feriado')]
+        # Carnaval (segunda e terça), Quarta-feira de Cinzas e Tiradentes
+        self.assertEqual(eh_feriado.tolist(), [1, 1, 0, 1])
+
+
+class LotePrevisoesTests(PrevisoesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.outro = PredictionModel.objects.create(
+            forecast=self.forecast, model_type='xgboost', name="XGB reserva", path='predictions/model/outro.pkl', granularity='D'
+        )
+        self.client.force_login(User.objects.create_user('operador'))
+        self.modelos = {self.model_db.id: ModeloFixo(10), self.outro.id: ModeloFixo(20)}
+        carga = mock.patch('predictions.views.get_model_by_id', side_effect=lambda model_id, model_db=None: self.modelos[model_id])
+        carga.start()
+        self.addCleanup(carga.stop)
+
+    def gerar(self, **dados):
+        dados = {'data_inicio': '2030-01-01T03:00:00Z', 'data_fim': '2030-01-05T03:00:00Z', **dados}
+        return self.client.post('/api/predict/batch/', dados, content_type='application/json')
+
+    def test_gera_todos_os_modelos_do_forecast(self):
+        resposta = self.gerar(forecast_id=self.forecast.id)
+
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(resposta.json()['registros_gerados'], 10)
+        self.assertEqual(self.valores(), [10] * 5)
+        self.assertEqual(self.valores(self.outro), [20] * 5)
+
+    def test_falha_de_um_modelo_nao_impede_os_demais(self):
+        self.modelos[self.outro.id] = ModeloFixo(erro=RuntimeError("arquivo corrompido"))
+        resposta = self.gerar(model_ids=[self.model_db.id, self.outro.id])
+
+        self.assertEqual(resposta.status_code, 201)
+        por_modelo = {r['model_id']: r for r in resposta.json()['modelos']}
+        self.assertEqual(por_modelo[self.model_db.id]['registros_gerados'], 5)
+        self.assertIn("arquivo corrompido", por_modelo[self.outro.id]['erro'])
+        self.assertEqual(self.valores(self.outro), [])
+
+    def test_exige_modelos_e_intervalo(self):
+        self.assertEqual(self.gerar().status_code, 400)
+        self.assertEqual(self.gerar(model_ids=self.model_db.id).status_code, 400)
+        self.assertEqual(self.gerar(model_ids=['abc']).status_code, 400)
+
+    def test_ids_inexistentes_aparecem_na_resposta(self):
+        resposta = self.gerar(model_ids=[self.model_db.id, 999])
+
+        self.assertEqual(resposta.status_code, 201)
+        por_modelo = {r['model_id']: r for r in resposta.json()['modelos']}
+        self.assertEqual(por_modelo[999], {'model_id': 999, 'erro': "Modelo não encontrado."})
+        self.assertEqual(por_modelo[self.model_db.id]['registros_gerados'], 5)
+
+        resposta = self.gerar(model_ids=[998, 999])
+        self.assertEqual(resposta.status_code, 404)
+        self.assertEqual([r['model_id'] for r in resposta.json()['modelos']], [998, 999])
+
+
+class UpsertTests(PrevisoesTestCase):
+    def test_regravar_as_mesmas_datas_atualiza_sem_duplicar(self):
+        datas = dias('2030-01-01 03:00', 5)
+        self.assertEqual(storage.upsert_predictions(self.model_db, datas, [1, 2, 3, 4, 5]), 5)
+        self.assertEqual(storage.upsert_predictions(self.model_db, datas, [10, 20, 30, 40, 50]), 5)
+
+        self.assertEqual(self.valores(), [10, 20, 30, 40, 50])
+
+    def test_upsert_parcial_mantem_as_demais_datas(self):
+        datas = dias('2030-01-01 03:00', 5)
+        storage.upsert_predictions(self.model_db, datas, [1, 2, 3, 4, 5])
+        storage.upsert_predictions(self.model_db, datas[1:3], [20, 30])
+
+        self.assertEqual(self.valores(), [1, 20, 30, 4, 5])
+
+    def test_regeracao_com_grade_apaga_datas_fora_dela(self):
+        # Sobras de uma grade anterior (ex.: o modelo era horário)
+        storage.upsert_predictions(self.model_db, pd.DatetimeIndex(['2030-01-01 05:00', '2030-01-02 07:00']), [7, 7])
+        grade = dias('2030-01-01 03:00', 3)
+
+        salvar_previsoes(self.model_db, previsoes(grade), grade=grade)
+
+        datas = pd.DatetimeIndex(Prediction.objects.order_by('prediction_datetime').values_list('prediction_datetime', flat=True))
+        self.assertTrue(datas.tz_convert('UTC').tz_localize(None).equals(grade))
+        self.assertEqual(self.valores(), [1, 2, 3])
+
+    def test_datas_gravadas_no_formato_do_orm(self):
+        # A chave única e os filtros do ORM só funcionam se o texto gravado for o mesmo do Django
+        datas = pd.DatetimeIndex(['2030-01-01 03:00', '2030-01-01 03:30:15.250000'])
+        storage.upsert_predictions(self.model_db, datas, [1, 2])
+
+        for data, valor in zip(datas, [1, 2]):
+            gravada = Prediction.objects.get(model=self.model_db, prediction_datetime=data.tz_localize('UTC').to_pydatetime())
+            self.assertEqual(gravada.value, valor)
+
+    def test_salvar_previsoes_grava_o_dataframe(self):
+        self.assertEqual(salvar_previsoes(self.model_db, previsoes(dias('2030-01-01 03:00', 3))), 3)
+        self.assertEqual(salvar_previsoes(self.model_db, previsoes([])), 0)
+        self.assertEqual(self.valores(), [1, 2, 3])
+
+    def test_regravar_mantem_os_agregados_consistentes(self):
+        grade = dias('2030-01-01 03:00', 3)
+        salvar_previsoes(self.model_db, previsoes(grade, [1, 2, 3]))
+        salvar_previsoes(self.model_db, previsoes(grade, [10, 20, 30]))
+
+        diarios = PredictionRollup.objects.filter(model=self.model_db, resolution='D').order_by('period_start')
+        self.assertEqual([(r.value_sum, r.count) for r in diarios], [(10, 1), (20, 1), (30, 1)])
+        mensal = PredictionRollup.objects.get(model=self.model_db, resolution='M')
+        self.assertEqual((mensal.value_sum, mensal.count), (60, 3))
+
+
+@mock.patch('predictions.views.get_model_by_id', return_value=ModeloFixo(valor=7))
+class LacunasTests(PrevisoesTestCase):
+    def test_faltantes_sao_a_diferenca_entre_grade_e_banco(self, _carregar):
+        datas = dias('2030-01-01 03:00', 10)
+        storage.upsert_predictions(self.model_db, datas.delete([3, 4, 8]), range(7))
+
+        grade, faltantes = views.find_missing_datetimes(self.model_db, datas[0], datas[-1])
+
+        self.assertEqual(len(grade), 10)
+        self.assertEqual(list(faltantes), [datas[3], datas[4], datas[8]])
+
+    def test_intervalo_completo_nao_tem_faltantes(self, _carregar):
+        datas = dias('2030-01-01 03:00', 10)
+        storage.upsert_predictions(self.model_db, datas, range(10))
+
+        _, faltantes = views.find_missing_datetimes(self.model_db, datas[0], datas[-1])
+
+        self.assertTrue(faltantes.empty)
+
+    def test_datas_arquivadas_nao_sao_lacunas(self, _carregar):
+        datas = dias('2030-01-01 03:00', 10)
+        storage.upsert_predictions(self.model_db, datas.delete([3, 4, 8]), range(7))
+        PredictionArchive.objects.bulk_create([
+            PredictionArchive(
+                model=self.model_db, forecast=self.forecast, value=0,
+                prediction_datetime=data.tz_localize('UTC').to_pydatetime(), created_at=data.tz_localize('UTC').to_pydatetime(),
+            )
+            for data in datas[[3, 4]]
+        ])
+
+        _, faltantes = views.find_missing_datetimes(self.model_db, datas[0], datas[-1])
+
+        self.assertEqual(list(faltantes), [datas[8]])
+
+    def test_datas_anteriores_a_retencao_nao_sao_lacunas(self, _carregar):
+        datas = dias('2030-01-01 03:00', 10)
+        self.model_db.retention_days = 30
+        with mock.patch('django.utils.timezone.now', return_value=pd.Timestamp('2030-02-08 03:00', tz='UTC').to_pydatetime()):
+            _, faltantes = views.find_missing_datetimes(self.model_db, datas[0], datas[-1])
+
+        # Limite de retenção em 09/01 03:00: só as lacunas a partir dele contam
+        self.assertEqual(list(faltantes), [datas[8], datas[9]])
+
+    def test_grade_horaria_alinhada_a_hora_cheia(self, _carregar):
+        prophet = PredictionModel(forecast=self.forecast, model_type='prophet', granularity='H')
+        grade = views.grade_esperada(prophet, pd.Timestamp('2030-01-01 03:20'), pd.Timestamp('2030-01-01 06:40'))
+
+        self.assertEqual(list(grade.hour), [4, 5, 6])
+
+    def test_gera_somente_as_datas_faltantes(self, _carregar):
+        datas = dias('2030-01-01 03:00', 10)
+        storage.upsert_predictions(self.model_db, datas.delete([3, 4, 8]), range(1, 8))
+
+        with mock.patch('predictions.views.run_prediction', wraps=views.run_prediction) as rodar:
+            criados = views.process_missing_predictions(self.model_db, datas[0], datas[-1])
+
+        self.assertEqual(criados, 3)
+        self.assertEqual(rodar.call_count, 1)
+        self.assertEqual(list(rodar.call_args.kwargs['future_dates']), [datas[3], datas[4], datas[8]])
+        self.assertEqual(self.valores(), [1, 2, 3, 7, 7, 4, 5, 6, 7, 7])
+
+    def test_intervalo_completo_nao_carrega_o_modelo(self, carregar):
+        datas = dias('2030-01-01 03:00', 5)
+        storage.upsert_predictions(self.model_db, datas, range(5))
+
+        self.assertEqual(views.process_missing_predictions(self.model_db, datas[0], datas[-1]), 0)
+        carregar.assert_not_called()
+
+    def test_get_preenche_o_intervalo_pedido(self, _carregar):
+        resposta = self.client.get(
+            f'/api/forecasts/{self.forecast.id}/predictions',
+            {'model_id': self.model_db.id, 'start_date': '2030-01-01T00:00:00Z', 'end_date': '2030-01-05T00:00:00Z'},
+        )
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(resposta.json()), 5)
+        self.assertEqual(self.valores(), [7] * 5)
+
+
+class SingleFlightTests(SimpleTestCase):
+    # A geração abre transaction.atomic() nas threads, ainda que sem consultas
+    databases = {'default'}
+
+    def setUp(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        configuracao = override_settings(PREDICTION_LOCK_DIR=pasta)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def em_thread(self, alvo):
+        resultado = {}
+
+        def rodar():
+            try:
+                resultado['valor'] = alvo()
+            except Exception as e:
+                resultado['erro'] = e
+
+        t = threading.Thread(target=rodar)
+        t.start()
+        t.join(timeout=10)
+        return resultado
+
+    def test_misses_concorrentes_geram_uma_vez(self):
+        model_db = PredictionModel(id=1, model_type='xgboost', granularity='D')
+        grade = dias('2030-01-01 03:00', 5)
+        gravadas = set()
+        # As duas requisições só seguem depois de ambas terem visto o intervalo vazio
+        largada = threading.Barrier(2, timeout=5)
+        primeiras_leituras = []
+
+        def faltantes(_model_db, _inicio, _fim):
+            if len(primeiras_leituras) < 2:
+                primeiras_leituras.append(threading.get_ident())
+                largada.wait()
+            return grade, grade.difference(pd.DatetimeIndex(sorted(gravadas)))
+
+        def salvar(_model_db, df):
+            time.sleep(0.2)
+            gravadas.update(df['prediction_datetime'])
+            return len(df)
+
+        def gerar(_model_db, _modelo, _inicio, _fim, future_dates=None, **_kwargs):
+            return previsoes(future_dates)
+
+        resultados = []
+        with mock.patch('predictions.views.find_missing_datetimes', side_effect=faltantes), \
+                mock.patch('predictions.views.salvar_previsoes', side_effect=salvar), \
+                mock.patch('predictions.views.get_model_by_id', return_value=ModeloFixo()), \
+                mock.patch('predictions.views.run_prediction', side_effect=gerar) as rodar:
+            threads = [
+                threading.Thread(target=lambda: resultados.append(views.process_missing_predictions(model_db, grade[0], grade[-1])))
+                for _ in range(2)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join(timeout=10)
+
+        self.assertEqual(rodar.call_count, 1)
+        self.assertEqual(sorted(resultados), [0, 5])
+
+    def test_chaves_diferentes_nao_se_bloqueiam(self):
+        with locks.single_flight('a'):
+            def entrar():
+                with locks.single_flight('b', timeout=1) as esperou:
+                    return esperou
+
+            self.assertEqual(self.em_thread(entrar), {'valor': False})
+
+    def test_espera_limitada_pelo_timeout(self):
+        with locks.single_flight('a'):
+            def entrar():
+                with locks.single_flight('a', timeout=0.1):
+                    return True
+
+            self.assertIsInstance(self.em_thread(entrar).get('erro'), TimeoutError)
+
+    def test_numero_de_arquivos_de_lock_e_fixo(self):
+        for i in range(2 * locks.SLOTS):
+            with locks.single_flight(f'prediction:{i}'):
+                pass
+
+        self.assertLessEqual(len(os.listdir(settings.PREDICTION_LOCK_DIR)), locks.SLOTS)
+
+    def test_chave_aninhada_no_mesmo_slot_nao_trava(self):
+        colidente = next(f'k{i}' for i in range(10 * locks.SLOTS) if locks._slot(f'k{i}') == locks._slot('a'))
+
+        with locks.single_flight('a'):
+            with locks.single_flight(colidente, timeout=0.1) as esperou:
+                self.assertFalse(esperou)
+
+            # O slot continua detido pelo lock externo
+            def entrar():
+                with locks.single_flight(colidente, timeout=0.1):
+                    return True
+
+            self.assertIsInstance(self.em_thread(entrar).get('erro'), TimeoutError)
+
+
+@mock.patch('predictions.views.get_model_by_id', return_value=ModeloFixo())
+class JobsTests(PrevisoesTestCase):
+    def criar_job(self, dias_no_intervalo=10):
+        grade = dias('2030-01-01 03:00', dias_no_intervalo)
+        return PredictionJob.objects.create(
+            model=self.model_db,
+            start_datetime=grade[0].tz_localize('UTC').to_pydatetime(),
+            end_datetime=grade[-1].tz_localize('UTC').to_pydatetime(),
+        )
+
+    def expirar_lease(self, job):
+        PredictionJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - pd.Timedelta(minutes=10))
+
+    def test_post_enfileira_e_get_mostra_o_job(self, carregar):
+        dados = {'model_id': self.model_db.id, 'data_inicio': '2030-01-01T03:00:00Z', 'data_fim': '2030-01-10T03:00:00Z'}
+        self.assertEqual(self.client.post('/api/jobs/', dados, content_type='application/json').status_code, 403)
+
+        self.client.force_login(User.objects.create_user('operador'))
+        resposta = self.client.post('/api/jobs/', dados, content_type='application/json')
+
+        self.assertEqual(resposta.status_code, 202)
+        self.assertEqual(resposta.json()['status'], 'pending')
+        detalhe = self.client.get(f"/api/jobs/{resposta.json()['id']}").json()
+        self.assertEqual((detalhe['status'], detalhe['progress'], detalhe['attempts']), ('pending', 0, 0))
+        carregar.assert_not_called()
+
+        self.client.logout()
+        self.assertEqual(self.client.get(f"/api/jobs/{resposta.json()['id']}").status_code, 403)
+
+    def test_post_sem_campos_ou_modelo_inexistente(self, _carregar):
+        self.client.force_login(User.objects.create_user('operador'))
+        sem_fim = {'model_id': self.model_db.id, 'data_inicio': '2030-01-01T03:00:00Z'}
+        inexistente = {'model_id': 999, 'data_inicio': '2030-01-01T03:00:00Z', 'data_fim': '2030-01-10T03:00:00Z'}
+
+        self.assertEqual(self.client.post('/api/jobs/', sem_fim, content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.post('/api/jobs/', inexistente, content_type='application/json').status_code, 404)
+        self.assertFalse(PredictionJob.objects.exists())
+
+    def test_job_reservado_e_executado_em_lotes(self, carregar):
+        job = self.criar_job()
+
+        self.assertEqual(jobs.claim_next_job(), job.id)
+        self.assertIsNone(jobs.claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('running', 1))
+        self.assertIsNotNone(job.heartbeat_at)
+
+        with mock.patch('predictions.views.run_prediction', wraps=views.run_prediction) as rodar:
+            self.assertEqual(jobs.run_prediction_job(job.id, pontos_por_lote=4), 10)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress, job.rows_written), ('done', 1, 10))
+        self.assertEqual([len(c.kwargs['future_dates']) for c in rodar.call_args_list], [4, 4, 2])
+        self.assertEqual(self.valores(), [10] * 10)
+
+    def test_erro_na_geracao_marca_o_job_como_falho(self, carregar):
+        carregar.return_value = ModeloFixo(erro=RuntimeError("modelo corrompido"))
+        job = self.criar_job()
+        jobs.claim_next_job()
+
+        with self.assertRaises(RuntimeError), self.assertLogs('predictions.jobs', 'ERROR') as logs:
+            jobs.run_prediction_job(job.id)
+
+        job.refresh_from_db()
+        # Só a mensagem fica no job; o traceback vai para o log
+        self.assertEqual((job.status, job.error), ('failed', "modelo corrompido"))
+        self.assertIn('Traceback', logs.output[0])
+
+    def test_heartbeat_mantem_o_lease(self, _carregar):
+        job = self.criar_job()
+        jobs.claim_next_job()
+        self.expirar_lease(job)
+
+        self.assertEqual(jobs.heartbeat([job.id]), 1)
+        self.assertEqual(jobs.requeue_expired_jobs(lease_seconds=60), (0, 0))
+
+    def test_lease_expirado_volta_para_a_fila_ate_o_limite_de_tentativas(self, carregar):
+        job = self.criar_job()
+        jobs.claim_next_job()
+        self.expirar_lease(job)
+
+        self.assertEqual(jobs.requeue_expired_jobs(lease_seconds=60, max_attempts=2), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+
+        self.assertEqual(jobs.claim_next_job(), job.id)
+        self.expirar_lease(job)
+        self.assertEqual(jobs.requeue_expired_jobs(lease_seconds=60, max_attempts=2), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        carregar.assert_not_called()
+
+
+@mock.patch('predictions.views.get_model_by_id', return_value=ModeloFixo())
+class GeneratePredictionsCommandTests(PrevisoesTestCase):
+    def gerar(self, *argumentos, saida=None):
+        saida = saida or StringIO()
+        call_command('generate_predictions', *argumentos, stdout=saida)
+        return saida.getvalue()
+
+    def test_regera_somente_os_modelos_filtrados(self, _carregar):
+        outro = PredictionModel.objects.create(
+            forecast=self.forecast, model_type='xgboost', name="XGB reserva", path='predictions/model/outro.pkl', granularity='D'
+        )
+
+        saida = self.gerar('--start', '2030-01-01T03:00:00Z', '--end', '2030-01-05T03:00:00Z', '--model-id', str(self.model_db.id))
+
+        self.assertEqual(self.valores(), [10] * 5)
+        self.assertEqual(self.valores(outro), [])
+        self.assertIn("Modelos processados com sucesso: 1", saida)
+
+    def test_modelo_com_erro_nao_interrompe_os_demais(self, carregar):
+        outro = PredictionModel.objects.create(
+            forecast=self.forecast, model_type='xgboost', name="XGB reserva", path='predictions/model/outro.pkl', granularity='D'
+        )
+        carregar.side_effect = lambda model_id, model_db=None: ModeloFixo(erro=RuntimeError("falhou")) if model_id == outro.id else ModeloFixo()
+
+        saida = StringIO()
+        with self.assertRaisesMessage(CommandError, f"1 de 2 modelo(s) com erro (IDs: {outro.id})"):
+            self.gerar('--start', '2030-01-01T03:00:00Z', '--days', '2', saida=saida)
+
+        self.assertEqual(self.valores(), [10] * 3)
+        self.assertIn("Modelos com erro: 1", saida.getvalue())
+
+    def test_datas_invalidas(self, _carregar):
+        with self.assertRaises(CommandError):
+            self.gerar('--start', 'ontem')
+
+
+class PaginacaoTests(PrevisoesTestCase):
+    def setUp(self):
+        super().setUp()
+        storage.upsert_predictions(self.model_db, dias('2030-01-01 03:00', 14), range(1, 15))
+        self.url = f'/api/forecasts/{self.forecast.id}/predictions'
+
+    def test_sem_page_size_devolve_a_lista_completa(self):
+        resposta = self.client.get(self.url, {'model_id': self.model_db.id})
+        self.assertEqual([linha['value'] for linha in resposta.json()], list(range(1, 15)))
+
+    def test_cursor_percorre_todas_as_previsoes_em_ordem(self):
+        paginas = [self.client.get(self.url, {'model_id': self.model_db.id, 'page_size': 5}).json()]
+        while paginas[-1]['next'] is not None:
+            paginas.append(self.client.get(paginas[-1]['next']).json())
+
+        self.assertEqual(
+            [[linha['value'] for linha in pagina['results']] for pagina in paginas],
+            [[1, 2, 3, 4, 5], [6, 7, 8, 9, 10], [11, 12, 13, 14]],
+        )
+        self.assertIsNone(paginas[0]['previous'])
+        # O link previous da segunda página volta para a primeira
+        anterior = self.client.get(paginas[1]['previous']).json()
+        self.assertEqual(anterior['results'], paginas[0]['results'])
+
+    def test_stream_json_igual_a_lista_serializada(self):
+        lista = self.client.get(self.url, {'model_id': self.model_db.id}).json()
+        resposta = self.client.get(self.url, {'model_id': self.model_db.id, 'stream': 'json'})
+
+        self.assertEqual(resposta['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(b''.join(resposta.streaming_content)), lista)
+
+    def test_stream_ndjson_uma_linha_por_previsao(self):
+        with mock.patch('predictions.streaming.LINHAS_POR_CHUNK', 4):
+            resposta = self.client.get(self.url, {'model_id': self.model_db.id, 'stream': 'ndjson'})
+            linhas = b''.join(resposta.streaming_content).decode().splitlines()
+
+        self.assertEqual(resposta['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(linha)['value'] for linha in linhas], list(range(1, 15)))
+
+    def test_formato_de_stream_invalido(self):
+        resposta = self.client.get(self.url, {'model_id': self.model_db.id, 'stream': 'xml'})
+        self.assertEqual(resposta.status_code, 400)
+
+
+class SerieTests(PrevisoesTestCase):
+    def setUp(self):
+        super().setUp()
+        storage.upsert_predictions(self.model_db, dias('2030-01-01 03:00', 5), [1.5, 2, 3, 4, 5])
+        self.url = f'/api/forecasts/{self.forecast.id}/series'
+
+    def test_serie_colunar_igual_as_previsoes(self):
+        lista = self.client.get(f'/api/forecasts/{self.forecast.id}/predictions', {'model_id': self.model_db.id}).json()
+        serie = self.client.get(self.url, {'model_id': self.model_db.id}).json()
+
+        self.assertEqual((serie['model_id'], serie['granularity']), (self.model_db.id, 'D'))
+        self.assertEqual(serie['t'], [linha['prediction_datetime'] for linha in lista])
+        self.assertEqual(serie['v'], [linha['value'] for linha in lista])
+
+    def test_intervalo_filtra_a_serie(self):
+        with mock.patch('predictions.views.process_missing_predictions') as preencher:
+            serie = self.client.get(
+                self.url, {'model_id': self.model_db.id, 'start_date': '2030-01-02T03:00:00Z', 'end_date': '2030-01-03T03:00:00Z'}
+            ).json()
+
+        self.assertEqual(serie['v'], [2, 3])
+        preencher.assert_called_once()
+
+    def test_json_da_biblioteca_padrao_igual_ao_orjson(self):
+        com_orjson = self.client.get(self.url, {'model_id': self.model_db.id}).content
+        with mock.patch.object(encoders, 'orjson', None):
+            sem_orjson = self.client.get(self.url, {'model_id': self.model_db.id}).content
+
+        self.assertEqual(json.loads(sem_orjson), json.loads(com_orjson))
+
+    def test_model_id_obrigatorio_e_do_proprio_forecast(self):
+        outro = Forecast.objects.create(name="Bar")
+
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(f'/api/forecasts/{outro.id}/series', {'model_id': self.model_db.id}).status_code, 404)
+
+
+class ExportacaoTests(PrevisoesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.outro = PredictionModel.objects.create(
+            forecast=self.forecast, model_type='xgboost', name="XGB reserva", path='predictions/model/outro.pkl', granularity='D'
+        )
+        storage.upsert_predictions(self.model_db, dias('2030-01-01 03:00', 5), [1.5, 2, 3, 4, 5])
+        storage.upsert_predictions(self.outro, dias('2030-01-01 03:00', 3), [10, 20, 30])
+        self.url = f'/api/forecasts/{self.forecast.id}/predictions/export'
+
+    def exportar(self, **kwargs):
+        resposta = self.client.get(self.url, **kwargs)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta, b''.join(resposta.streaming_content)
+
+    def tabela(self, corpo, formato):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if formato == 'parquet':
+            return pq.read_table(BytesIO(corpo))
+        return pa.ipc.open_stream(corpo).read_all()
+
+    def test_csv(self):
+        with mock.patch('predictions.streaming.LINHAS_POR_CHUNK', 3):
+            resposta, corpo = self.exportar(data={'format': 'csv'})
+        linhas = corpo.decode().splitlines()
+
+        self.assertEqual(resposta['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('.csv"', resposta['Content-Disposition'])
+        self.assertEqual(linhas[0], 'model_id,prediction_datetime,value')
+        self.assertEqual(len(linhas) - 1, 8)
+        self.assertEqual(linhas[1], f'{self.model_db.id},2030-01-01T03:00:00Z,1.5')
+
+    def test_arrow_e_parquet(self):
+        for formato, content_type in (
+            ('arrow', 'application/vnd.apache.arrow.stream'),
+            ('parquet', 'application/vnd.apache.parquet'),
+        ):
+            with self.subTest(formato=formato):
+                resposta, corpo = self.exportar(data={'format': formato})
+                tabela = self.tabela(corpo, formato)
+
+                self.assertEqual(resposta['Content-Type'], content_type)
+                self.assertEqual(tabela.schema.names, ['model_id', 'prediction_datetime', 'value'])
+                self.assertEqual(tabela.num_rows, 8)
+                self.assertEqual(str(tabela.schema.field('prediction_datetime').type), 'timestamp[us, tz=UTC]')
+                self.assertEqual(
+                    sorted(tabela.column('value').to_pylist()), sorted([1.5, 2, 3, 4, 5, 10, 20, 30])
+                )
+
+    def test_formato_pelo_header_accept_e_filtro_por_modelo(self):
+        resposta, corpo = self.exportar(data={'model_id': self.outro.id}, HTTP_ACCEPT='application/vnd.apache.parquet')
+
+        self.assertEqual(resposta['Content-Type'], 'application/vnd.apache.parquet')
+        self.assertEqual(self.tabela(corpo, 'parquet').column('value').to_pylist(), [10, 20, 30])
+
+    def test_sem_pyarrow_responde_406(self):
+        with mock.patch('predictions.views.pyarrow_disponivel', return_value=False):
+            self.assertEqual(self.client.get(self.url, {'format': 'arrow'}).status_code, 406)
+            self.assertEqual(self.client.get(self.url, {'format': 'csv'}).status_code, 200)
+
+
+class CacheHttpTests(PrevisoesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.grade = dias('2030-01-01 03:00', 3)
+        storage.upsert_predictions(self.model_db, self.grade, [1, 2, 3])
+        self.url = f'/api/forecasts/{self.forecast.id}/predictions'
+        self.parametros = {'model_id': self.model_db.id}
+
+    def test_if_none_match_da_versao_atual_recebe_304_sem_consultar_o_banco(self):
+        resposta = self.client.get(self.url, self.parametros)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['Cache-Control'], 'no-cache')
+
+        with self.assertNumQueries(0):
+            condicional = self.client.get(self.url, self.parametros, HTTP_IF_NONE_MATCH=resposta['ETag'])
+        self.assertEqual(condicional.status_code, 304)
+        self.assertEqual(condicional['ETag'], resposta['ETag'])
+
+    def test_if_modified_since_sozinho_nao_gera_304(self):
+        resposta = self.client.get(self.url, self.parametros)
+        condicional = self.client.get(self.url, self.parametros, HTTP_IF_MODIFIED_SINCE=resposta['Last-Modified'])
+        self.assertEqual(condicional.status_code, 200)
+
+    def test_leitura_repetida_vem_do_cache(self):
+        # O corpo só vai para o cache no commit
+        with self.captureOnCommitCallbacks(execute=True):
+            resposta = self.client.get(self.url, self.parametros)
+
+        with self.assertNumQueries(0):
+            repetida = self.client.get(self.url, self.parametros)
+        self.assertEqual((repetida.content, repetida['ETag']), (resposta.content, resposta['ETag']))
+
+    def test_corpo_lido_em_transacao_desfeita_nao_fica_no_cache(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            storage.upsert_predictions(self.model_db, self.grade, [7, 8, 9])
+            self.assertEqual([linha['value'] for linha in self.client.get(self.url, self.parametros).json()], [7, 8, 9])
+            raise RuntimeError("desfaz")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resposta = self.client.get(self.url, self.parametros)
+        self.assertEqual([linha['value'] for linha in resposta.json()], [1, 2, 3])
+
+    def test_benchmark_da_leitura_nao_deixa_dados(self):
+        saida = StringIO()
+        call_command('benchmark_read_path', '--model-id', self.model_db.id, '--days', '3', '--repeat', '1', stdout=saida)
+
+        self.assertIn("Ganho do caminho rápido", saida.getvalue())
+        self.assertEqual(Prediction.objects.count(), 3)
+        self.assertEqual(self.client.get(self.url, self.parametros).json()[0]['value'], 1)
+
+    def test_escrita_no_modelo_invalida_as_respostas(self):
+        antes = self.client.get(self.url, self.parametros)
+        with self.captureOnCommitCallbacks(execute=True):
+            salvar_previsoes(self.model_db, previsoes(self.grade, [10, 20, 30]))
+
+        depois = self.client.get(self.url, self.parametros, HTTP_IF_NONE_MATCH=antes['ETag'])
+        self.assertEqual(depois.status_code, 200)
+        self.assertNotEqual(depois['ETag'], antes['ETag'])
+        self.assertEqual([linha['value'] for linha in depois.json()], [10, 20, 30])
+
+    def test_mover_o_modelo_invalida_o_forecast_anterior(self):
+        # Leitura do Forecast inteiro (sem model_id): versionada pelo Forecast
+        antes = self.client.get(self.url)
+        self.assertEqual(len(antes.json()), 3)
+
+        outro = Forecast.objects.create(name="Bar")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.model_db.forecast = outro
+            self.model_db.save()
+
+        depois = self.client.get(self.url, HTTP_IF_NONE_MATCH=antes['ETag'])
+        self.assertEqual((depois.status_code, depois.json()), (200, []))
+        self.assertEqual(len(self.client.get(f'/api/forecasts/{outro.id}/predictions').json()), 3)
+
+    def test_apagar_o_modelo_invalida_o_forecast(self):
+        antes = self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.model_db.delete()
+
+        depois = self.client.get(self.url, HTTP_IF_NONE_MATCH=antes['ETag'])
+        self.assertEqual((depois.status_code, depois.json()), (200, []))
+
+    def test_serie_tambem_e_validada(self):
+        url = f'/api/forecasts/{self.forecast.id}/series'
+        resposta = self.client.get(url, self.parametros)
+
+        self.assertEqual(self.client.get(url, self.parametros, HTTP_IF_NONE_MATCH=resposta['ETag']).status_code, 304)
+        self.assertNotEqual(resposta['ETag'], self.client.get(self.url, self.parametros)['ETag'])
+
+    def test_cada_pagina_tem_a_propria_entrada_no_cache(self):
+        parametros = {'model_id': self.model_db.id, 'page_size': 2}
+        primeira = self.client.get(self.url, parametros)
+        segunda = self.client.get(primeira.json()['next'])
+
+        self.assertNotEqual(primeira['ETag'], segunda['ETag'])
+        self.assertEqual(self.client.get(self.url, parametros).content, primeira.content)
+        self.assertEqual(self.client.get(self.url, parametros, HTTP_IF_NONE_MATCH=primeira['ETag']).status_code, 304)
+
+
+class ForecastDesnormalizadoTests(PrevisoesTestCase):
+    def test_upsert_e_save_preenchem_o_forecast(self):
+        storage.upsert_predictions(self.model_db, dias('2030-01-01 03:00', 2), [1, 2])
+        avulsa = Prediction.objects.create(
+            model=self.model_db, prediction_datetime=dias('2030-02-01 03:00', 1)[0].tz_localize('UTC').to_pydatetime(), value=3
+        )
+
+        self.assertEqual(avulsa.forecast_id, self.forecast.id)
+        self.assertEqual(set(Prediction.objects.values_list('forecast_id', flat=True)), {self.forecast.id})
+
+    def test_indices_da_tabela_de_previsoes(self):
+        with connection.cursor() as cursor:
+            restricoes = connection.introspection.get_constraints(cursor, Prediction._meta.db_table)
+        indices = {tuple(r['columns']) for r in restricoes.values() if r['index'] and not r['primary_key']}
+
+        # Chave única (leituras por modelo) e (forecast, data); nenhum índice de cobertura com o value
+        self.assertLessEqual({('forecast_id', 'prediction_datetime'), ('model_id', 'prediction_datetime')}, indices)
+        self.assertFalse([colunas for colunas in indices if 'value' in colunas])
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"EXPLAIN QUERY PLAN SELECT prediction_datetime, value FROM {Prediction._meta.db_table} "
+                "WHERE model_id = %s AND prediction_datetime BETWEEN %s AND %s ORDER BY prediction_datetime",
+                [self.model_db.id, '2030-01-01', '2030-02-01'],
+            )
+            plano = ' '.join(str(linha[-1]) for linha in cursor.fetchall())
+        self.assertIn('USING INDEX', plano)
+        self.assertNotIn('TEMP B-TREE', plano)
+
+    def test_mover_o_modelo_leva_as_previsoes(self):
+        storage.upsert_predictions(self.model_db, dias('2030-01-01 03:00', 3), [1, 2, 3])
+        outro = Forecast.objects.create(name="Bar")
+
+        self.model_db.forecast = outro
+        self.model_db.save()
+
+        self.assertEqual(Prediction.objects.filter(forecast=outro).count(), 3)
+        self.assertEqual(len(self.client.get(f'/api/forecasts/{outro.id}/predictions').json()), 3)
+
+
+class ArquivamentoTests(PrevisoesTestCase):
+    def setUp(self):
+        super().setUp()
+        # Dez dias, três deles em dezembro: o corte mensal separa os lotes
+        storage.upsert_predictions(self.model_db, dias('2029-12-29 03:00', 10), range(1, 11))
+
+    def arquivar(self, *argumentos):
+        saida = StringIO()
+        call_command('archive_predictions', *argumentos, stdout=saida)
+        return saida.getvalue()
+
+    def test_move_as_previsoes_anteriores_ao_limite(self):
+        self.arquivar('--before', '2030-01-03T00:00:00Z')
+
+        self.assertEqual(self.valores(), [6, 7, 8, 9, 10])
+        arquivadas = PredictionArchive.objects.filter(model=self.model_db).order_by('prediction_datetime')
+        self.assertEqual(list(arquivadas.values_list('value', flat=True)), [1, 2, 3, 4, 5])
+        self.assertEqual({a.forecast_id for a in arquivadas}, {self.forecast.id})
+
+    def test_dry_run_so_conta(self):
+        saida = self.arquivar('--before', '2030-01-03T00:00:00Z', '--dry-run')
+
+        self.assertIn("5 previsões seriam arquivadas", saida)
+        self.assertEqual(len(self.valores()), 10)
+        self.assertFalse(PredictionArchive.objects.exists())
+
+    def test_arquivar_de_novo_atualiza_o_arquivo(self):
+        self.arquivar('--before', '2030-01-01T00:00:00Z')
+        storage.upsert_predictions(self.model_db, dias('2029-12-29 03:00', 1), [100])
+        self.arquivar('--before', '2030-01-01T00:00:00Z')
+
+        arquivadas = PredictionArchive.objects.filter(model=self.model_db).order_by('prediction_datetime')
+        self.assertEqual(list(arquivadas.values_list('value', flat=True)), [100, 2, 3])
+
+
+class ConexaoSQLiteTests(TestCase):
+    def pragma(self, nome):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {nome}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_aplicados_em_cada_conexao(self):
+        # synchronous: 1 = NORMAL; temp_store: 2 = MEMORY; busy_timeout em ms
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('temp_store'), 2)
+        self.assertEqual(self.pragma('cache_size'), settings.SQLITE_PRAGMAS['cache_size'])
+        self.assertEqual(self.pragma('busy_timeout'), settings.DATABASES['default']['OPTIONS']['timeout'] * 1000)
+        # O journal_mode fica gravado no arquivo: não é reaplicado (nem gravado) a cada conexão
+        self.assertNotIn('journal_mode', settings.DATABASES['default']['OPTIONS']['init_command'])
+
+    def test_migracao_grava_o_journal_mode_no_arquivo(self):
+        migracao = importlib.import_module('predictions.migrations.0009_sqlite_journal_mode')
+        self.assertFalse(migracao.Migration.atomic)
+
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        caminho = os.path.join(pasta, 'banco.sqlite3')
+        conexao = type(connections['default'])({**connection.settings_dict, 'NAME': caminho}, alias='journal_mode')
+        self.addCleanup(conexao.close)
+
+        def journal_mode_do_arquivo():
+            # Conexão nova, sem init_command: o modo lido é o gravado no arquivo
+            with closing(sqlite3.connect(caminho)) as nova:
+                return nova.execute('PRAGMA journal_mode').fetchone()[0]
+
+        migracao.aplicar_journal_mode(None, SimpleNamespace(connection=conexao))
+        self.assertEqual(journal_mode_do_arquivo(), settings.SQLITE_JOURNAL_MODE.lower())
+
+        migracao.voltar_para_delete(None, SimpleNamespace(connection=conexao))
+        self.assertEqual(journal_mode_do_arquivo(), 'delete')
+
+
+class ExogenasTests(SimpleTestCase):
+    # 03:00 UTC é meia-noite local: os dias locais são 24/12 (quarta) a 27/12 (sábado)
+    datas = dias('2025-12-24 03:00', 4)
+
+    def test_regras_avaliadas_no_horario_local(self):
+        regras = {
+            'natal': {'datas': ['2025-12-25']},
+            'sabado': {'dia_semana': [5]},
+            'dezembro': {'mes': [12]},
+            'meia_noite': {'hora': [0]},
+            'recesso': {'intervalos': [['2025-12-26', '2025-12-31 23:00']]},
+            'promocao': {'constante': 2.5},
+        }
+        matriz = prepare_future_exog(list(regras), regras, self.datas)
+
+        np.testing.assert_array_equal(matriz, [
+            [0, 0, 1, 1, 0, 2.5],
+            [1, 0, 1, 1, 0, 2.5],
+            [0, 0, 1, 1, 1, 2.5],
+            [0, 1, 1, 1, 1, 2.5],
+        ])
+
+    def test_colunas_resolvidas_pelo_nome(self):
+        colunas = ['eh_feriado', 'dia_semana', 'fim_de_semana', 'hora', 'is_sabado', 'dia_mes']
+        matriz = prepare_future_exog(colunas, None, self.datas)
+
+        calendario = matriz_features_xgboost(self.datas - pd.Timedelta(hours=3))
+        for i in (0, 4, 5):
+            np.testing.assert_array_equal(matriz[:, i], calendario[:, FEATURES_XGBOOST.index(colunas[i])])
+        np.testing.assert_array_equal(matriz[:, 1], [2, 3, 4, 5])
+        np.testing.assert_array_equal(matriz[:, 5], [24, 25, 26, 27])
+        np.testing.assert_array_equal(matriz[:, 2], [0, 0, 0, 1])
+        np.testing.assert_array_equal(matriz[:, 3], [0, 0, 0, 0])
+        self.assertEqual(matriz[1, 0], 1)
+
+    def test_regra_apontando_para_outra_feature(self):
+        matriz = prepare_future_exog(['feriado'], {'feriado': 'eh_feriado'}, self.datas)
+        np.testing.assert_array_equal(matriz[:, 0], [0, 1, 0, 0])
+
+    def test_coluna_sem_regra_ou_regra_invalida(self):
+        with self.assertRaises(ValueError):
+            prepare_future_exog(['clima'], None, self.datas)
+        with self.assertRaises(ValueError):
+            prepare_future_exog(['x'], {'x': {'semana': [1]}}, self.datas)
+
+
+class MotoresExogenosTests(SimpleTestCase):
+    def test_sarimax_usa_uma_previsao_com_as_exogenas_do_horizonte(self):
+        from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+        # Treino em dias locais; os fins de semana têm 50 a mais de movimento
+        indice = pd.date_range('2025-10-01', periods=60, freq='D')
+        fim_de_semana = (indice.dayofweek >= 5).astype(float)
+        serie = pd.Series(100 + 50 * fim_de_semana + np.random.default_rng(0).normal(0, 1, 60), index=indice)
+        ajustado = SARIMAX(serie, exog=pd.DataFrame({'fim_de_semana': fim_de_semana}, index=indice), order=(1, 0, 0)).fit(disp=False)
+        model_db = PredictionModel(model_type='sarimax', granularity='D', exog_columns=['fim_de_semana'])
+
+        # Dois dias do treino e os três seguintes, em UTC
+        pedidas = pd.date_range(indice[-2], periods=5, freq='D') + pd.Timedelta(hours=3)
+        with mock.patch.object(ajustado, 'get_forecast', wraps=ajustado.get_forecast) as prever:
+            resultado = views.run_prediction(model_db, ajustado, pedidas[0], pedidas[-1], future_dates=pedidas)
+
+        self.assertEqual(prever.call_count, 1)
+        horizonte = pd.date_range(indice[-1], periods=4, freq='D')[1:]
+        np.testing.assert_array_equal(prever.call_args.kwargs['exog'][:, 0], (horizonte.dayofweek >= 5).astype(float))
+        esperado = np.concatenate([
+            ajustado.fittedvalues.iloc[-2:].to_numpy(),
+            ajustado.get_forecast(steps=3, exog=prever.call_args.kwargs['exog']).predicted_mean.to_numpy(),
+        ])
+        np.testing.assert_allclose(resultado['value'].to_numpy(), esperado.clip(0).round(2))
+        self.assertEqual(list(resultado['prediction_datetime']), list(pedidas))
+
+    def test_lgbm_monta_as_colunas_do_modelo(self):
+        modelo = mock.Mock(feature_name_=['eh_feriado', 'fim_de_semana'])
+        modelo.predict.side_effect = lambda features: features['eh_feriado'].to_numpy() * 10 + features['fim_de_semana'].to_numpy()
+        model_db = PredictionModel(model_type='lgbm', granularity='D')
+
+        pedidas = dias('2025-12-24 03:00', 4)
+        resultado = views.run_prediction(model_db, modelo, pedidas[0], pedidas[-1], future_dates=pedidas)
+
+        self.assertEqual(list(modelo.predict.call_args.args[0].columns), ['eh_feriado', 'fim_de_semana'])
+        self.assertEqual(resultado['value'].tolist(), [0, 10, 0, 1])
+
+
+class RegistroDePreditoresTests(SimpleTestCase):
+    def test_motores_registrados_por_tipo(self):
+        self.assertEqual(set(predictors.PREDICTORS), {'prophet', 'xgboost', 'lgbm', 'sarimax'})
+        with self.assertRaises(ValueError):
+            predictors.get_predictor('arima')
+
+    def test_extensao_incompativel_com_o_tipo(self):
+        with self.assertRaises(TypeError):
+            load_model_from_path('predictions/model/modelo_prophet_final.json', 'xgboost')
+
+    def test_grade_horaria_com_o_alias_novo_do_pandas(self):
+        grade = predictors.gerar_datas('2030-01-01 00:00', '2030-01-01 03:00', 'H')
+        self.assertEqual(len(grade), 4)
+
+    def test_pos_processamento_comum(self):
+        modelo_db = PredictionModel(id=1, model_type='lgbm', granularity='D', exog_columns=['dia_semana'])
+        modelo = mock.Mock()
+        modelo.predict.return_value = np.array([-3.0, 1.234, np.nan, 7.899])
+
+        resultado = predictors.prever(modelo_db, modelo, dias('2030-01-01 03:00', 4))
+
+        self.assertEqual(resultado['value'].tolist(), [0, 1.23, 7.9])
+        self.assertEqual(list(resultado['prediction_datetime']), list(dias('2030-01-01 03:00', 4)[[0, 1, 3]]))
+        self.assertEqual(set(resultado.attrs['tempos']), {'features', 'inferencia', 'total'})
+
+    def test_features_compartilhadas_entre_modelos_com_a_mesma_chave(self):
+        datas = dias('2030-01-01 03:00', 5)
+        cache = {}
+        with mock.patch.object(predictors.XGBoostPredictor, 'build_features', autospec=True,
+                               side_effect=predictors.XGBoostPredictor.build_features) as montar:
+            for model_id in (1, 2):
+                predictors.prever(PredictionModel(id=model_id, model_type='xgboost'), ModeloFixo(), datas, cache_features=cache)
+
+        self.assertEqual(montar.call_count, 1)
+
+    def test_xgboost_igual_ao_caminho_anterior(self):
+        import joblib
+
+        modelo = joblib.load(os.path.join(settings.BASE_DIR, 'predictions/model/modelo_restaurante_v3_flags.pkl'))
+        datas = pd.date_range('2025-01-01 03:00', '2025-12-31 03:00', freq='D')
+        features = criar_features_xgboost_original(pd.DataFrame({'ds': datas}))[FEATURES_XGBOOST]
+
+        resultado = predictors.prever(PredictionModel(id=1, model_type='xgboost'), modelo, datas)
+
+        np.testing.assert_array_equal(resultado['value'].to_numpy(), np.maximum(modelo.predict(features), 0).astype(int))
+
+
+class ProphetPontualTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.modelo = load_model_from_path('predictions/model/modelo_prophet_final.json', 'prophet')
+        cls.model_db = PredictionModel(id=1, model_type='prophet', granularity='H')
+
+    def features(self, datas):
+        return predictors.get_predictor('prophet').build_features(self.model_db, self.modelo, datas)
+
+    def test_yhat_igual_ao_predict_completo(self):
+        for datas in (
+            predictors.gerar_datas('2026-01-01 03:00', '2026-01-31 02:00', 'H'),
+            predictors.gerar_datas('2026-02-14 03:00', '2026-02-20 03:00', 'H')[::5],
+        ):
+            features = self.features(datas)
+            np.testing.assert_allclose(
+                predictors.prophet_yhat(self.modelo, features), self.modelo.predict(features)['yhat'].to_numpy(), rtol=0, atol=1e-9
+            )
+
+    def test_intervalos_sob_demanda(self):
+        datas = predictors.gerar_datas('2026-01-01 03:00', '2026-01-02 02:00', 'H')
+
+        pontual = predictors.prever(self.model_db, self.modelo, datas)
+        com_intervalos = predictors.prever(self.model_db, self.modelo, datas, intervalos=True)
+
+        self.assertEqual(list(pontual.columns), ['prediction_datetime', 'value'])
+        self.assertEqual(list(com_intervalos.columns), ['prediction_datetime', 'value', 'lower', 'upper'])
+        np.testing.assert_array_equal(com_intervalos['value'], pontual['value'])
+        self.assertTrue((com_intervalos['lower'] <= com_intervalos['upper']).all())
+
+    def test_motor_sem_intervalos(self):
+        with self.assertRaises(ValueError):
+            predictors.prever(PredictionModel(id=2, model_type='xgboost'), ModeloFixo(), dias('2030-01-01 03:00', 2), intervalos=True)
+
+
+class ArtefatosTests(SimpleTestCase):
+    """Exporta os modelos empacotados em predictions/model/ e os recarrega dos artefatos."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.diretorio = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.diretorio, ignore_errors=True)
+        cls.enterClassContext(override_settings(PREDICTION_ARTIFACT_DIR=os.path.join(cls.diretorio, 'inference')))
+
+        # Cópia do original: o teste de artefato desatualizado altera o arquivo
+        cls.model_path = 'predictions/model/modelo_prophet_final.json'
+        cls.full_path = os.path.join(cls.diretorio, 'modelo_prophet_final.json')
+        shutil.copyfile(os.path.join(settings.BASE_DIR, cls.model_path), cls.full_path)
+
+        cls.predictor = predictors.get_predictor('prophet')
+        cls.model_db = PredictionModel(model_type='prophet', name="Prophet horário", path=cls.model_path, granularity='H')
+        cls.original = cls.predictor.load(cls.full_path)
+        artifacts.exportar(cls.model_path, cls.full_path, cls.predictor, cls.original)
+        cls.artefato = artifacts.carregar(cls.model_path, cls.full_path, cls.predictor)
+
+    def prever(self, modelo, intervalos=False):
+        datas = predictors.gerar_datas(pd.Timestamp('2026-01-01 03:00'), pd.Timestamp('2026-01-02 02:00'), 'H')
+        features = self.predictor.build_features(self.model_db, modelo, datas)
+        if intervalos:
+            return self.predictor.predict_intervals(self.model_db, modelo, datas, features)
+        return self.predictor.predict_batch(self.model_db, modelo, datas, features)
+
+    def test_previsao_pontual_igual_a_do_original(self):
+        self.assertIsNotNone(self.artefato)
+        np.testing.assert_allclose(self.prever(self.artefato), self.prever(self.original))
+
+    def test_artefato_mantem_o_historico_para_os_intervalos(self):
+        pd.testing.assert_frame_equal(self.artefato.history, self.original.history)
+        self.assertTrue(self.artefato.history_dates.reset_index(drop=True).equals(self.original.history_dates.reset_index(drop=True)))
+
+        with mock.patch.object(self.predictor, 'load', wraps=self.predictor.load) as carregar:
+            valores, inferior, superior = self.prever(self.artefato, intervalos=True)
+
+        carregar.assert_not_called()
+        np.testing.assert_allclose(valores, self.prever(self.original))
+        self.assertTrue(np.all(inferior <= valores) and np.all(valores <= superior))
+
+    def test_artefato_de_outro_arquivo_e_ignorado(self):
+        with open(self.full_path, 'a') as f:
+            f.write(' ')
+        self.addCleanup(shutil.copyfile, os.path.join(settings.BASE_DIR, self.model_path), self.full_path)
+
+        self.assertIsNone(artifacts.carregar(self.model_path, self.full_path, self.predictor))
+
+    def test_xgboost_sem_pickle(self):
+        model_path = 'predictions/model/modelo_restaurante_v3_flags.pkl'
+        full_path = os.path.join(settings.BASE_DIR, model_path)
+        predictor = predictors.get_predictor('xgboost')
+        original = predictor.load(full_path)
+
+        destino = artifacts.exportar(model_path, full_path, predictor, original)
+        artefato = artifacts.carregar(model_path, full_path, predictor)
+
+        self.assertTrue(os.path.exists(os.path.join(destino, 'model.ubj')))
+        datas = dias('2026-01-01 03:00', 60)
+        features = predictor.build_features(None, original, datas)
+        np.testing.assert_array_equal(artefato.predict(features), original.predict(features))
+
+    def test_artefato_novo_troca_a_assinatura_no_registro(self):
+        model_db = PredictionModel(id=1, model_type='prophet', path='predictions/model/outro.json')
+        antes = ModelRegistry._signature(model_db)
+
+        destino = artifacts.diretorio_artefato(model_db.path)
+        os.makedirs(destino)
+        with open(os.path.join(destino, artifacts.ARQUIVO_META), 'w') as f:
+            f.write('{}')
+
+        self.assertNotEqual(ModelRegistry._signature(model_db), antes)
+
+
+@mock.patch('predictions.views.get_model_by_id', return_value=ModeloFixo())
+class MaterializacaoTests(PrevisoesTestCase):
+    # 12:00 local de 10/01; o dia local começa às 03:00 UTC
+    agora = pd.Timestamp('2030-01-10 15:00', tz='UTC').to_pydatetime()
+
+    def setUp(self):
+        super().setUp()
+        self.model_db.horizon_days = 5
+        self.model_db.save()
+
+    def test_primeira_execucao_materializa_de_hoje_ao_horizonte(self, _carregar):
+        self.assertEqual(materialization.materializar_modelo(self.model_db, agora=self.agora), (6, 6))
+
+        self.model_db.refresh_from_db()
+        self.assertEqual(
+            materialization.janela_materializada(self.model_db),
+            (pd.Timestamp('2030-01-10 03:00'), pd.Timestamp('2030-01-15 03:00')),
+        )
+        self.assertEqual(self.valores(), [10] * 6)
+
+    def test_janela_estendida_em_partes(self, carregar):
+        self.assertEqual(materialization.materializar_modelo(self.model_db, agora=self.agora, max_pontos=4), (4, 4))
+        self.assertEqual(materialization.materializar_modelo(self.model_db, agora=self.agora, max_pontos=4), (2, 2))
+        self.assertEqual(materialization.materializar_modelo(self.model_db, agora=self.agora, max_pontos=4), (0, 0))
+
+        self.model_db.refresh_from_db()
+        self.assertEqual(materialization.janela_materializada(self.model_db)[0], pd.Timestamp('2030-01-10 03:00'))
+        self.assertEqual(len(self.valores()), 6)
+
+    def test_datas_ja_gravadas_entram_na_janela_sem_inferencia(self, carregar):
+        storage.upsert_predictions(self.model_db, dias('2030-01-10 03:00', 6), range(6))
+
+        self.assertEqual(materialization.materializar_modelo(self.model_db, agora=self.agora), (6, 0))
+        carregar.assert_not_called()
+
+    def test_leitura_dentro_da_janela_nao_procura_lacunas(self, _carregar):
+        materialization.materializar_modelo(self.model_db, agora=self.agora)
+
+        with mock.patch('predictions.views.process_missing_predictions') as preencher:
+            resposta = self.client.get(
+                f'/api/forecasts/{self.forecast.id}/series',
+                {'model_id': self.model_db.id, 'start_date': '2030-01-11T03:00:00Z', 'end_date': '2030-01-13T03:00:00Z'},
+            )
+
+        self.assertEqual(resposta.json()['v'], [10, 10, 10])
+        preencher.assert_not_called()
+
+    def test_poda_apaga_o_que_passou_da_retencao(self, _carregar):
+        materialization.materializar_modelo(self.model_db, agora=self.agora)
+        self.model_db.retention_days = 0
+        depois = self.agora + pd.Timedelta(days=3)
+
+        # Apaga de 10/01 a 13/01 (03:00 UTC), anteriores a 13/01 15:00
+        self.assertEqual(materialization.podar_modelo(self.model_db, agora=depois), 4)
+
+        self.model_db.refresh_from_db()
+        self.assertEqual(self.model_db.materialized_from, depois)
+        self.assertEqual(len(self.valores()), 2)
+
+    def test_comando_once_completa_o_horizonte(self, _carregar):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        with override_settings(PREDICTION_LOCK_DIR=pasta):
+            call_command('materialize_predictions', '--once', '--max-points', '2', stdout=StringIO())
+
+        self.model_db.refresh_from_db()
+        hoje = pd.Timestamp(timezone.now()).tz_convert('UTC').tz_localize(None) - pd.Timedelta(hours=3)
+        self.assertEqual(materialization.janela_materializada(self.model_db)[0], hoje.normalize() + pd.Timedelta(hours=3))
+        self.assertEqual(len(self.valores()), 6)
+
+
+class BenchmarkPipelineTests(TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio, ignore_errors=True)
+
+    def baseline(self, resultados):
+        caminho = os.path.join(self.diretorio, f'baseline_{len(os.listdir(self.diretorio))}.json')
+        with open(caminho, 'w') as f:
+            json.dump({'meta': {}, 'resultados': resultados}, f)
+        return caminho
+
+    def etapas(self, **medianas):
+        return {'pontos': 1, 'etapas': {etapa: {'mediana_ms': ms, 'min_ms': ms} for etapa, ms in medianas.items()}}
+
+    def test_regressao_exige_limite_relativo_e_absoluto(self):
+        from predictions.management.commands.benchmark_pipeline import Command
+
+        caminho = self.baseline({'xgboost/D/1d': self.etapas(parse=0.1, predict=10, view=40, write=5)})
+        atual = {'xgboost/D/1d': self.etapas(parse=0.5, predict=20, view=20, write=5, features=3)}
+        comando = Command(stdout=StringIO())
+
+        # parse: 5x mais lento, mas abaixo de 1 ms de diferença; predict: regressão; view: melhora
+        self.assertEqual(comando._comparar(caminho, atual, 0.25, 1.0), 1)
+        saida = comando.stdout.getvalue()
+        self.assertIn("Regressões: 1 | Melhorias: 1", saida)
+        self.assertNotIn("features", saida)
+
+    def test_baseline_invalida(self):
+        from predictions.management.commands.benchmark_pipeline import Command
+
+        with self.assertRaises(CommandError):
+            Command(stdout=StringIO())._comparar(os.path.join(self.diretorio, 'nao_existe.json'), {}, 0.25, 1.0)
+
+    def test_execucao_salva_e_compara_sem_gravar_no_banco(self):
+        resultado = os.path.join(self.diretorio, 'atual.json')
+        call_command('benchmark_pipeline', '--horizons', '1d', '--repeat', '1', '--save', resultado, stdout=StringIO())
+
+        with open(resultado) as f:
+            relatorio = json.load(f)
+        self.assertEqual(set(relatorio['resultados']), {'prophet/H/1d', 'xgboost/D/1d'})
+        self.assertEqual(relatorio['resultados']['prophet/H/1d']['pontos'], 24)
+        self.assertEqual(
+            set(relatorio['resultados']['xgboost/D/1d']['etapas']),
+            {'parse', 'load_cold', 'load_warm', 'features', 'predict', 'write', 'view'},
+        )
+        self.assertFalse(Forecast.objects.exists())
+        self.assertFalse(Prediction.objects.exists())
+        # A importação dos motores é medida à parte, fora do load_cold
+        self.assertEqual(set(relatorio['meta']['importacao_ms']), {'prophet', 'xgboost'})
+
+        # Uma baseline muito mais rápida faz o comando falhar
+        rapida = self.baseline({
+            chave: self.etapas(**{etapa: 0.001 for etapa in medida['etapas']})
+            for chave, medida in relatorio['resultados'].items()
+        })
+        with self.assertRaises(CommandError):
+            call_command(
+                'benchmark_pipeline', '--horizons', '1d', '--stages', 'load_cold', '--repeat', '1',
+                '--compare', rapida, '--fail-on-regression', stdout=StringIO(),
+            )
+
+    def test_horizonte_desconhecido(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark_pipeline', '--horizons', '2d', stdout=StringIO())
+
+
+class MetricasTests(PrevisoesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio, ignore_errors=True)
+        configuracao = override_settings(PREDICTION_METRICS_DIR=self.diretorio)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        # Registro novo por teste, para não somar o que os outros testes mediram
+        self.metricas = metrics.Metricas()
+        registro = mock.patch.object(metrics, 'metricas', self.metricas)
+        registro.start()
+        self.addCleanup(registro.stop)
+
+    def gravar_snapshot(self, pid, contadores=(), histogramas=()):
+        with open(os.path.join(self.diretorio, f'{pid}.json'), 'w') as f:
+            json.dump({'contadores': list(contadores), 'histogramas': list(histogramas)}, f)
+
+    def pid_encerrado(self):
+        processo = subprocess.Popen([sys.executable, '-c', 'pass'])
+        processo.wait()
+        return processo.pid
+
+    def test_tipo_da_metrica_e_validado(self):
+        with self.assertRaises(ValueError):
+            self.metricas.inc('predictions_stage_seconds')
+        with self.assertRaises(ValueError):
+            self.metricas.observe('predictions_rows_written_total', 1.0)
+
+    def test_exposicao_soma_os_processos_vivos_e_os_encerrados(self):
+        self.metricas.inc('predictions_rows_written_total', 5, model_type='xgboost')
+        self.metricas.observe('predictions_stage_seconds', 2 ** -8, stage='load')
+        self.metricas.observe('predictions_stage_seconds', 2.0, stage='load')
+        # Outro worker vivo (o processo pai) e um já encerrado
+        self.gravar_snapshot(
+            os.getppid(),
+            contadores=[['predictions_rows_written_total', {'model_type': 'xgboost'}, 7]],
+            histogramas=[['predictions_stage_seconds', {'stage': 'load'}, [1] + [0] * len(metrics.BUCKETS), 2 ** -10]],
+        )
+        encerrado = self.pid_encerrado()
+        self.gravar_snapshot(encerrado, contadores=[['predictions_rows_written_total', {'model_type': 'xgboost'}, 100]])
+
+        linhas = metrics.exposicao().splitlines()
+
+        self.assertIn('# TYPE predictions_rows_written_total counter', linhas)
+        self.assertIn('predictions_rows_written_total{model_type="xgboost"} 112', linhas)
+        self.assertIn('predictions_stage_seconds_bucket{stage="load",le="0.001"} 1', linhas)
+        self.assertIn('predictions_stage_seconds_bucket{stage="load",le="0.005"} 2', linhas)
+        self.assertIn('predictions_stage_seconds_bucket{stage="load",le="+Inf"} 3', linhas)
+        self.assertIn('predictions_stage_seconds_count{stage="load"} 3', linhas)
+        self.assertIn('predictions_stage_seconds_sum{stage="load"} 2.0048828125', linhas)
+
+        # O snapshot do encerrado foi para o acumulado: o contador não diminui nas leituras seguintes
+        self.assertFalse(os.path.exists(os.path.join(self.diretorio, f'{encerrado}.json')))
+        self.assertIn('predictions_rows_written_total{model_type="xgboost"} 112', metrics.exposicao().splitlines())
+
+        # Um segundo processo encerrado soma ao acumulado
+        self.gravar_snapshot(self.pid_encerrado(), contadores=[['predictions_rows_written_total', {'model_type': 'xgboost'}, 1]])
+        self.assertIn('predictions_rows_written_total{model_type="xgboost"} 113', metrics.exposicao().splitlines())
+        self.assertIn('predictions_stage_seconds_count{stage="load"} 3', metrics.exposicao().splitlines())
+
+    def test_labels_escapados(self):
+        self.metricas.inc('predictions_http_cache_requests_total', result='a"b\\c')
+        self.assertIn('predictions_http_cache_requests_total{result="a\\"b\\\\c"} 1', metrics.exposicao().splitlines())
+
+    def test_server_timing_com_as_etapas_da_requisicao(self):
+        storage.upsert_predictions(self.model_db, dias('2030-01-01 03:00', 3), [1, 2, 3])
+
+        resposta = self.client.get(f'/api/forecasts/{self.forecast.id}/series', {'model_id': self.model_db.id})
+
+        partes = [parte.split(';')[0] for parte in resposta['Server-Timing'].split(', ')]
+        self.assertEqual(partes, ['serialize', 'total'])
+        texto = metrics.exposicao()
+        self.assertIn('predictions_stage_seconds_count{stage="serialize"} 1', texto)
+        self.assertIn('predictions_http_request_seconds_count{method="GET",status="200",view="forecast-series"} 1', texto)
+
+    def test_endpoint_com_token(self):
+        self.assertEqual(self.client.get('/metrics')['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+
+        with override_settings(PREDICTION_METRICS_TOKEN='segredo'):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer segredo').status_code, 200)
+
+
+class LeituraAssincronaTests(PrevisoesTestCase):
+    """As rotas /api/async/ respondem como as síncronas e compartilham com elas o cache HTTP."""
+
+    def setUp(self):
+        super().setUp()
+        salvar_previsoes(self.model_db, previsoes(dias('2030-01-01 03:00', 14)))
+
+    def assertMesmaResposta(self, rota, parametros):
+        sincrona = self.client.get(f'/api/forecasts/{self.forecast.id}/{rota}', parametros)
+        assincrona = self.client.get(f'/api/async/forecasts/{self.forecast.id}/{rota}', parametros)
+
+        self.assertEqual((sincrona.status_code, assincrona.status_code), (200, 200))
+        self.assertEqual(assincrona.content, sincrona.content)
+        self.assertEqual(assincrona['ETag'], sincrona['ETag'])
+        revalidada = self.client.get(f'/api/async/forecasts/{self.forecast.id}/{rota}', parametros, HTTP_IF_NONE_MATCH=sincrona['ETag'])
+        self.assertEqual(revalidada.status_code, 304)
+
+    def test_previsoes(self):
+        self.assertMesmaResposta('predictions', {'model_id': self.model_db.id})
+        self.assertMesmaResposta('predictions', {
+            'model_id': self.model_db.id, 'start_date': '2030-01-03T03:00:00Z', 'end_date': '2030-01-05T03:00:00Z',
+        })
+
+    def test_agregados(self):
+        for resolucao in ('D', 'w', 'M'):
+            self.assertMesmaResposta('predictions', {'model_id': self.model_db.id, 'resolution': resolucao})
+
+        resposta = self.client.get(f'/api/async/forecasts/{self.forecast.id}/predictions', {'resolution': 'X'})
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_serie(self):
+        self.assertMesmaResposta('series', {'model_id': self.model_db.id})
+
+        resposta = self.client.get(f'/api/async/forecasts/{self.forecast.id}/series')
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_geracao_exige_autenticacao(self):
+        corpo = {'model_id': self.model_db.id, 'data_inicio': '2030-01-01T03:00:00Z', 'data_fim': '2030-01-02T03:00:00Z'}
+        resposta = self.client.post('/api/async/predict/', corpo, content_type='application/json')
+        self.assertEqual(resposta.status_code, 403)
+
+        self.client.force_login(User.objects.create_user('analista'))
+        resposta = self.client.post('/api/async/predict/', {'model_id': self.model_db.id}, content_type='application/json')
+        self.assertEqual(resposta.status_code, 400)
+
+
+class ServidorInferenciaTests(SimpleTestCase):
+    """Ida e volta pelo socket Unix com a inferência do servidor substituída por uma função conhecida."""
+
+    def setUp(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        self.caminho = os.path.join(pasta, 'inferencia.sock')
+        configuracao = override_settings(PREDICTION_INFERENCE_SOCKET=self.caminho, PREDICTION_INFERENCE_TIMEOUT=10)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        self.model_db = PredictionModel(id=7, model_type='xgboost', granularity='D')
+        self.lotes = []
+
+    def prever_no_servidor(self, model_id, lista_datas):
+        # Valor de cada data = dia do mês, para conferir a fatia devolvida a cada pedido
+        self.lotes.append(lista_datas)
+        todas = np.unique(np.concatenate(lista_datas))
+        return True, todas, pd.DatetimeIndex(todas.astype('datetime64[ns]')).day.to_numpy(dtype=np.float64)
+
+    def iniciar_servidor(self, janela=0.005, prever=None):
+        servidor = inference.ServidorInferencia(janela=janela)
+        servidor._prever = prever or self.prever_no_servidor
+        loop = asyncio.new_event_loop()
+        server = loop.run_until_complete(asyncio.start_unix_server(servidor.atender, path=self.caminho))
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+
+        async def encerrar():
+            server.close()
+            await server.wait_closed()
+            # Os clientes já fecharam as conexões; as tarefas de atendimento terminam ao ler o EOF
+            conexoes = asyncio.all_tasks() - {asyncio.current_task()}
+            if conexoes:
+                await asyncio.wait(conexoes, timeout=5)
+
+        def parar():
+            asyncio.run_coroutine_threadsafe(encerrar(), loop).result(timeout=5)
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=5)
+            loop.close()
+            servidor.executor.shutdown()
+
+        self.addCleanup(parar)
+        return servidor
+
+    def test_ida_e_volta(self):
+        self.iniciar_servidor()
+        datas = dias('2030-01-01 03:00', 3)
+
+        df = inference.prever_remoto(self.model_db, datas)
+
+        self.assertEqual(list(df['prediction_datetime']), list(datas))
+        self.assertEqual(df['value'].tolist(), [1, 2, 3])
+        self.assertEqual(df['value'].dtype, int)
+
+    def test_pedidos_simultaneos_viram_um_lote(self):
+        servidor = self.iniciar_servidor(janela=0.2)
+        pedidos = [dias('2030-01-01 03:00', 3), dias('2030-01-02 03:00', 3)]
+        respostas = [None, None]
+
+        def pedir(i):
+            respostas[i] = inference.prever_remoto(self.model_db, pedidos[i])
+
+        threads = [threading.Thread(target=pedir, args=(i,)) for i in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=10)
+
+        self.assertEqual((servidor.lotes, servidor.pedidos), (1, 2))
+        self.assertEqual(len(self.lotes), 1)
+        self.assertEqual(respostas[0]['value'].tolist(), [1, 2, 3])
+        self.assertEqual(respostas[1]['value'].tolist(), [2, 3, 4])
+
+    def test_value_error_continua_value_error(self):
+        def prever(model_id, lista_datas):
+            raise ValueError("Granularidade inválida")
+
+        self.iniciar_servidor(prever=prever)
+
+        with self.assertRaisesMessage(ValueError, "Granularidade inválida"):
+            inference.prever_remoto(self.model_db, dias('2030-01-01 03:00', 1))
+
+    @override_settings(PREDICTION_USE_INFERENCE_SERVER=True)
+    def test_sem_servidor_a_inferencia_e_local(self):
+        with self.assertRaises(inference.ServidorIndisponivel):
+            inference.prever_remoto(self.model_db, dias('2030-01-01 03:00', 1))
+
+        local = previsoes(dias('2030-01-01 03:00', 2))
+        with mock.patch('predictions.views.get_model_by_id', return_value=ModeloFixo()), \
+                mock.patch('predictions.views.run_prediction', return_value=local) as run_prediction:
+            df = views.gerar_previsao(self.model_db, pd.Timestamp('2030-01-01 03:00'), pd.Timestamp('2030-01-02 03:00'))
+
+        self.assertIs(df, local)
+        run_prediction.assert_called_once()
+
+    def test_modo_auto_segue_o_socket(self):
+        with override_settings(PREDICTION_USE_INFERENCE_SERVER='auto', PREDICTION_INFERENCE_PROBE_INTERVAL=0):
+            self.assertFalse(inference.habilitado())
+            self.iniciar_servidor()
+            self.assertTrue(inference.habilitado())
+
+        with override_settings(PREDICTION_USE_INFERENCE_SERVER=False):
+            self.assertFalse(inference.habilitado())
+
+    def test_modo_auto_ignora_socket_orfao(self):
+        orfao = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        orfao.bind(self.caminho)
+        orfao.close()
+
+        with override_settings(PREDICTION_USE_INFERENCE_SERVER='auto'):
+            self.assertTrue(os.path.exists(self.caminho))
+            self.assertFalse(inference.habilitado())
+
+    def test_modo_auto_guarda_o_resultado_da_sonda(self):
+        with override_settings(PREDICTION_USE_INFERENCE_SERVER='auto', PREDICTION_INFERENCE_PROBE_INTERVAL=3600):
+            with mock.patch.object(inference, '_servidor_vivo', wraps=inference._servidor_vivo) as sonda:
+                self.assertFalse(inference.habilitado())
+                self.iniciar_servidor()
+                for _ in range(3):
+                    self.assertFalse(inference.habilitado())
+            self.assertEqual(sonda.call_count, 1)
+
+        with override_settings(PREDICTION_USE_INFERENCE_SERVER='auto', PREDICTION_INFERENCE_PROBE_INTERVAL=0):
+            self.assertTrue(inference.habilitado())
+
+    def test_conexao_recusada_marca_o_servidor_fora_do_ar(self):
+        with override_settings(PREDICTION_USE_INFERENCE_SERVER='auto', PREDICTION_INFERENCE_PROBE_INTERVAL=3600):
+            self.iniciar_servidor()
+            self.assertTrue(inference.habilitado())
+            with mock.patch.object(socket.socket, 'connect', side_effect=ConnectionRefusedError):
+                with self.assertRaises(inference.ServidorIndisponivel):
+                    inference.prever_remoto(self.model_db, pd.date_range('2030-01-01', periods=2, freq='D'))
+            self.assertFalse(inference.habilitado())
+
+    def test_preparar_socket(self):
+        orfao = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        orfao.bind(self.caminho)
+        orfao.close()
+
+        inference.preparar_socket(self.caminho)
+        self.assertFalse(os.path.exists(self.caminho))
+
+        self.iniciar_servidor()
+        with self.assertRaises(RuntimeError):
+            inference.preparar_socket(self.caminho)
+
+
+class ResolucaoTests(PrevisoesTestCase):
+    def setUp(self):
+        super().setUp()
+        # 01/01/2030 é uma terça-feira; valores 1..14, um por dia local
+        salvar_previsoes(self.model_db, previsoes(dias('2030-01-01 03:00', 14)))
+        self.url = f'/api/forecasts/{self.forecast.id}/predictions'
+
+    def agregados(self, resolucao, **parametros):
+        resposta = self.client.get(self.url, {'model_id': self.model_db.id, 'resolution': resolucao, **parametros})
+        self.assertEqual(resposta.status_code, 200)
+        return [(linha['period_start'], linha['value_sum'], linha['count']) for linha in resposta.json()]
+
+    def test_diario(self):
+        diarios = self.agregados('D')
+        self.assertEqual(len(diarios), 14)
+        self.assertEqual(diarios[0], ('2030-01-01T03:00:00Z', 1, 1))
+        self.assertEqual([soma for _, soma, _ in diarios], list(range(1, 15)))
+
+    def test_semanal_comeca_na_segunda_feira_local(self):
+        self.assertEqual(self.agregados('W'), [
+            ('2029-12-31T03:00:00Z', 21, 6),
+            ('2030-01-07T03:00:00Z', 70, 7),
+            ('2030-01-14T03:00:00Z', 14, 1),
+        ])
+
+    def test_mensal(self):
+        resposta = self.client.get(self.url, {'model_id': self.model_db.id, 'resolution': 'm'})
+        self.assertEqual(resposta.json(), [{
+            'model': self.model_db.id, 'resolution': 'M', 'period_start': '2030-01-01T03:00:00Z',
+            'value_sum': 105, 'value_mean': 7.5, 'value_max': 14, 'count': 14,
+        }])
+
+    def test_intervalo_traz_os_periodos_que_o_cruzam(self):
+        intervalo = {'start_date': '2030-01-08T03:00:00Z', 'end_date': '2030-01-09T03:00:00Z'}
+        self.assertEqual(self.agregados('W', **intervalo), [('2030-01-07T03:00:00Z', 70, 7)])
+        self.assertEqual(self.agregados('D', **intervalo), [('2030-01-08T03:00:00Z', 8, 1), ('2030-01-09T03:00:00Z', 9, 1)])
+
+    def test_resolucao_invalida_responde_400(self):
+        resposta = self.client.get(self.url, {'model_id': self.model_db.id, 'resolution': 'H'})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('erro', resposta.json())
@@ -3,12 +3,27 @@ from .views import (
     ForecastListView,
     ModelListView,
     GeneratePredictionView,
-    ForecastResultView
+    BatchPredictionView,
+    PredictionJobCreateView,
+    PredictionJobDetailView,
+    ForecastResultView,
+    ForecastExportView,
+    PredictionSeriesView
 )
+from .async_views import AsyncForecastResultView, AsyncGeneratePredictionView, AsyncPredictionSeriesView
 
 urlpatterns = [
     path('forecasts/', ForecastListView.as_view(), name='forecast-list'),
     path('models/', ModelListView.as_view(), name='model-list'),
     path('predict/', GeneratePredictionView.as_view(), name='generate-prediction'),
+    path('predict/batch/', BatchPredictionView.as_view(), name='generate-prediction-batch'),
+    path('jobs/', PredictionJobCreateView.as_view(), name='prediction-job-create'),
+    path('jobs/<int:job_id>', PredictionJobDetailView.as_view(), name='prediction-job-detail'),
     path('forecasts/<int:forecast_id>/predictions', ForecastResultView.as_view(), name='forecast-results'),
+    path('forecasts/<int:forecast_id>/predictions/export', ForecastExportView.as_view(), name='forecast-results-export'),
+    path('forecasts/<int:forecast_id>/series', PredictionSeriesView.as_view(), name='forecast-series'),
+    # Versões assíncronas (servidas sem bloquear o worker sob ASGI; ver predictions/async_views.py)
+    path('async/predict/', AsyncGeneratePredictionView.as_view(), name='generate-prediction-async'),
+    path('async/forecasts/<int:forecast_id>/predictions', AsyncForecastResultView.as_view(), name='forecast-results-async'),
+    path('async/forecasts/<int:forecast_id>/series', AsyncPredictionSeriesView.as_view(), name='forecast-series-async'),
 ]
\ No newline at end of file
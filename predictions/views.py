@@ -1,21 +1,40 @@
 # Em predictions/views.py
+import logging
+import time
 import pandas as pd
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.generics import ListAPIView
+from rest_framework.generics import ListAPIView, RetrieveAPIView
 from rest_framework import status
-from .models import PredictionModel, Prediction, Forecast
-from .serializers import PredictionSerializer, ForecastSerializer, PredictionModelSerializer
-from .utils import get_model_by_id 
-from django.shortcuts import get_object_or_404
+from rest_framework.permissions import IsAuthenticated
+from .models import PredictionModel, Prediction, PredictionArchive, Forecast, PredictionJob, PredictionRollup
+from .serializers import PredictionSerializer, ForecastSerializer, PredictionModelSerializer, PredictionJobSerializer
+from .utils import get_model_by_id
 from django.db import transaction 
-import holidays
-from .utils import get_model_by_id, criar_features_xgboost 
+from django.utils import timezone
+from datetime import timezone as dt_timezone
+from .predictors import get_predictor, gerar_datas, prever
+from .storage import apagar_fora_da_grade, upsert_predictions
+from .locks import single_flight
+from .materialization import dentro_da_janela, limite_de_retencao
+from .pagination import PredictionCursorPagination
+from .streaming import stream_predictions, export_predictions, pyarrow_disponivel
+from .renderers import CSVRenderer, ArrowStreamRenderer, ParquetRenderer
+from . import encoders
+from django.http import HttpResponse
+from django.http.response import HttpResponseBase
+from . import http_cache
+from . import inference
+from . import metrics
+from . import rollups
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
 import numpy as np 
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
+logger = logging.getLogger(__name__)
 
 def parse_and_validate_dates(start_str, end_str, granularity='D'):
     """
@@ -47,97 +66,176 @@ def parse_and_validate_dates(start_str, end_str, granularity='D'):
     except Exception as e:
         raise ValueError(f"Erro ao processar datas: {e}")
 
-def process_prediction_task(model_db, data_inicio_naive, data_fim_naive):
+def frequencia_do_modelo(model_db):
     """
-    Gerencia a execução: Carrega modelo -> Gera Dados -> Limpa Duplicatas -> Salva.
-    Retorna a quantidade de registros criados.
+    Frequência das datas geradas para o modelo, definida pelo motor do tipo
+    (ex.: o XGBoost é sempre diário; os demais seguem a granularidade cadastrada).
+    """
+    return get_predictor(model_db.model_type).frequencia(model_db)
+
+def run_prediction(model_db, modelo_executavel, data_inicio, data_fim, future_dates=None, cache_features=None, intervalos=False):
+    """
+    Executa o motor registrado para o tipo do modelo (ver predictions/predictors.py)
+    e devolve um DataFrame (prediction_datetime, value).
+    future_dates/cache_features podem ser passados para reaproveitar datas e features entre modelos.
+    intervalos=True acrescenta as colunas lower/upper (Prophet, com amostragem de incerteza).
+    """
+    if future_dates is None:
+        future_dates = gerar_datas(data_inicio, data_fim, frequencia_do_modelo(model_db))
+    return prever(model_db, modelo_executavel, future_dates, cache_features=cache_features, intervalos=intervalos)
+
+def salvar_previsoes(model_db, df_previsao, batch_size=None, grade=None):
+    """
+    Grava as previsões do DataFrame com upsert em lotes na chave (model, prediction_datetime),
+    atualiza os agregados dos períodos tocados e invalida o cache HTTP do modelo.
+    Com `grade` (regeração forçada de um intervalo), as previsões antigas entre a primeira e a
+    última data dela que não fazem parte da grade são apagadas.
+    Deve ser chamada dentro de uma transação. Retorna a quantidade de registros gravados.
     """
-    modelo_executavel = get_model_by_id(model_db.id)
+    vazio = df_previsao is None or df_previsao.empty
+    apagadas = 0
+    if grade is not None and len(grade):
+        apagadas = apagar_fora_da_grade(model_db, grade[0], grade[-1], grade)
+    if vazio and not apagadas:
+        return 0
+
+    gravados = 0
+    datas = pd.DatetimeIndex([])
+    if not vazio:
+        datas = pd.DatetimeIndex(df_previsao['prediction_datetime'].values)
+        gravados = upsert_predictions(model_db, datas, df_previsao['value'].values, batch_size=batch_size)
+
+    if settings.PREDICTION_ROLLUPS_ENABLED:
+        tocadas = datas.append(pd.DatetimeIndex([grade[0], grade[-1]])) if apagadas else datas
+        # Antes de invalidar o cache HTTP: a nova versão já encontra os agregados atualizados
+        rollups.atualizar_rollups(model_db, tocadas)
+    http_cache.invalidate_predictions(model_db)
+    return gravados
+
+def gerar_previsao(model_db, data_inicio, data_fim, future_dates=None, cache_features=None):
+    """
+    DataFrame (prediction_datetime, value) do modelo no intervalo. Com o servidor de inferência
+    do host habilitado (ver predictions/inference.py) o modelo não é carregado neste processo;
+    se o servidor não estiver no ar, a inferência é feita aqui mesmo (reaproveitando
+    `cache_features`, quando informado).
+    """
+    if inference.habilitado():
+        if future_dates is None:
+            future_dates = gerar_datas(data_inicio, data_fim, frequencia_do_modelo(model_db))
+        try:
+            return inference.prever_remoto(model_db, future_dates)
+        except inference.ServidorIndisponivel as e:
+            logger.warning("%s Inferência do modelo ID %s feita no próprio worker.", e, model_db.id)
+
+    modelo_executavel = get_model_by_id(model_db.id, model_db=model_db)
     if modelo_executavel is None:
         raise Exception(f"Não foi possível carregar o modelo ID {model_db.id}")
+    return run_prediction(model_db, modelo_executavel, data_inicio, data_fim, future_dates=future_dates, cache_features=cache_features)
+
+def chave_geracao(model_db, data_inicio, data_fim):
+    """Chave do single-flight da geração de um intervalo do modelo (ver predictions/locks.py)."""
+    return f"prediction:{model_db.id}:{data_inicio.isoformat()}:{data_fim.isoformat()}"
+
+def process_prediction_task(model_db, data_inicio_naive, data_fim_naive, future_dates=None, cache_features=None):
+    """
+    Gerencia a execução: Carrega modelo -> Gera Dados -> Salva (upsert).
+    Chamadas simultâneas para o mesmo intervalo (e o lazy load dele) são serializadas.
+    Retorna a quantidade de registros criados.
+    """
+    if future_dates is None:
+        # Mesma grade do lazy load (hora cheia nos modelos horários)
+        future_dates = grade_esperada(model_db, data_inicio_naive, data_fim_naive)
+
+    with single_flight(chave_geracao(model_db, data_inicio_naive, data_fim_naive)):
+        df_previsao = gerar_previsao(
+            model_db, data_inicio_naive, data_fim_naive, future_dates=future_dates, cache_features=cache_features
+        )
 
-    model_type = model_db.model_type
-    df_previsao = None
-
-    if model_type == 'prophet':
-        df_previsao = run_prophet_prediction(model_db, modelo_executavel, data_inicio_naive, data_fim_naive)
-    elif model_type == 'xgboost':
-        df_previsao = run_xgboost_prediction(model_db, modelo_executavel, data_inicio_naive, data_fim_naive)
-    else:
-        raise ValueError(f"Tipo '{model_type}' não suportado.")
-
-    count_salvo = 0
-    if df_previsao is not None and not df_previsao.empty:
-        previsoes_para_salvar = []
-        for index, row in df_previsao.iterrows():
-            previsoes_para_salvar.append(
-                Prediction(
-                    model=model_db,
-                    prediction_datetime=row['prediction_datetime'],
-                    value=row['value']
-                )
-            )
-        
         with transaction.atomic():
-            Prediction.objects.filter(
-                model=model_db, 
-                prediction_datetime__range=(data_inicio_naive, data_fim_naive)
-            ).delete()
-            
-            Prediction.objects.bulk_create(previsoes_para_salvar)
-            count_salvo = len(previsoes_para_salvar)
+            # Regeração forçada: sobras de uma grade anterior no intervalo também saem
+            count_salvo = salvar_previsoes(model_db, df_previsao, grade=future_dates)
             
     return count_salvo
 
-def run_xgboost_prediction(model_db, modelo_executavel, data_inicio, data_fim):
-    print(f"Rodando previsão XGBoost de {data_inicio} a {data_fim}...")
-    
-    future_dates = pd.date_range(start=data_inicio, end=data_fim, freq='D')
-    df_future = pd.DataFrame({'ds': future_dates})
-    print(f"Datas Geradas: {len(future_dates)} dias")
-    print(f"Exemplo: {future_dates}")  
-    
-    df_processed = criar_features_xgboost(df_future)
-    
-    features_ordenadas = [
-        'is_segunda', 'is_terca', 'is_quarta', 'is_quinta', 'is_sexta', 'is_sabado', 'is_domingo',
-        'mes_sin', 'mes_cos', 'dia_mes', 'ano', 'eh_feriado'
-    ]
-    
-    preds = modelo_executavel.predict(df_processed[features_ordenadas])
-    
-    df_final = df_future[['ds']].copy()
-    df_final.columns = ['prediction_datetime']
-    df_final['value'] = np.maximum(preds, 0).astype(int) 
-    
-    return df_final
-
-def run_prophet_prediction(model_db, modelo_executavel, data_inicio, data_fim):
-    granularidade = model_db.granularity 
-    if granularidade not in ['H', 'D']: 
-         raise ValueError(f"Prophet com granularidade '{granularidade}' não suportada.")
-         
-    # 1. Gerar Datas (UTC +3)
-    future_df = pd.date_range(start=data_inicio, end=data_fim, freq=granularidade)
-    future_df = pd.DataFrame({'ds': future_df})
-    
-    # 2. AJUSTE DE FUSO PARA O MODELO
-    # O Prophet precisa receber a hora local (00:00) para entender feriados e sazonalidade diária
-    df_para_modelo = future_df.copy()
-    df_para_modelo['ds'] = df_para_modelo['ds'] - pd.Timedelta(hours=3)
-    
-    if granularidade == 'H':
-        df_para_modelo['weekday'] = df_para_modelo['ds'].dt.dayofweek < 5
-        df_para_modelo['weekend'] = df_para_modelo['ds'].dt.dayofweek >= 5
-    
-    forecast = modelo_executavel.predict(df_para_modelo) 
-    
-    df_final = pd.DataFrame()
-    df_final['prediction_datetime'] = future_df['ds'] 
-    df_final['value'] = forecast['yhat'].values       
-    
-    df_final['value'] = df_final['value'].clip(lower=0).round(2)
-    return df_final
+def grade_esperada(model_db, data_inicio, data_fim):
+    """
+    Datas que devem existir no banco para o modelo no intervalo.
+    Para modelos horários o intervalo é alinhado à hora cheia, para que pedidos com
+    minutos quebrados reaproveitem os pontos já gravados.
+    """
+    freq = frequencia_do_modelo(model_db)
+    if freq == 'H':
+        data_inicio = data_inicio.ceil('h')
+        data_fim = data_fim.floor('h')
+    return gerar_datas(data_inicio, data_fim, freq)
+
+def _datas_gravadas(queryset):
+    """prediction_datetime das linhas do queryset como DatetimeIndex naive (UTC)."""
+    datas = pd.DatetimeIndex(list(queryset.values_list('prediction_datetime', flat=True)))
+    if datas.tz is not None:
+        datas = datas.tz_convert('UTC').tz_localize(None)
+    return datas
+
+def find_missing_datetimes(model_db, data_inicio, data_fim):
+    """
+    Retorna (grade, faltantes): a grade esperada e as datas dela que ainda não têm previsão gravada.
+    Datas movidas para PredictionArchive (archive_predictions) e datas anteriores à retenção do
+    modelo (retention_days, podadas pelo materializador) não contam como faltantes: o arquivamento
+    e a poda não são desfeitos por uma leitura do intervalo antigo, que devolve só o que restou.
+    """
+    grade = grade_esperada(model_db, data_inicio, data_fim)
+    if grade.empty:
+        return grade, grade
+
+    existentes = Prediction.objects.filter(
+        model=model_db, prediction_datetime__range=(grade[0], grade[-1])
+    )
+    # Caminho rápido: intervalo completo não precisa trazer as datas
+    if existentes.count() >= len(grade):
+        return grade, grade[:0]
+
+    faltantes = grade.difference(_datas_gravadas(existentes))
+    limite = limite_de_retencao(model_db)
+    if limite is not None:
+        faltantes = faltantes[faltantes >= pd.Timestamp(limite).tz_convert('UTC').tz_localize(None)]
+    if not faltantes.empty:
+        arquivadas = PredictionArchive.objects.filter(
+            model=model_db, prediction_datetime__range=(faltantes[0], faltantes[-1])
+        )
+        faltantes = faltantes.difference(_datas_gravadas(arquivadas))
+    return grade, faltantes
+
+def process_missing_predictions(model_db, data_inicio_naive, data_fim_naive):
+    """
+    Gera e grava apenas as previsões que faltam no intervalo.
+    Retorna a quantidade de registros criados.
+    """
+    grade, faltantes = find_missing_datetimes(model_db, data_inicio_naive, data_fim_naive)
+    if faltantes.empty:
+        return 0
+
+    # Single-flight: só um chamador por (modelo, intervalo) gera; os demais esperam
+    # e, ao entrar, encontram as previsões já gravadas.
+    with single_flight(chave_geracao(model_db, data_inicio_naive, data_fim_naive)) as esperou:
+        if esperou:
+            grade, faltantes = find_missing_datetimes(model_db, data_inicio_naive, data_fim_naive)
+            if faltantes.empty:
+                logger.info("Lazy load: previsões do modelo ID %s geradas por outra requisição, reaproveitando.", model_db.id)
+                return 0
+
+        # Quantidade de trechos contíguos faltantes (só para o log)
+        passo = pd.tseries.frequencies.to_offset(grade.freq).nanos
+        trechos = int((np.diff(faltantes.asi8) != passo).sum()) + 1
+        logger.info(
+            "Lazy load: modelo ID %s, faltam %s de %s pontos em %s trecho(s). Gerando...",
+            model_db.id, len(faltantes), len(grade), trechos,
+        )
+        metrics.metricas.inc('predictions_lazy_load_triggers_total', model_type=model_db.model_type)
+
+        df_previsao = gerar_previsao(model_db, faltantes[0], faltantes[-1], future_dates=faltantes)
+
+        with transaction.atomic():
+            return salvar_previsoes(model_db, df_previsao)
 
 
 class ForecastListView(ListAPIView):
@@ -192,74 +290,505 @@ class GeneratePredictionView(APIView):
         except Exception as e:
             return Response({"erro": f"Erro interno: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class BatchPredictionView(APIView):
+    """
+    POST: Gera previsões de vários modelos numa única chamada (todos os modelos de um Forecast
+    ou uma lista de model_ids). Cada modelo passa pelo mesmo caminho do /predict/ (single-flight,
+    servidor de inferência do host e gravação na sua própria transação); modelos de mesma
+    granularidade compartilham as datas e, na inferência local, a matriz de features.
+    IDs inexistentes aparecem na resposta com o respectivo erro.
+    """
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['data_inicio', 'data_fim'],
+            properties={
+                'forecast_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'model_ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+                'data_inicio': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+                'data_fim': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+            },
+        )
+    )
+    def post(self, request, *args, **kwargs):
+        inicio_total = time.perf_counter()
+        forecast_id = request.data.get('forecast_id')
+        model_ids = request.data.get('model_ids')
+        start_str = request.data.get('data_inicio')
+        end_str = request.data.get('data_fim')
+
+        if not (forecast_id or model_ids) or not all([start_str, end_str]):
+            return Response({"erro": "Informe forecast_id ou model_ids, além de data_inicio e data_fim."}, status=status.HTTP_400_BAD_REQUEST)
+
+        modelos = PredictionModel.objects.all()
+        if forecast_id:
+            modelos = modelos.filter(forecast_id=forecast_id)
+        if model_ids:
+            if not isinstance(model_ids, list):
+                return Response({"erro": "model_ids deve ser uma lista."}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                model_ids = [int(model_id) for model_id in model_ids]
+            except (TypeError, ValueError):
+                return Response({"erro": "model_ids deve conter apenas IDs inteiros."}, status=status.HTTP_400_BAD_REQUEST)
+            modelos = modelos.filter(id__in=model_ids)
+        modelos = list(modelos.order_by('id'))
+
+        # IDs pedidos que não existem (ou não pertencem ao forecast_id informado)
+        encontrados = {model_db.id for model_db in modelos}
+        resultados = [
+            {"model_id": model_id, "erro": "Modelo não encontrado."}
+            for model_id in dict.fromkeys(model_ids or []) if model_id not in encontrados
+        ]
+
+        if not modelos:
+            return Response(
+                {"erro": "Nenhum modelo encontrado.", "modelos": resultados}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        # Datas e features são calculadas uma vez por granularidade/frequência
+        intervalos = {}
+        datas_por_freq = {}
+        cache_features = {}
+        processados = 0
+
+        for model_db in modelos:
+            resultado = {"model_id": model_db.id, "nome": model_db.name}
+            resultados.append(resultado)
+            try:
+                if model_db.granularity not in intervalos:
+                    intervalos[model_db.granularity] = parse_and_validate_dates(start_str, end_str, granularity=model_db.granularity)
+                start_naive, end_naive = intervalos[model_db.granularity]
+
+                freq = frequencia_do_modelo(model_db)
+                chave = (freq, start_naive, end_naive)
+                if chave not in datas_por_freq:
+                    datas_por_freq[chave] = gerar_datas(start_naive, end_naive, freq)
+
+                with metrics.coletar_etapas() as etapas:
+                    resultado["registros_gerados"] = process_prediction_task(
+                        model_db, start_naive, end_naive, future_dates=datas_por_freq[chave], cache_features=cache_features
+                    )
+                processados += 1
+
+                # Na inferência pelo servidor do host, carga e features acontecem lá (inference_remote)
+                resultado["tempo_carga_ms"] = round(etapas.get('load', 0.0) * 1000, 2)
+                resultado["tempo_features_ms"] = round(etapas.get('features', 0.0) * 1000, 2)
+                resultado["tempo_inferencia_ms"] = round((etapas.get('inference', 0.0) + etapas.get('inference_remote', 0.0)) * 1000, 2)
+                resultado["tempo_escrita_ms"] = round(etapas.get('db_write', 0.0) * 1000, 2)
+            except ValueError as ve:
+                resultado["erro"] = str(ve)
+            except Exception as e:
+                logger.exception("Erro ao gerar previsões do modelo ID %s no lote", model_db.id)
+                resultado["erro"] = f"Erro interno: {str(e)}"
+
+        status_http = status.HTTP_201_CREATED if processados else status.HTTP_400_BAD_REQUEST
+        return Response(
+            {
+                "status": "Processamento concluído" if processados else "Nenhum modelo processado",
+                "registros_gerados": sum(r.get("registros_gerados", 0) for r in resultados),
+                "tempo_total_ms": round((time.perf_counter() - inicio_total) * 1000, 2),
+                "modelos": resultados,
+            },
+            status=status_http
+        )
+
+class PredictionJobCreateView(APIView):
+    """
+    POST: Enfileira a geração de previsões e retorna imediatamente o ID do job.
+    O processamento é feito pelo comando `manage.py run_prediction_jobs`.
+    """
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['model_id', 'data_inicio', 'data_fim'],
+            properties={
+                'model_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'data_inicio': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+                'data_fim': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+            },
+        ),
+        responses={202: PredictionJobSerializer}
+    )
+    def post(self, request, *args, **kwargs):
+        try:
+            model_id = request.data.get('model_id')
+            start_str = request.data.get('data_inicio')
+            end_str = request.data.get('data_fim')
+
+            if not all([model_id, start_str, end_str]):
+                return Response({"erro": "Campos obrigatórios faltando."}, status=status.HTTP_400_BAD_REQUEST)
+
+            model_db = PredictionModel.objects.get(id=model_id)
+            start_naive, end_naive = parse_and_validate_dates(start_str, end_str, granularity=model_db.granularity)
+
+            job = PredictionJob.objects.create(
+                model=model_db,
+                start_datetime=timezone.make_aware(start_naive.to_pydatetime(), dt_timezone.utc),
+                end_datetime=timezone.make_aware(end_naive.to_pydatetime(), dt_timezone.utc),
+            )
+            return Response(PredictionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+        except PredictionModel.DoesNotExist:
+            return Response({"erro": "Modelo não encontrado."}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as ve:
+            return Response({"erro": str(ve)}, status=status.HTTP_400_BAD_REQUEST)
+
+class PredictionJobDetailView(RetrieveAPIView):
+    """
+    GET: Status e progresso de um job de geração de previsões (só para usuários autenticados,
+    como a criação: a mensagem de erro do job pode citar caminhos e detalhes internos).
+    """
+    permission_classes = (IsAuthenticated,)
+    queryset = PredictionJob.objects.all()
+    serializer_class = PredictionJobSerializer
+    lookup_url_kwarg = 'job_id'
+
+def lazy_load_predictions(model_db, start_str, end_str):
+    """
+    Valida as datas conforme a granularidade do modelo e gera as previsões que faltam no intervalo.
+    Retorna (start_naive, end_naive, completo). Erros na geração são registrados e não impedem
+    a leitura; nesse caso completo é False e a resposta não deve ir para o cache.
+    """
+    start_naive, end_naive = parse_and_validate_dates(start_str, end_str, granularity=model_db.granularity)
+    if dentro_da_janela(model_db, start_naive, end_naive):
+        # Intervalo já materializado pelo materialize_predictions: nem a checagem de faltantes é feita
+        return start_naive, end_naive, True
+    try:
+        process_missing_predictions(model_db, start_naive, end_naive)
+    except Exception:
+        logger.exception("Erro no lazy loading do modelo ID %s", model_db.id)
+        return start_naive, end_naive, False
+    return start_naive, end_naive, True
+
+
+# Campos dos agregados em ?resolution=
+CAMPOS_ROLLUP = ('model', 'resolution', 'period_start', 'value_sum', 'value_mean', 'value_max', 'count')
+
+
+def consulta_previsoes(forecast_id, model_id=None, intervalo=None):
+    """Previsões do Forecast, opcionalmente de um modelo e no intervalo (inicio, fim) naive, em ordem de data."""
+    queryset = Prediction.objects.filter(forecast_id=forecast_id)
+    if model_id:
+        queryset = queryset.filter(model_id=model_id)
+    if intervalo is not None:
+        start_naive, end_naive = intervalo
+        queryset = queryset.filter(prediction_datetime__gte=start_naive, prediction_datetime__lte=end_naive)
+    return queryset.order_by('prediction_datetime')
+
+
+def consulta_rollups(forecast_id, resolucao, model_id=None, intervalo=None):
+    """
+    Agregados (CAMPOS_ROLLUP) dos períodos de `resolucao` que cruzam o intervalo (inicio, fim) naive,
+    por modelo e período.
+    """
+    queryset = PredictionRollup.objects.filter(model__forecast_id=forecast_id, resolution=resolucao)
+    if model_id:
+        queryset = queryset.filter(model_id=model_id)
+    if intervalo is not None:
+        start_naive, end_naive = intervalo
+        inicio = rollups.inicio_do_periodo([start_naive], resolucao)[0].to_pydatetime()
+        queryset = queryset.filter(
+            period_start__gte=inicio.replace(tzinfo=dt_timezone.utc),
+            period_start__lte=end_naive.replace(tzinfo=dt_timezone.utc),
+        )
+    return queryset.order_by('model_id', 'period_start').values(*CAMPOS_ROLLUP)
+
+
+def consulta_serie(model_db, intervalo=None):
+    """(prediction_datetime, value) do modelo, opcionalmente no intervalo (inicio, fim) naive."""
+    queryset = Prediction.objects.filter(model=model_db)
+    if intervalo is not None:
+        start_naive, end_naive = intervalo
+        queryset = queryset.filter(prediction_datetime__gte=start_naive, prediction_datetime__lte=end_naive)
+    return queryset.order_by('prediction_datetime').values_list('prediction_datetime', 'value')
+
+
+def serializar_serie(model_db, linhas):
+    """Corpo JSON colunar de /series a partir das linhas de consulta_serie."""
+    t, v = (list(coluna) for coluna in zip(*linhas)) if linhas else ([], [])
+    return encoders.dumps({"model_id": model_db.id, "granularity": model_db.granularity, "t": t, "v": v})
+
+
+def normalizar_consulta(rota, params, forecast_id, *extras):
+    """
+    Chave de cache da consulta com as datas já passadas por parse_and_validate_dates.
+    `rota` identifica o recurso ('predictions', 'series'), de modo que as views síncronas e as
+    assíncronas da mesma consulta compartilham a entrada do cache.
+    Retorna (chave, model_id) ou None quando a consulta não pode ser normalizada.
+    """
+    model_id = params.get('model_id')
+    start_str = params.get('start_date')
+    end_str = params.get('end_date')
+
+    partes = [rota, forecast_id, *extras]
+    if model_id:
+        try:
+            model_id = int(model_id)
+        except ValueError:
+            return None
+        meta = http_cache.model_meta(model_id)
+        if meta is None:
+            return None
+        partes.append(model_id)
+        if start_str and end_str:
+            try:
+                start_naive, end_naive = parse_and_validate_dates(start_str, end_str, granularity=meta[1])
+            except ValueError:
+                return None
+            partes += [start_naive.isoformat(), end_naive.isoformat()]
+    return "|".join(str(p) for p in partes), model_id or None
+
+def resposta_em_cache(request, chave, model_id, forecast_id):
+    """
+    Retorna (resposta, etag, modificado_em): resposta é o 304 ou o corpo já guardado
+    para a versão atual, ou None quando é preciso gerar.
+    """
+    etag, modificado_em = http_cache.validadores(chave, model_id=model_id, forecast_id=forecast_id)
+    resposta = http_cache.not_modified(request, etag, modificado_em)
+    if resposta is not None:
+        metrics.metricas.inc('predictions_http_cache_requests_total', result='not_modified')
+        return resposta, etag, modificado_em
+    resposta = http_cache.cached_response(etag, modificado_em)
+    if resposta is not None:
+        metrics.metricas.inc('predictions_http_cache_requests_total', result='hit')
+        return resposta, etag, modificado_em
+
+    metrics.metricas.inc('predictions_http_cache_requests_total', result='miss')
+    return None, etag, modificado_em
+
+def guardar_resposta(chave, model_id, forecast_id, etag, modificado_em, conteudo, content_type, completo=True):
+    """
+    Responde com o corpo gerado e o guarda no cache, salvo se o lazy loading ficou incompleto
+    ou se a versão mudou durante a geração (o próprio lazy loading ou outra escrita): aí o corpo
+    não corresponde a nenhuma das duas com segurança e a próxima leitura preenche o cache.
+    """
+    versao_atual = http_cache.validadores(chave, model_id=model_id, forecast_id=forecast_id)
+    if not completo or versao_atual != (etag, modificado_em):
+        return HttpResponse(conteudo, content_type=content_type)
+    return http_cache.store_response(etag, modificado_em, conteudo, content_type)
+
+class PredictionCacheMixin:
+    """
+    Cache HTTP das leituras de previsões: a chave é a consulta normalizada (datas já passadas por
+    parse_and_validate_dates) e a versão muda a cada escrita do modelo (ver predictions/http_cache.py).
+    Requisições com If-None-Match em dia recebem 304 sem tocar no ORM.
+    """
+    # Recurso na chave de cache (ver normalizar_consulta); as views assíncronas usam o mesmo
+    cache_rota = None
+    lazy_load_completo = True
+
+    def normalized_cache_key(self, request, forecast_id, *extras):
+        """Retorna (chave, model_id) ou None quando a consulta não pode ser normalizada."""
+        return normalizar_consulta(self.cache_rota, request.query_params, forecast_id, *extras)
+
+    def cached_or_render(self, request, chave, model_id, forecast_id, gerar):
+        """
+        Devolve 304, o corpo em cache ou chama gerar() -> (conteudo, content_type) | Response.
+        Respostas de erro (Response) e leituras com lazy loading incompleto não são guardadas.
+        """
+        resposta, etag, modificado_em = resposta_em_cache(request, chave, model_id, forecast_id)
+        if resposta is not None:
+            return resposta
+
+        resultado = gerar()
+        if isinstance(resultado, HttpResponseBase):
+            return resultado
+        conteudo, content_type = resultado
+        return guardar_resposta(chave, model_id, forecast_id, etag, modificado_em, conteudo, content_type, self.lazy_load_completo)
+
 model_id_param = openapi.Parameter('model_id', openapi.IN_QUERY, description="[OPCIONAL] Filtra por um ID de modelo específico", type=openapi.TYPE_INTEGER)
 start_date_param = openapi.Parameter('start_date', openapi.IN_QUERY, description="[OPCIONAL] Data/hora de início (ISO 8601)", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME)
 end_date_param = openapi.Parameter('end_date', openapi.IN_QUERY, description="[OPCIONAL] Data/hora de fim (ISO 8601)", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME)
+page_size_param = openapi.Parameter('page_size', openapi.IN_QUERY, description="[OPCIONAL] Ativa a paginação por cursor com este tamanho de página", type=openapi.TYPE_INTEGER)
+cursor_param = openapi.Parameter('cursor', openapi.IN_QUERY, description="[OPCIONAL] Cursor da página (vem nos links next/previous)", type=openapi.TYPE_STRING)
+stream_param = openapi.Parameter('stream', openapi.IN_QUERY, description="[OPCIONAL] Resposta em streaming: 'json' ou 'ndjson'", type=openapi.TYPE_STRING, enum=['json', 'ndjson'])
+resolution_param = openapi.Parameter('resolution', openapi.IN_QUERY, description="[OPCIONAL] Agregados por período local (soma, média, máximo e contagem): D (dia), W (semana) ou M (mês)", type=openapi.TYPE_STRING, enum=list(rollups.RESOLUCOES))
 
-class ForecastResultView(ListAPIView):
+class ForecastResultView(PredictionCacheMixin, ListAPIView):
     """
     GET: Busca previsões. 
     FUNCIONALIDADE INTELIGENTE: Se os dados não existirem no banco para o período, gera automaticamente.
     """
     serializer_class = PredictionSerializer
+    pagination_class = PredictionCursorPagination
+    cache_rota = 'predictions'
 
     @swagger_auto_schema(
-        manual_parameters=[model_id_param, start_date_param, end_date_param]
+        manual_parameters=[model_id_param, start_date_param, end_date_param, page_size_param, cursor_param, stream_param, resolution_param]
     )
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('resolution'):
+            return self.list_rollups(request)
+
+        formato_stream = request.query_params.get('stream')
+        if formato_stream:
+            if formato_stream not in ('json', 'ndjson'):
+                return Response({"erro": "stream deve ser 'json' ou 'ndjson'."}, status=status.HTTP_400_BAD_REQUEST)
+            return stream_predictions(self.get_queryset(), formato_stream)
+
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+
+        forecast_id = self.kwargs.get('forecast_id')
+        normalizada = self.normalized_cache_key(
+            request, forecast_id, request.query_params.get('page_size'), request.query_params.get('cursor')
+        )
+        if normalizada is None:
+            return super().list(request, *args, **kwargs)
+
+        def gerar():
+            # Lazy load fora da etapa 'serialize' (ele registra as próprias etapas)
+            self.get_queryset()
+            with metrics.etapa('serialize'):
+                resposta = super(ForecastResultView, self).list(request, *args, **kwargs)
+                conteudo = request.accepted_renderer.render(resposta.data, request.accepted_media_type, self.get_renderer_context())
+            return conteudo, request.accepted_renderer.media_type
+
+        chave, model_id = normalizada
+        return self.cached_or_render(request, chave, model_id, forecast_id, gerar)
+
+    def list_rollups(self, request):
+        """
+        ?resolution=D|W|M: em vez das previsões, devolve os agregados de PredictionRollup dos
+        períodos que cruzam o intervalo (sem paginação). O lazy load é o mesmo de /predictions.
+        """
+        resolucao = request.query_params['resolution'].upper()
+        if resolucao not in rollups.RESOLUCOES:
+            return Response({"erro": "resolution deve ser D, W ou M."}, status=status.HTTP_400_BAD_REQUEST)
+
+        forecast_id = self.kwargs.get('forecast_id')
+
+        def gerar():
+            self.get_queryset()
+            queryset = consulta_rollups(forecast_id, resolucao, request.query_params.get('model_id'), self.intervalo)
+            with metrics.etapa('serialize'):
+                corpo = encoders.dumps(list(queryset))
+            return corpo, 'application/json'
+
+        normalizada = self.normalized_cache_key(request, forecast_id, 'rollup', resolucao)
+        if normalizada is None:
+            resultado = gerar()
+            return resultado if isinstance(resultado, HttpResponseBase) else HttpResponse(resultado[0], content_type=resultado[1])
+
+        chave, model_id_cache = normalizada
+        return self.cached_or_render(request, chave, model_id_cache, forecast_id, gerar)
+
     def get_queryset(self):
+        # Uma vez por requisição: o lazy load não se repete se o queryset for pedido de novo
+        if not hasattr(self, '_queryset_requisicao'):
+            self._queryset_requisicao = self._montar_queryset()
+        return self._queryset_requisicao
+
+    def _montar_queryset(self):
         forecast_id = self.kwargs.get('forecast_id')
         model_id = self.request.query_params.get('model_id')
         start_str = self.request.query_params.get('start_date')
         end_str = self.request.query_params.get('end_date')
 
-        queryset = Prediction.objects.filter(model__forecast_id=forecast_id)
-
-        if model_id:
-            queryset = queryset.filter(model_id=model_id)
+        self.intervalo = None
 
         if start_str and end_str and model_id:
             try:
                 # 1. Carregar modelo para pegar granularidade
                 model_db = PredictionModel.objects.get(id=model_id)
                 
-                # 2. Validar datas respeitando a granularidade
-                start_naive, end_naive = parse_and_validate_dates(start_str, end_str, granularity=model_db.granularity)
-                
-                # 3. Filtrar queryset
-                queryset = queryset.filter(
-                    prediction_datetime__gte=start_naive,
-                    prediction_datetime__lte=end_naive
-                )
-
-                # 4. Lazy Loading
-                count_existente = queryset.count()
-                
-                # Cálculo de expectativa de dados
-                if model_db.granularity == 'H':
-                    # Se for horário, espera-se 24 dados por dia aprox.
-                    horas_totais = (end_naive - start_naive).total_seconds() / 3600
-                    dados_esperados = int(horas_totais) 
-                else:
-                    # Se for diário
-                    dados_esperados = (end_naive - start_naive).days + 1
-                
-                # Margem de segurança (se tiver menos de 50% do esperado, gera)
-                if count_existente < dados_esperados:
-                    print(f"⚠️ LAZY LOAD: Faltam dados (Tem {count_existente}, Precisa ~{dados_esperados}). Gerando...")
-                    process_prediction_task(model_db, start_naive, end_naive)
-                    
-                    # Recarrega queryset
-                    queryset = Prediction.objects.filter(
-                        model__forecast_id=forecast_id,
-                        model_id=model_id,
-                        prediction_datetime__gte=start_naive,
-                        prediction_datetime__lte=end_naive
-                    )
-            except Exception as e:
-                print(f"Erro no Lazy Loading: {e}")
-                pass
+                # 2. Validar datas e gerar (lazy load) apenas os pontos que faltam
+                start_naive, end_naive, self.lazy_load_completo = lazy_load_predictions(model_db, start_str, end_str)
+                self.intervalo = (start_naive, end_naive)
+            except Exception:
+                logger.exception("Erro no lazy loading do modelo ID %s", model_id)
         
-        return queryset.order_by('prediction_datetime')
\ No newline at end of file
+        # 3. Filtrar queryset
+        return consulta_previsoes(forecast_id, model_id, self.intervalo)
+
+class ForecastExportView(ForecastResultView):
+    """
+    GET: Exporta as previsões (model_id, prediction_datetime, value) em CSV, Apache Arrow IPC
+    ou Parquet, conforme o header Accept ou ?format=csv|arrow|parquet. Os registros são lidos do
+    banco em lotes e enviados em streaming. Aceita os mesmos filtros (e lazy loading) de /predictions.
+    """
+    renderer_classes = [CSVRenderer, ArrowStreamRenderer, ParquetRenderer]
+    pagination_class = None
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            model_id_param,
+            start_date_param,
+            end_date_param,
+            openapi.Parameter('format', openapi.IN_QUERY, description="[OPCIONAL] csv, arrow ou parquet (ou use o header Accept)", type=openapi.TYPE_STRING, enum=['csv', 'arrow', 'parquet']),
+        ],
+        produces=[CSVRenderer.media_type, ArrowStreamRenderer.media_type, ParquetRenderer.media_type],
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        formato = request.accepted_renderer.format
+        if formato in ('arrow', 'parquet') and not pyarrow_disponivel():
+            return Response({"erro": "O formato solicitado exige o pacote pyarrow."}, status=status.HTTP_406_NOT_ACCEPTABLE)
+
+        nome_arquivo = f"forecast_{self.kwargs.get('forecast_id')}_predictions"
+        return export_predictions(self.get_queryset(), formato, nome_arquivo)
+
+class PredictionSeriesView(PredictionCacheMixin, APIView):
+    """
+    GET: Série de previsões de um modelo em formato colunar: {"t": [...], "v": [...]}.
+    Caminho rápido de leitura: sem serializer por linha e sem os campos id/model/created_at.
+    Também faz o lazy loading quando start_date e end_date são informados.
+    """
+    cache_rota = 'series'
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('model_id', openapi.IN_QUERY, description="ID do modelo", type=openapi.TYPE_INTEGER, required=True),
+            start_date_param,
+            end_date_param,
+        ]
+    )
+    def get(self, request, forecast_id, *args, **kwargs):
+        model_id = request.query_params.get('model_id')
+        start_str = request.query_params.get('start_date')
+        end_str = request.query_params.get('end_date')
+
+        if not model_id:
+            return Response({"erro": "model_id é obrigatório."}, status=status.HTTP_400_BAD_REQUEST)
+
+        def gerar():
+            try:
+                model_db = PredictionModel.objects.get(id=model_id, forecast_id=forecast_id)
+            except (PredictionModel.DoesNotExist, ValueError):
+                return Response({"erro": "Modelo não encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+            intervalo = None
+            if start_str and end_str:
+                try:
+                    start_naive, end_naive, self.lazy_load_completo = lazy_load_predictions(model_db, start_str, end_str)
+                except ValueError as ve:
+                    return Response({"erro": str(ve)}, status=status.HTTP_400_BAD_REQUEST)
+                intervalo = (start_naive, end_naive)
+
+            with metrics.etapa('serialize'):
+                corpo = serializar_serie(model_db, list(consulta_serie(model_db, intervalo)))
+            return corpo, 'application/json'
+
+        normalizada = self.normalized_cache_key(request, forecast_id)
+        if normalizada is None:
+            resultado = gerar()
+            return resultado if isinstance(resultado, HttpResponseBase) else HttpResponse(resultado[0], content_type=resultado[1])
+
+        chave, model_id_cache = normalizada
+        return self.cached_or_render(request, chave, model_id_cache, forecast_id, gerar)
+
+def metrics_view(request):
+    """
+    GET /metrics: métricas de todos os workers do host no formato de texto do Prometheus
+    (latência por rota e por etapa, hits do registro de modelos e do cache HTTP,
+    lazy loads disparados e previsões gravadas). Ver predictions/metrics.py.
+    """
+    token = settings.PREDICTION_METRICS_TOKEN
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return HttpResponse("Não autorizado.", status=401, content_type='text/plain; charset=utf-8')
+    return HttpResponse(metrics.exposicao(), content_type='text/plain; version=0.0.4; charset=utf-8')